@@ -0,0 +1,4 @@
+"""Install the `scrapd-datasets` entry point (the package is configured in `setup.cfg`)."""
+import setuptools
+
+setuptools.setup()
@@ -0,0 +1,33 @@
+"""
+Configure the tests of the `scrapd_datasets` package and of the standalone tools.
+
+The package lives in the `tools` folder, next to the standalone tools, and does not need to be installed to be tested.
+"""
+import importlib.util
+import pathlib
+import sys
+
+TOOL_DIR = pathlib.Path(__file__).resolve().parent.parent / 'tools'
+
+sys.path.insert(0, str(TOOL_DIR))
+
+
+def load_tool(name):
+    """
+    Load a standalone tool from the `tools` folder.
+
+    The tool names contain dashes, therefore they cannot be imported directly. The modules are registered under their
+    name with underscores, so that their functions can be sent to worker processes.
+
+    :param str name: name of the tool, without the `.py` extension
+    :return: the tool module
+    :rtype: module
+    """
+    module_name = name.replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, TOOL_DIR / f'{name}.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
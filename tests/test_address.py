@@ -0,0 +1,20 @@
+"""Tests of `scrapd_datasets.address`."""
+import pytest
+
+from scrapd_datasets.address import parse_address
+
+
+class TestAddress:
+    @pytest.mark.parametrize('address,expected', [
+        ('8100 block of N. Lamar Blvd.', (8100, 'n lamar blvd')),
+        ('8200 blk N. Lamar Boulevard', (8200, 'n lamar blvd')),
+        ('3000-3500 block S. IH-35', (3000, 's ih 35')),
+        ('12900 Blk N IH35 SB', (12900, 'n ih 35')),
+        ('Sandshof Dr. and Loyola Ln.', (None, 'loyola ln / sandshof dr')),
+        ('loyola lane/sandshof drive', (None, 'loyola ln / sandshof dr')),
+        ('', (None, '')),
+    ])
+    def test_parse_address_00(self, address, expected):
+        """Ensure the addresses are normalized."""
+        actual = parse_address(address)
+        assert actual == expected
@@ -0,0 +1,159 @@
+"""Tests of `scrapd_datasets.archive`."""
+import json
+
+from scrapd_datasets.archive import load_columns
+from scrapd_datasets.archive import merge
+from scrapd_datasets.archive import normalize_column
+
+
+class TestMerge:
+    def test_merge_00(self):
+        actual = merge(json.loads(SCRAPD), json.loads(SOCRATA))
+        expected = FINAL
+        assert actual == expected
+
+    def test_merge_01(self):
+        """Ensure the extra entries are added after the matching ones."""
+        actual = merge(json.loads(SCRAPD), json.loads(SOCRATA), extras=True)
+        assert [entry['case'] for entry in actual] == ['18-0041689', '14-0511533']
+        assert actual[1]['latitude'] == 30.284725
+
+    def test_merge_02(self):
+        """Ensure an entry whose case number was truncated is linked to its ScrAPD entry."""
+        socrata = json.loads(SOCRATA)
+        scrapd = [{**entry, 'date': '2018-01-04', 'time': '23:57:00'} for entry in json.loads(SCRAPD)]
+        socrata[0]['case_number'] = '18-00416'
+        actual = merge(scrapd, socrata, extras=True)
+        assert [entry['case'] for entry in actual] == ['18-0041689', '14-0511533']
+        assert actual[0] == FINAL[0]
+
+    def test_load_columns_00(self):
+        """Ensure the field aliases are resolved for each schema variant."""
+        socrata = [
+            {
+                'case_number': '1',
+                'x_coord': '-97.1',
+                'y_coord': '30.1'
+            },
+            {
+                'case_number': '2',
+                'xcoord': '-97.2',
+                'ycoord': '30.2'
+            },
+            {
+                'case_number': '3',
+                'x_coord': '',
+                'coord_x': '-97.3'
+            },
+            {
+                'case_number': '4'
+            },
+        ]
+        actual = load_columns(socrata)
+        assert actual['case'] == ['1', '2', '3', '4']
+        assert actual['longitude'] == ['-97.1', '-97.2', '-97.3', '']
+        assert actual['latitude'] == ['30.1', '30.2', '', '']
+
+    def test_normalize_column_00(self):
+        calls = []
+
+        def cleaner(value):
+            calls.append(value)
+            return value.lower()
+
+        actual = normalize_column(['A', 'B', 'A'], cleaner)
+        assert actual == ['a', 'b', 'a']
+        assert sorted(calls) == ['A', 'B']
+
+
+# Test data.
+SCRAPD = """
+[
+    {
+        "age": 23,
+        "case": "18-0041689",
+        "dob": "11/27/1994",
+        "date": "01/04/2018",
+        "ethnicity": "Hispanic",
+        "crash": "1",
+        "first": "Ashley",
+        "gender": "female",
+        "last": "Martinez",
+        "link": "http://austintexas.gov/news/traffic-fatality-1-3",
+        "location": "5600 N IH 35 Northbound",
+        "notes": "Eloy Herrera, Hispanic male (D.O.B. 4-9-02)",
+        "time": "11:57 p.m."
+    }
+]
+"""
+
+SOCRATA = """
+[
+    {
+        "area": "ID",
+        "case_number": "18-0041689",
+        "case_status": "Closed",
+        "charge": "Pending",
+        "date": "2018-01-04T00:00:00.000",
+        "day": "Thu",
+        "dl_status_incident": "suspended",
+        "failure_to_stop_and_render_aid": "n",
+        "fatal_crash_number": "1",
+        "hour": "23",
+        "killed_driver_pass": "driver and passenger",
+        "location": "5600 Block N IH 35 NB",
+        "month": "Jan",
+        "number_of_fatalities": "2",
+        "ran_red_light_or_stop_sign": "n",
+        "related": "mv/18 Wheel",
+        "restraint_type": "unknown",
+        "speeding": "n",
+        "suspected_impairment": "driver   ",
+        "time": "23:25",
+        "type": "MOTOR VEHICLE",
+        "type_of_road": "IH35",
+        "x_coord": "-97.70766",
+        "y_coord": "30.315355"
+    },
+    {
+        "area": "Charlie",
+        "case_number": "14-0511533",
+        "charge": "DOO",
+        "date": "2014-02-20T00:00:00.000",
+        "day": "Thu",
+        "drivers_license_status": "suspended",
+        "fatal_crash": "7",
+        "ftsra": "No",
+        "hour": "19",
+        "killed_driver_pass": "Pedestrian",
+        "location": "6400 FM 969",
+        "month": "Feb",
+        "number_of_fatalities": "1",
+        "ran_red_light": "N",
+        "related": "MV/PED",
+        "restraint_or_helmet": "n/a",
+        "speeding": "N",
+        "suspected_impairment": "PEDESTRIAN",
+        "time": "19:15:00",
+        "type": "Pedestrian",
+        "type_of_road": "high speed roadway",
+        "x_coord": "-97.659822",
+        "y_coord": "30.284725"
+    }
+]
+"""
+
+FINAL = [{
+    "case": "18-0041689",
+    "date": "2018-01-04",
+    "impairment": "driver",
+    "killed": "driver and passenger",
+    "hit and run": "n",
+    "latitude": 30.315355,
+    "location": "5600 block n ih 35 nb",
+    "longitude": -97.70766,
+    "ran light/stop": "n",
+    "speeding": "n",
+    "time": "23:25:00",
+    "type": "motor vehicle"
+}]
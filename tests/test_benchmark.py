@@ -0,0 +1,92 @@
+"""Tests of `scrapd-benchmark`."""
+import pytest
+from scrapd.core import model
+
+from conftest import load_tool
+from scrapd_datasets import convert
+from scrapd_datasets import socrata
+
+benchmark = load_tool('scrapd-benchmark')
+BENCHMARKS = benchmark.BENCHMARKS
+compare = benchmark.compare
+generate_changes = benchmark.generate_changes
+generate_reports = benchmark.generate_reports
+generate_scrapd2 = benchmark.generate_scrapd2
+generate_socrata = benchmark.generate_socrata
+percentile = benchmark.percentile
+run_benchmark = benchmark.run_benchmark
+
+
+class TestBenchmark:
+    def test_generate_reports_00(self):
+        """Ensure the reports are reproducible, valid and sorted by case number."""
+        reports = generate_reports(50, seed=1)
+        assert reports == generate_reports(50, seed=1)
+        assert reports != generate_reports(50, seed=2)
+        assert [r['case'] for r in reports] == sorted(r['case'] for r in reports)
+        assert len({r['case'] for r in reports}) == 50
+        for report in reports:
+            model.Report(**report)
+
+    def test_generate_changes_00(self):
+        reports = generate_reports(100)
+        changes = generate_changes(reports)
+        cases = {r['case'] for r in reports}
+        assert len([c for c in changes if c['case'] in cases]) == 10
+        assert len([c for c in changes if c['case'] not in cases]) == 5
+
+    def test_generate_socrata_00(self):
+        """Ensure the Socrata rows are imported back into the reports."""
+        reports = generate_reports(20)
+        actual = socrata.merge(reports, generate_socrata(reports))
+        assert [a['case'] for a in actual] == [r['case'] for r in reports]
+        assert [a['time'] for a in actual] == [r['time'] for r in reports]
+
+    def test_generate_scrapd2_00(self):
+        """Ensure the ScrAPD 2 entries are converted back into the reports."""
+        reports = generate_reports(20)
+        actual = [r.dict() for r in convert.convert(generate_scrapd2(reports))]
+        assert [a['date'].isoformat() for a in actual] == [r['date'] for r in reports]
+        assert [a['fatalities'][0]['age'] for a in actual] == [r['fatalities'][0]['age'] for r in reports]
+
+    @pytest.mark.parametrize('name', sorted(BENCHMARKS))
+    def test_run_benchmark_00(self, name):
+        actual = run_benchmark(name, 10, repeat=2)
+        assert actual['benchmark'] == name
+        assert len(actual['durations']) == 2
+        assert actual['latency']['p50'] <= actual['latency']['p99']
+        assert actual['peak_rss'] > 0
+
+    @pytest.mark.parametrize('values,p,expected', [
+        ([3, 1, 2], 50, 2),
+        ([1, 2, 3, 4], 50, 2),
+        ([1, 2, 3, 4], 99, 4),
+        ([1], 0, 1),
+    ])
+    def test_percentile_00(self, values, p, expected):
+        assert percentile(values, p) == expected
+
+    def test_compare_00(self):
+        baseline = {'results': [RESULT]}
+        slower = dict(RESULT, latency={'p50': 1.3, 'p90': 1.3, 'p99': 1.3})
+        bigger = dict(RESULT, peak_rss=2000)
+        other = dict(RESULT, records=1000)
+        assert compare(baseline, {'results': [RESULT, other]}) == []
+        assert len(compare(baseline, {'results': [slower]})) == 1
+        assert len(compare(baseline, {'results': [bigger]})) == 1
+        assert compare(baseline, {'results': [slower]}, tolerance=0.5) == []
+
+
+# Test data.
+RESULT = {
+    'benchmark': 'merger',
+    'durations': [1.0],
+    'latency': {
+        'p50': 1.0,
+        'p90': 1.0,
+        'p99': 1.0
+    },
+    'peak_rss': 1000,
+    'records': 100,
+    'throughput': 100.0,
+}
@@ -0,0 +1,46 @@
+"""Tests of `scrapd_datasets.census_server`."""
+import aiohttp
+import pytest
+
+from scrapd_datasets.census_server import ADDRESS_PATH
+from scrapd_datasets.census_server import BATCH_PATH
+from scrapd_datasets.census_server import geocode
+from scrapd_datasets.census_server import start_server
+from scrapd_datasets.geocensus import async_update_entries
+
+
+class TestCensusServer:
+    @pytest.mark.asyncio
+    async def test_start_server_00(self):
+        """Ensure the stand-in answers like the Geo Census API."""
+        entries = [{'case': '19-0400694', 'location': '8100 Block of N. Lamar Blvd.'}]
+        runner, url = await start_server()
+        try:
+            actual = await async_update_entries(entries, url=url + ADDRESS_PATH)
+            actual_batch = await async_update_entries(entries, batch_size=10, batch_url=url + BATCH_PATH)
+        finally:
+            await runner.cleanup()
+        latitude, longitude = geocode('8100 n. lamar blvd.')
+        expected = [{'case': '19-0400694', 'latitude': latitude, 'longitude': longitude}]
+        assert actual == expected
+        assert actual_batch == expected
+
+    @pytest.mark.asyncio
+    async def test_start_server_01(self):
+        """Ensure the stand-in fails the requests at the given rate."""
+        runner, url = await start_server(error_rate=0.5, seed=42)
+        try:
+            async with aiohttp.ClientSession() as session:
+                statuses = []
+                for _ in range(100):
+                    async with session.get(url, params={'street': '8100 n. lamar blvd.'}) as response:
+                        statuses.append(response.status)
+        finally:
+            await runner.cleanup()
+        assert set(statuses) == {200, 503}
+        assert 30 < statuses.count(503) < 70
+
+    def test_geocode_00(self):
+        """Ensure the coordinates are deterministic and do not depend on the case."""
+        assert geocode('8100 N. Lamar Blvd.') == geocode('8100 n. lamar blvd.')
+        assert geocode('8100 n. lamar blvd.') != geocode('8200 n. lamar blvd.')
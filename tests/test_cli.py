@@ -0,0 +1,41 @@
+"""Tests of `scrapd_datasets.cli`."""
+import json
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from scrapd_datasets import cli
+
+TOOL_DIR = pathlib.Path(__file__).resolve().parent.parent / 'tools'
+
+
+class TestCli:
+    @pytest.mark.parametrize('argv,expected', [
+        (['merge', '-i', 'old.json', 'new.json'], ('merge', ['-i', 'old.json', 'new.json'])),
+        (['geocode', '--help'], ('geocode', ['--help'])),
+        (['metrics'], ('metrics', [])),
+    ])
+    def test_get_cli_parser_00(self, argv, expected):
+        """Ensure the arguments of a command are left to the command."""
+        args = cli.get_cli_parser().parse_args(argv)
+        assert (args.command, args.args) == expected
+
+    def test_main_00(self, tmp_path, capsys):
+        """Ensure a command is run with its own arguments."""
+        (tmp_path / 'scrapd-merger-1.json').write_text(json.dumps({'stages': [{'stage': 'merge'}]}))
+        cli.main(['metrics', str(tmp_path)])
+        assert json.loads(capsys.readouterr().out) == {'stages': [{'stage': 'merge'}]}
+
+    def test_main_01(self):
+        """Ensure the heavy dependencies are not loaded before a command needs them."""
+        code = ('import json, sys; from scrapd_datasets import cli; '
+                'cli.get_cli_parser(); print(json.dumps(list(sys.modules)))')
+        output = subprocess.run([sys.executable, '-c', code],
+                                cwd=str(TOOL_DIR),
+                                check=True,
+                                stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        modules = {name.split('.')[0] for name in json.loads(output)}
+        assert not modules & {'aiohttp', 'dateparser', 'loguru', 'pydantic', 'pytest', 'scrapd'}
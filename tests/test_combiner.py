@@ -0,0 +1,105 @@
+"""Tests of `scrapd-combiner`."""
+import io
+
+import pytest
+
+from conftest import load_tool
+
+combiner = load_tool('scrapd-combiner')
+combine = combiner.combine
+write_records = combiner.write_records
+
+
+class TestCombiner:
+    def test_combine_00(self):
+        """Ensure the entries are merged by case number."""
+        actual = [e['case'] for e in combine([iter(DATASET_2019), iter(DATASET_2018)])]
+        expected = ['18-0010001', '18-0010002', '19-0010001']
+        assert actual == expected
+
+    def test_combine_01(self):
+        """Ensure the duplicated cases are kept and reported."""
+        duplicates = []
+        actual = [e['case'] for e in combine([iter(DATASET_2018), iter(DATASET_2018[1:])], duplicates=duplicates)]
+        assert actual == ['18-0010001', '18-0010002', '18-0010002']
+        assert duplicates == ['18-0010002']
+
+    def test_combine_02(self):
+        """Ensure an unsorted data set is rejected."""
+        with pytest.raises(ValueError):
+            list(combine([iter(DATASET_2018[::-1])], ['2018']))
+
+    @pytest.mark.parametrize('records,expected', [
+        ([], '[]\n'),
+        ([{
+            'b': 0.0,
+            'a': 'Café\x7f'
+        }], '[\n  {\n    "b": 0,\n    "a": "Café\\u007f"\n  }\n]\n'),
+    ])
+    def test_write_records_00(self, records, expected):
+        f = io.StringIO()
+        write_records(f, records)
+        assert f.getvalue() == expected
+
+    def test_write_records_01(self):
+        """Ensure the output is identical to the one of jq."""
+        f = io.StringIO()
+        write_records(f, combine([iter(DATASET_2018), iter(DATASET_2019)]))
+        assert f.getvalue() == JQ_OUTPUT
+
+
+# Test data.
+DATASET_2018 = [
+    {
+        "case": "18-0010001",
+        "fatalities": [{
+            "age": 30,
+            "first": "José"
+        }],
+        "latitude": 30.269347,
+        "longitude": -97.68788
+    },
+    {
+        "case": "18-0010002",
+        "fatalities": [],
+        "latitude": 0.0,
+        "longitude": 0.0
+    },
+]
+
+DATASET_2019 = [
+    {
+        "case": "19-0010001",
+        "fatalities": [],
+        "latitude": 30.1,
+        "longitude": -97.0
+    },
+]
+
+# Output of `jq -s add`.
+JQ_OUTPUT = """[
+  {
+    "case": "18-0010001",
+    "fatalities": [
+      {
+        "age": 30,
+        "first": "José"
+      }
+    ],
+    "latitude": 30.269347,
+    "longitude": -97.68788
+  },
+  {
+    "case": "18-0010002",
+    "fatalities": [],
+    "latitude": 0,
+    "longitude": 0
+  },
+  {
+    "case": "19-0010001",
+    "fatalities": [],
+    "latitude": 30.1,
+    "longitude": -97
+  }
+]
+"""
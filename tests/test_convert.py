@@ -0,0 +1,70 @@
+"""Tests of `scrapd_datasets.convert`."""
+import datetime
+
+from scrapd.core import model
+
+from scrapd_datasets.convert import convert
+
+
+class TestConvert:
+    def test_convert_00(self):
+        """Ensure a ScrAPD entry is convert from v2 to v3."""
+        actual = convert(SCRAPD2_ENTRY)
+        expected = [SCRAPD3_ENTRY]
+        assert actual == expected
+
+
+SCRAPD2_ENTRY = [{
+    "1": "Cedric Benson | Black male | 12/28/1982 Deceased",
+    "2": "Aamna Najam | Asian female | 01/26/1992",
+    "Age": 36,
+    "Case": "19-2291933",
+    "DOB": "12/28/1982",
+    "Date": "08/17/2019",
+    "Ethnicity": "Black",
+    "Fatal crashes this year": "50",
+    "First Name": "Cedric",
+    "Gender": "male",
+    "Last Name": "Benson",
+    "Link": "http://austintexas.gov/news/traffic-fatality-50-3",
+    "Location": "4500 FM 2222/Mount Bonnell Road",
+    "Notes": "The preliminary investigation yielded testimony from witnesses who reported seeing the BMW motorcycle "
+    "driven by Cedric Benson traveling at a high rate of speed westbound in the left lane of FM 2222. A white, 2014 "
+    "Dodge van was stopped at the T-intersection of Mount Bonnell Road and FM 2222. After checking for oncoming "
+    "traffic, the van attempted to turn left on to FM 2222 when it was struck by the oncoming motorcycle. The driver "
+    "of the van was evaluated by EMS on scene and refused transport. The passenger of the van and a bystander at the "
+    "scene attempted to render aid to Mr. Benson and his passenger Aamna Najam. Cedric Benson and Aamna Najam were "
+    "both pronounced on scene. The van driver remained on scene and is cooperating with the ongoing investigation. "
+    "The family of Cedric Benson respectfully requests privacy during this difficult time and asks that media refrain "
+    "from contacting them.",
+    "Time": "10:20 PM"
+}]
+
+SCRAPD3_ENTRY = model.Report(
+    case='19-2291933',
+    crash=50,
+    date=datetime.date(2019, 8, 17),
+    fatalities=[
+        model.Fatality(
+            age=36,
+            dob=datetime.date(1982, 12, 28),
+            ethnicity=model.Ethnicity.black,
+            first='Cedric',
+            gender=model.Gender.male,
+            last='Benson',
+        ),
+    ],
+    link='http://austintexas.gov/news/traffic-fatality-50-3',
+    location='4500 FM 2222/Mount Bonnell Road',
+    notes='The preliminary investigation yielded testimony from witnesses who reported seeing the '
+    'BMW motorcycle driven by Cedric Benson traveling at a high rate of speed westbound in the left '
+    'lane of FM 2222. A white, 2014 Dodge van was stopped at the T-intersection of Mount Bonnell Road '
+    'and FM 2222. After checking for oncoming traffic, the van attempted to turn left on to FM 2222 '
+    'when it was struck by the oncoming motorcycle. The driver of the van was evaluated by EMS '
+    'on scene and refused transport. The passenger of the van and a bystander at the scene attempted '
+    'to render aid to Mr. Benson and his passenger Aamna Najam. Cedric Benson and Aamna Najam were both '
+    'pronounced on scene. The van driver remained on scene and is cooperating with the ongoing '
+    'investigation. The family of Cedric Benson respectfully requests privacy during this difficult '
+    'time and asks that media refrain from contacting them.',
+    time=datetime.time(22, 20),
+)
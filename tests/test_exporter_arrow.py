@@ -0,0 +1,143 @@
+"""Tests of `scrapd-exporter-arrow`."""
+import datetime
+import pathlib
+
+import pytest
+from scrapd.core import model
+
+from conftest import load_tool
+
+exporter = load_tool('scrapd-exporter-arrow')
+build_tables = exporter.build_tables
+convert = exporter.convert
+export = exporter.export
+get_name = exporter.get_name
+
+
+class TestExporterArrow:
+    def test_get_name_00(self):
+        actual = get_name(pathlib.Path('datasets/fatalities-all-augmented.json'))
+        assert actual == 'fatalities-all-augmented'
+
+    @pytest.mark.parametrize('value,type_,expected', [
+        ('2019-01-01', datetime.date, datetime.date(2019, 1, 1)),
+        ('08:03:00', datetime.time, datetime.time(8, 3)),
+        ('Hispanic', model.Ethnicity, 'Hispanic'),
+        ('Unknown', model.Ethnicity, None),
+        ('', datetime.date, None),
+        (30.1, float, 30.1),
+        ('n', str, 'n'),
+    ])
+    def test_convert_00(self, value, type_, expected):
+        actual = convert(value, type_)
+        assert actual == expected
+
+    def test_build_tables_00(self):
+        """Ensure the fatalities are linked to their crash."""
+        pa = pytest.importorskip('pyarrow')
+        crashes, fatalities = build_tables(FATALITIES)
+        assert crashes.num_rows == 2
+        assert 'fatalities' not in crashes.column_names
+        assert crashes.schema.field('date').type == pa.date32()
+        assert crashes.schema.field('time').type == pa.time32('s')
+        assert crashes.schema.field('latitude').type == pa.float64()
+        assert fatalities.column('case').to_pylist() == ['19-0150158', '19-0150158', '19-0161105']
+        assert fatalities.column('gender').to_pylist() == ['Female', 'Male', 'Male']
+        assert fatalities.column('dob').to_pylist() == [None, None, datetime.date(1962, 5, 15)]
+
+    def test_build_tables_01(self):
+        """Ensure the extra fields are exported as strings, and that no fatality table is built."""
+        pa = pytest.importorskip('pyarrow')
+        crashes, fatalities = build_tables(ARCHIVES)
+        assert fatalities is None
+        assert crashes.schema.field('hit and run').type == pa.string()
+        assert crashes.column('type').to_pylist() == ['motorcycle']
+
+    @pytest.mark.parametrize('format_', ['parquet', 'arrow'])
+    def test_export_00(self, tmp_path, format_):
+        """Ensure the tables can be read back."""
+        pa = pytest.importorskip('pyarrow')
+        paths = export(FATALITIES, tmp_path, 'test', format_)
+        assert [p.name for p in paths] == [f'test-crashes.{format_}', f'test-fatalities.{format_}']
+        if format_ == 'parquet':
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+            table = pyarrow.parquet.read_table(str(paths[0]), columns=['case', 'date'])
+        else:
+            import pyarrow.feather  # pylint: disable=import-outside-toplevel
+            table = pyarrow.feather.read_table(str(paths[0]), columns=['case', 'date'], memory_map=True)
+        assert table.column('case').to_pylist() == ['19-0150158', '19-0161105']
+        assert isinstance(table, pa.Table)
+
+
+# Test data.
+FATALITIES = [
+    {
+        "case": "19-0150158",
+        "crash": 0,
+        "date": "2019-01-15",
+        "fatalities": [
+            {
+                "age": 34,
+                "dob": None,
+                "ethnicity": "White",
+                "first": "Jane",
+                "gender": "Female",
+                "generation": "",
+                "last": "Doe",
+                "middle": ""
+            },
+            {
+                "age": 35,
+                "dob": None,
+                "ethnicity": "White",
+                "first": "John",
+                "gender": "Male",
+                "generation": "",
+                "last": "Doe",
+                "middle": ""
+            },
+        ],
+        "latitude": 30.303625,
+        "link": "",
+        "location": "1000 E Stassney Ln",
+        "longitude": -97.67139,
+        "notes": "",
+        "time": "19:25:00"
+    },
+    {
+        "case": "19-0161105",
+        "crash": 2,
+        "date": "2019-01-16",
+        "fatalities": [{
+            "age": 57,
+            "dob": "1962-05-15",
+            "ethnicity": "Hispanic",
+            "first": "Bob",
+            "gender": "Male",
+            "generation": "",
+            "last": "Smith",
+            "middle": ""
+        }],
+        "latitude": 0.0,
+        "link": "http://austintexas.gov/news/traffic-fatality-2-4",
+        "location": "183 Service Road Westbound and Payton Gin Rd.",
+        "longitude": 0.0,
+        "notes": "",
+        "time": "15:42:00"
+    },
+]
+
+ARCHIVES = [
+    {
+        "case": "13-0011875",
+        "date": "2013-01-01",
+        "hit and run": "n",
+        "impairment": "driver",
+        "killed": "driver and passenger",
+        "latitude": 30.269347,
+        "location": "1100 berger st",
+        "longitude": -97.68788,
+        "time": "18:50:00",
+        "type": "motorcycle"
+    },
+]
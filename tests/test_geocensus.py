@@ -0,0 +1,517 @@
+"""Tests of `scrapd_datasets.geocensus`."""
+import csv
+import io
+import json
+import pathlib
+
+import aiohttp
+import aiohttp.web
+import pytest
+
+from scrapd_datasets import census_server
+from scrapd_datasets import metrics
+from scrapd_datasets.geocensus import AdaptiveLimiter
+from scrapd_datasets.geocensus import Cassette
+from scrapd_datasets.geocensus import GEO_CENSUS_BENCHMARK
+from scrapd_datasets.geocensus import GEO_CENSUS_VINTAGE
+from scrapd_datasets.geocensus import GeocodeCache
+from scrapd_datasets.geocensus import OfflineGeocoder
+from scrapd_datasets.geocensus import async_update_entries
+from scrapd_datasets.geocensus import augment
+from scrapd_datasets.geocensus import build_params
+from scrapd_datasets.geocensus import fetch_json
+from scrapd_datasets.geocensus import make_cache_key
+from scrapd_datasets.geocensus import parse_geocensus_batch_row
+from scrapd_datasets.geocensus import parse_geocensus_response
+from scrapd_datasets.geocensus import read_augmentation
+from scrapd_datasets.geocensus import sanitize
+from scrapd_datasets.geocensus import split_entries
+
+CASSETTE_PATH = pathlib.Path(__file__).resolve().parent / 'cassettes' / 'geocensus.json'
+
+
+@pytest.fixture
+async def serve():
+    """
+    Serve request handlers in the running event loop.
+
+    The fixture is a coroutine function taking the handler of `GET /` and optionally the handler of `POST /batch`, and
+    returning the URL of the server. The servers are stopped at the end of the test.
+    """
+    runners = []
+
+    async def start(handler, batch_handler=None):
+        app = aiohttp.web.Application()
+        app.router.add_get('/', handler)
+        if batch_handler:
+            app.router.add_post('/batch', batch_handler)
+        runner, url = await census_server.start_server(app=app)
+        runners.append(runner)
+        return url
+
+    yield start
+    for runner in runners:
+        await runner.cleanup()
+
+
+class TestGeolocation:
+    def test_sanitize_00(self):
+        """Ensure an address is sanitized."""
+        actual = sanitize('8100 block of N. Lamar Blvd.')
+        expected = '8100 N. Lamar Blvd.'.lower()
+        assert actual == expected
+
+    def test_parse_result_00(self):
+        """Ensure a valid geocensus response gets parsed correctly."""
+        actual = parse_geocensus_response(json.loads(GEOCENSUS_RESPONSE))
+        expected = {'latitude': 38.846565, 'longitude': -76.926956}
+        assert actual == expected
+
+    def test_parse_result_01(self):
+        """Ensure an empty geocensus response is parsed as an empty geolocation."""
+        actual = parse_geocensus_response({})
+        expected = {}
+        assert actual == expected
+
+    @pytest.mark.asyncio
+    async def test_async_update_entries_00(self):
+        entries = [{'case': '19-0400694', 'location': '8100 Block of N. Lamar Blvd.'}]
+        actual = await async_update_entries(entries, cassette=Cassette(CASSETTE_PATH))
+        assert actual[0]['latitude'] == 30.350113
+        assert actual[0]['longitude'] == -97.710434
+
+    def test_adaptive_limiter_00(self):
+        """Ensure the limit increases additively and decreases multiplicatively."""
+        limiter = AdaptiveLimiter(maximum=8, initial=4, target_latency=1)
+        limiter.record(0.1)
+        assert limiter.limit == 4.25
+        limiter.record(0.1, throttled=True)
+        assert limiter.limit == 2.125
+        limiter.record(2)
+        assert limiter.limit == 1.0625
+        limiter.record(2)
+        assert limiter.limit == 1
+
+    @pytest.mark.asyncio
+    async def test_fetch_json_00(self, serve):
+        """Ensure a throttled request is retried."""
+        responses = [aiohttp.web.Response(status=429), aiohttp.web.json_response(json.loads(GEOCENSUS_RESPONSE))]
+
+        async def handler(request):
+            return responses.pop(0)
+
+        url = await serve(handler)
+        async with aiohttp.ClientSession() as session:
+            actual = await fetch_json(session, f'{url}/', retries=1)
+        assert parse_geocensus_response(actual) == {'latitude': 38.846565, 'longitude': -76.926956}
+        assert not responses
+
+    @pytest.mark.asyncio
+    async def test_fetch_json_01(self, serve):
+        """Ensure the requests are counted."""
+        responses = [aiohttp.web.Response(status=503), aiohttp.web.Response(status=503)]
+
+        async def handler(request):
+            return responses.pop(0)
+
+        url = await serve(handler)
+        with metrics.stage('geocoding') as stage:
+            async with aiohttp.ClientSession() as session:
+                actual = await fetch_json(session, f'{url}/', retries=1)
+        assert actual is None
+        expected = {'http_requests': 2, 'http_retries': 1, 'http_throttled': 2, 'http_failures': 1}
+        assert stage['counters'] == expected
+
+    @pytest.mark.asyncio
+    async def test_fetch_json_02(self, serve, tmp_path):
+        """Ensure the recorded responses are replayed without using the network."""
+        requests = []
+
+        async def handler(request):
+            requests.append(request)
+            return aiohttp.web.json_response(json.loads(GEOCENSUS_RESPONSE))
+
+        url = f'{await serve(handler)}/'
+        cassette = Cassette(tmp_path / 'cassette.json', record=True)
+        async with aiohttp.ClientSession() as session:
+            recorded = await fetch_json(session, url, {'street': 'a'}, cassette=cassette)
+        cassette.save()
+
+        cassette = Cassette(tmp_path / 'cassette.json')
+        async with aiohttp.ClientSession() as session:
+            replayed = await fetch_json(session, url, {'street': 'a'}, cassette=cassette)
+            missing = await fetch_json(session, url, {'street': 'b'}, cassette=cassette)
+        assert recorded == json.loads(GEOCENSUS_RESPONSE)
+        assert replayed == recorded
+        assert missing is None
+        assert (cassette.hits, cassette.misses) == (1, 1)
+        assert len(requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_fetch_json_03(self):
+        """Ensure the injected errors are retried like throttled requests."""
+        cassette = Cassette(CASSETTE_PATH, error_rate=1)
+        params = build_params({'location': '8100 Block of N. Lamar Blvd.'})
+        with metrics.stage('geocoding') as stage:
+            async with aiohttp.ClientSession() as session:
+                actual = await fetch_json(session, 'http://localhost/', params, retries=1, cassette=cassette)
+        assert actual is None
+        expected = {'http_requests': 2, 'http_retries': 1, 'http_throttled': 2, 'http_failures': 1}
+        assert stage['counters'] == expected
+
+    @pytest.mark.parametrize('row,expected', [
+        ([
+            '0', '8100 n. lamar blvd., Austin, TX, ', 'Match', 'Exact', '8100 N LAMAR BLVD, AUSTIN, TX, 78753',
+            '-97.710434,30.350113', '63973393', 'L', '48', '453', '001811', '1006'
+        ], {
+            'latitude': 30.350113,
+            'longitude': -97.710434
+        }),
+        (['1', 'unknown, Austin, TX, ', 'No_Match'], {}),
+        (['2', 'lamar, Austin, TX, ', 'Tie'], {}),
+        (['3'], {}),
+        (['4', 'garbled, Austin, TX, ', 'Match', 'Exact', 'GARBLED, AUSTIN, TX', '-97.710434'], {}),
+    ])
+    def test_parse_geocensus_batch_row_00(self, row, expected):
+        """Ensure a batch row is parsed like a geocensus response."""
+        actual = parse_geocensus_batch_row(row)
+        assert actual == expected
+
+    @pytest.mark.asyncio
+    async def test_async_update_entries_batch_00(self, serve):
+        """Ensure the batch mode geocodes the addresses, falls back to single requests for the ties, and ignores the
+        malformed rows."""
+        uploads = []
+
+        async def batch_handler(request):
+            data = await request.post()
+            upload = data['addressFile'].file.read().decode()
+            uploads.append(upload)
+            rows = [
+                GEOCENSUS_BATCH_ROWS.get(row[1], '"{id}","","Tie"').format(id=row[0])
+                for row in csv.reader(io.StringIO(upload))
+            ]
+            return aiohttp.web.Response(text='\n'.join(rows), content_type='text/csv')
+
+        async def handler(request):
+            return aiohttp.web.json_response(json.loads(GEOCENSUS_RESPONSE))
+
+        url = await serve(handler, batch_handler)
+        entries = [
+            {
+                'case': '19-0400694',
+                'location': '8100 Block of N. Lamar Blvd.'
+            },
+            {
+                'case': '19-0400695',
+                'location': 'nowhere'
+            },
+            {
+                'case': '19-0400696',
+                'location': 'lamar'
+            },
+            {
+                'case': '19-0400697',
+                'location': 'garbled'
+            },
+        ]
+        actual = await async_update_entries(entries, url=f'{url}/', batch_size=2, batch_url=f'{url}/batch')
+        expected = [
+            {
+                'case': '19-0400694',
+                'latitude': 30.350113,
+                'longitude': -97.710434
+            },
+            {
+                'case': '19-0400696',
+                'latitude': 38.846565,
+                'longitude': -76.926956
+            },
+        ]
+        assert actual == expected
+        assert len(uploads) == 2
+
+    @pytest.mark.parametrize('address,expected', [
+        ('8100 Block of N. Lamar Blvd.', {
+            'latitude': 30.350113,
+            'longitude': -97.710434
+        }),
+        ('8300 N Lamar Boulevard', {
+            'latitude': 30.352113,
+            'longitude': -97.712434
+        }),
+        ('8530 N Lamar Blvd', {
+            'latitude': 30.354113,
+            'longitude': -97.714434
+        }),
+        ('8300 N Lamarr Blvd', {
+            'latitude': 30.352113,
+            'longitude': -97.712434
+        }),
+        ('Sandshof Drive/Loyola Lane', {
+            'latitude': 30.302634,
+            'longitude': -97.660994
+        }),
+        ('9000 N Lamar Blvd', {}),
+        ('100 Congress Ave', {}),
+    ])
+    def test_offline_geocoder_00(self, address, expected):
+        """Ensure the offline geocoder finds, interpolates and fuzzy-matches the addresses."""
+        geocoder = OfflineGeocoder()
+        geocoder.add('8100 n. lamar blvd.', 30.350113, -97.710434)
+        geocoder.add('8500 N Lamar Blvd', '30.354113', '-97.714434')
+        geocoder.add('loyola ln and sandshof dr', 30.302634, -97.660994)
+        geocoder.add('100 Congress Ave', 0, 0)
+        actual = geocoder.lookup(address)
+        assert actual == expected
+
+    def test_offline_geocoder_01(self, tmp_path):
+        """Ensure the geolocations found offline are not used to build the offline geocoder."""
+        (tmp_path / 'datasets').mkdir()
+        (tmp_path / 'augmentations' / '2019').mkdir(parents=True)
+        raw = [{
+            'case': '19-0400694',
+            'location': '8100 N Lamar Blvd'
+        }, {
+            'case': '19-0400695',
+            'location': '100 Congress Ave'
+        }]
+        augmentation = [
+            {
+                'case': '19-0400694',
+                'latitude': 30.350113,
+                'longitude': -97.710434
+            },
+            {
+                'case': '19-0400695',
+                'latitude': 30.264,
+                'longitude': -97.743,
+                'geocoder': 'offline'
+            },
+        ]
+        (tmp_path / 'datasets' / 'fatalities-2019-raw.json').write_text(json.dumps(raw))
+        (tmp_path / 'augmentations' / '2019' / 'augmentation-geocoding-geocensus-2019.json').write_text(
+            json.dumps(augmentation))
+        geocoder = OfflineGeocoder.from_directory(tmp_path)
+        assert geocoder.lookup('8100 N Lamar Blvd') == {'latitude': 30.350113, 'longitude': -97.710434}
+        assert geocoder.lookup('100 Congress Ave') == {}
+
+    @pytest.mark.asyncio
+    async def test_async_update_entries_offline_00(self):
+        """Ensure the offline geocoder is used before the network."""
+        geocoder = OfflineGeocoder()
+        geocoder.add('8100 n. lamar blvd.', 30.350113, -97.710434)
+        entries = [{'case': '19-0400694', 'location': '8100 Block of N. Lamar Blvd.'}, {'case': '19-0400695'}]
+        actual = await async_update_entries(entries, geocoder=geocoder, offline_only=True)
+        expected = [{'case': '19-0400694', 'latitude': 30.350113, 'longitude': -97.710434, 'geocoder': 'offline'}]
+        assert actual == expected
+
+    def test_make_cache_key_00(self):
+        """Ensure the cache key ignores the case and the extra spaces."""
+        actual = make_cache_key(build_params({'location': '8100  block of N. Lamar Blvd. '}))
+        expected = ('8100 n. lamar blvd. austin tx', GEO_CENSUS_BENCHMARK, GEO_CENSUS_VINTAGE)
+        assert actual == expected
+
+    def test_geocode_cache_00(self, tmp_path):
+        """Ensure the geolocations and the negative results persist."""
+        cache = GeocodeCache(tmp_path / 'cache.sqlite')
+        cache.set(('a', 'b', 'c'), {'latitude': 30.350113, 'longitude': -97.710434})
+        cache.set(('d', 'b', 'c'), {})
+        cache.close()
+        cache = GeocodeCache(tmp_path / 'cache.sqlite')
+        assert cache.get(('a', 'b', 'c')) == {'latitude': 30.350113, 'longitude': -97.710434}
+        assert cache.get(('d', 'b', 'c')) == {}
+        assert cache.get(('e', 'b', 'c')) is None
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_geocode_cache_01(self):
+        """Ensure the expired entries are ignored."""
+        cache = GeocodeCache(ttl=0, negative_ttl=0)
+        cache.set(('a', 'b', 'c'), {'latitude': 30.350113, 'longitude': -97.710434})
+        assert cache.get(('a', 'b', 'c')) is None
+
+    @pytest.mark.asyncio
+    async def test_async_update_entries_01(self):
+        """Ensure the cached and duplicated addresses do not trigger a request."""
+        cache = GeocodeCache()
+        entries = [
+            {
+                'case': '19-0400694',
+                'location': '8100 Block of N. Lamar Blvd.'
+            },
+            {
+                'case': '19-0400695',
+                'location': '8100 block of n. lamar blvd.'
+            },
+        ]
+        cache.set(make_cache_key(build_params(entries[0])), {'latitude': 30.350113, 'longitude': -97.710434})
+        actual = await async_update_entries(entries, cache)
+        assert [entry['case'] for entry in actual] == ['19-0400694', '19-0400695']
+        assert (cache.hits, cache.misses, cache.coalesced) == (1, 0, 1)
+
+    @pytest.mark.asyncio
+    async def test_async_update_entries_02(self):
+        """Ensure the entries which already have their coordinates are not geocoded again."""
+        cache = GeocodeCache()
+        entries = [{'case': '19-0400694', 'location': 'nowhere', 'latitude': 30.350113, 'longitude': -97.710434}]
+        actual = await async_update_entries(entries, cache)
+        assert actual == []
+        assert (cache.hits, cache.misses) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_async_update_entries_03(self, serve):
+        """Ensure the geolocations found so far are checkpointed."""
+
+        async def handler(request):
+            return aiohttp.web.json_response(json.loads(GEOCENSUS_RESPONSE))
+
+        url = await serve(handler)
+        entries = [{'case': '19-0400694', 'location': '8100 Block of N. Lamar Blvd.'}]
+        checkpoints = []
+        actual = await async_update_entries(entries,
+                                            url=f'{url}/',
+                                            checkpoint=checkpoints.append,
+                                            checkpoint_interval=0)
+        assert checkpoints == [actual]
+        assert actual == [{'case': '19-0400694', 'latitude': 38.846565, 'longitude': -76.926956}]
+
+    @pytest.mark.asyncio
+    async def test_async_update_entries_04(self, serve):
+        """Ensure the cases which could not be geocoded are reported."""
+
+        async def handler(request):
+            return aiohttp.web.Response(status=503)
+
+        url = await serve(handler)
+        entries = [{'case': '19-0400694', 'location': '8100 Block of N. Lamar Blvd.'}]
+        failures = []
+        actual = await async_update_entries(entries, url=f'{url}/', retries=0, failures=failures)
+        assert actual == []
+        assert failures == ['19-0400694']
+
+    def test_split_entries_00(self):
+        """Ensure only the new entries and the entries whose location changed are geocoded again."""
+        entries = [
+            {
+                'case': '19-0400694',
+                'location': '8100 Block of N. Lamar Blvd.',
+                'latitude': 30.350113,
+                'longitude': -97.710434
+            },
+            {
+                'case': '19-0400695',
+                'location': 'Sandshof Drive/Loyola Lane',
+                'latitude': 30.350113,
+                'longitude': -97.710434
+            },
+            {
+                'case': '19-0400696',
+                'location': '100 Congress Ave'
+            },
+            {
+                'case': '19-0400697',
+                'location': '8500 N Lamar Blvd'
+            },
+        ]
+        augmentation = [
+            {
+                'case': '19-0400694',
+                'latitude': 30.350113,
+                'location': '8100 Block of N. Lamar Blvd.',
+                'longitude': -97.710434
+            },
+            {
+                'case': '19-0400695',
+                'latitude': 30.350113,
+                'location': '8100 Block of N. Lamar Blvd.',
+                'longitude': -97.710434
+            },
+            {
+                'case': '19-0400696',
+                'latitude': 30.268,
+                'longitude': -97.743
+            },
+            {
+                'case': '19-0400698',
+                'latitude': 30.268,
+                'longitude': -97.743
+            },
+        ]
+        kept, pending = split_entries(entries, augmentation)
+        assert kept == [augmentation[0], {**augmentation[2], 'location': '100 Congress Ave'}]
+        assert pending == [{'case': '19-0400695', 'location': 'Sandshof Drive/Loyola Lane'}, entries[3]]
+
+    def test_augment_00(self, tmp_path):
+        """Ensure an augmentation file is updated incrementally."""
+        path = tmp_path / 'augmentation-geocoding-geocensus-2019.json'
+        path.write_text(json.dumps([{'case': '19-0400694', 'latitude': 30.350113, 'longitude': -97.710434}]))
+        entries = [
+            {
+                'case': '19-0400694',
+                'location': '8100 Block of N. Lamar Blvd.'
+            },
+            {
+                'case': '19-0400695',
+                'location': 'nowhere'
+            },
+        ]
+        actual = augment(entries, ':memory:', offline_only=True, augmentation_path=path)
+        expected = [{
+            'case': '19-0400694',
+            'latitude': 30.350113,
+            'location': '8100 Block of N. Lamar Blvd.',
+            'longitude': -97.710434
+        }]
+        assert actual == expected
+        assert read_augmentation(path) == expected
+
+
+GEOCENSUS_BATCH_ROWS = {
+    '8100 n. lamar blvd.': '"{id}","8100 n. lamar blvd., Austin, TX, ","Match","Exact","8100 N LAMAR BLVD, AUSTIN, TX, 78753",'
+    '"-97.710434,30.350113","63973393","L","48","453","001811","1006"',
+    'nowhere': '"{id}","nowhere, Austin, TX, ","No_Match"',
+    'garbled': '"{id}","garbled"',
+}
+
+GEOCENSUS_RESPONSE = """
+{
+    "result": {
+        "input": {
+            "address": {
+                "address": "4600 Silver Hill Rd, Suitland, MD 20746"
+            },
+            "benchmark": {
+                "id": 9,
+                "benchmarkName": "Public_AR_Census2010",
+                "benchmarkDescription": "Public Address  Ranges – Census 2010",
+                "isDefault": false
+            }
+        },
+        "addressMatches": [{
+            "matchedAddress": "4600 Silver  Hill  Rd, SUITLAND, MD, 20746",
+            "coordinates": {
+                "x": -76.926956,
+                "y": 38.846565
+            },
+            "tigerLine": {
+                "tigerLineId": "613199520",
+                "side": "L"
+            },
+            "addressComponents": {
+                "fromAddress": "4600",
+                "toAddress": "4712",
+                "preQualifier": "",
+                "preDirection": "",
+                "preType": "",
+                "streetName": "Silver Hill",
+                "suffixType": "Rd",
+                "suffixDirection": "",
+                "suffixQualifier": "",
+                "city": "SUITLAND",
+                "state": "MD",
+                "zip": "20746"
+            }
+        }]
+    }
+}
+"""
@@ -0,0 +1,160 @@
+"""Tests of `scrapd_datasets.linkage`."""
+import pytest
+
+from scrapd_datasets import linkage
+from scrapd_datasets import metrics
+from scrapd_datasets.linkage import compare_coordinates
+from scrapd_datasets.linkage import compare_dates
+from scrapd_datasets.linkage import compare_times
+from scrapd_datasets.linkage import get_blocking_keys
+from scrapd_datasets.linkage import link
+from scrapd_datasets.linkage import prepare
+from scrapd_datasets.linkage import score
+
+
+class TestLinkage:
+    def test_link_00(self):
+        """Ensure the truncated and mistyped case numbers are linked."""
+        scrapd = {
+            '17-2080': {
+                'crash': 34,
+                'date': '2017-07-27',
+                'location': '800 Bastrop Highway',
+                'time': '22:57:00'
+            },
+            '18-160882': {
+                'crash': 2,
+                'date': '2018-01-16',
+                'location': '1500 W. Slaughter Lane',
+                'time': '17:14:00'
+            },
+        }
+        socrata = {
+            '17-2080502': {
+                'crash': '34',
+                'date': '2017-07-27',
+                'location': '800 blk bastrop hwy',
+                'time': '08:52:00'
+            },
+            '18-0160882': {
+                'crash': '2',
+                'date': '2018-01-16',
+                'location': '1500 w slaughter ln',
+                'time': '17:14:00'
+            },
+        }
+        links, reviews = link(scrapd, socrata)
+        assert links == {'17-2080502': '17-2080', '18-0160882': '18-160882'}
+        assert reviews == []
+
+    def test_link_01(self):
+        """Ensure each entry is linked at most once, and the pairs which are not linked are reported."""
+        scrapd = {'19-1': {'crash': 5, 'date': '2019-03-02', 'location': '100 Cameron Road', 'time': '10:00:00'}}
+        socrata = {
+            '19-0000001': {
+                'crash': '5',
+                'date': '2019-03-02',
+                'location': '100 cameron rd',
+                'time': '10:05:00'
+            },
+            '19-0000002': {
+                'crash': '5',
+                'date': '2019-03-02',
+                'location': '100 cameron rd',
+                'time': '13:00:00'
+            },
+            '19-0000003': {
+                'crash': '6',
+                'date': '2019-03-03',
+                'location': '9000 research blvd',
+                'time': '23:00:00'
+            },
+        }
+        links, reviews = link(scrapd, socrata)
+        assert links == {'19-0000001': '19-1'}
+        assert reviews == []
+
+        links, reviews = link(scrapd, socrata, threshold=1)
+        assert links == {}
+        assert [(scrapd_case, socrata_case) for _, scrapd_case, socrata_case in reviews] == [
+            ('19-1', '19-0000001'),
+            ('19-1', '19-0000002'),
+        ]
+
+    def test_link_02(self, monkeypatch):
+        """Ensure only the records sharing a blocking key are compared."""
+        monkeypatch.setattr(linkage, 'MAX_BLOCK_SIZE', 2)
+        scrapd = {
+            f'19-{i}': {
+                'crash': i,
+                'date': f'2019-01-{i:02}',
+                'location': f'{i}00 Burnet Road'
+            }
+            for i in range(1, 11)
+        }
+        socrata = {'19-0000003': {'crash': '3', 'date': '2019-01-03', 'location': '300 burnet rd'}}
+        with metrics.stage('linkage') as stage:
+            links, _ = link(scrapd, socrata)
+        assert links == {'19-0000003': '19-3'}
+        assert stage['counters']['linkage_candidates'] == 1
+
+    def test_prepare_00(self):
+        """Ensure the records are normalized."""
+        actual = prepare(
+            '18-0041689', {
+                'crash': '007',
+                'date': '2018-01-04',
+                'latitude': 0.0,
+                'location': '5600 Block N IH 35 NB',
+                'longitude': 0.0,
+                'time': '23:25:00',
+            })
+        expected = {
+            'year': '2018',
+            'date': '2018-01-04',
+            'crash': '7',
+            'location': (5600, 'n ih 35'),
+            'time': 23 * 60 + 25,
+            'coordinates': None,
+        }
+        assert actual == expected
+
+    def test_prepare_01(self):
+        """Ensure the year is taken from the case number when the date is missing."""
+        actual = prepare('18-0041689', {'date': '01/04/2018'})
+        assert (actual['year'], actual['date'], actual['location']) == ('2018', None, None)
+
+    def test_get_blocking_keys_00(self):
+        """Ensure the common street tokens are not blocking keys."""
+        record = prepare('18-1', {'crash': 1, 'date': '2018-01-04', 'location': '5600 N Lamar Blvd'})
+        actual = get_blocking_keys(record)
+        assert actual == {('date', '2018-01-04'), ('crash', '2018', '1'), ('street', '2018', 'lamar')}
+
+    def test_score_00(self):
+        """Ensure the missing fields count as half similar."""
+        a = prepare('18-1', {'date': '2018-01-04'})
+        b = prepare('18-2', {'date': '2018-01-04'})
+        assert score(a, b) == pytest.approx((3 + 0.5 * 8) / 11)
+
+    @pytest.mark.parametrize('a,b,expected', [
+        ('2018-01-04', '2018-01-04', 1),
+        ('2018-01-04', '2018-01-05', 0.5),
+        ('2018-12-31', '2019-01-01', 0.5),
+        ('2018-01-04', '2018-01-06', 0),
+    ])
+    def test_compare_dates_00(self, a, b, expected):
+        assert compare_dates(a, b) == expected
+
+    @pytest.mark.parametrize('a,b,expected', [
+        (600, 600, 1),
+        (600, 660, 0.5),
+        (10, 24 * 60 - 20, 0.75),
+        (0, 720, 0),
+    ])
+    def test_compare_times_00(self, a, b, expected):
+        assert compare_times(a, b) == expected
+
+    def test_compare_coordinates_00(self):
+        assert compare_coordinates((30.3, -97.7), (30.3, -97.7)) == 1
+        assert compare_coordinates((30.3, -97.7), (30.3045, -97.7)) == pytest.approx(0.5, abs=0.01)
+        assert compare_coordinates((30.3, -97.7), (30.4, -97.7)) == 0
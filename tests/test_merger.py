@@ -0,0 +1,405 @@
+"""Tests of `scrapd_datasets.merger`."""
+import copy
+import datetime
+import io
+import json
+
+import pytest
+from scrapd.core import model
+
+from scrapd_datasets.merger import apply_delta
+from scrapd_datasets.merger import apply_patch
+from scrapd_datasets.merger import diff
+from scrapd_datasets.merger import iter_delta
+from scrapd_datasets.merger import load_trusted
+from scrapd_datasets.merger import merge
+from scrapd_datasets.merger import merge_stream
+from scrapd_datasets.merger import new_delta
+from scrapd_datasets.merger import remember_entries
+from scrapd_datasets.merger import write_records
+from scrapd_datasets.serializer import to_json
+
+
+class TestMerge:
+    def test_merge_00(self):
+        actual = merge(OLD, NEW, True)
+        expected = FINAL
+        assert actual == expected
+
+    def test_merge_01(self):
+        actual = merge(OLD_SINGLE_TO_MULTI, NEW_SINGLE_TO_MULTI, True)
+        expected = FINAL_SINGLE_TO_MULTI
+        assert actual[0].dict() == expected[0].dict()
+
+    @pytest.mark.parametrize('update', [True, False])
+    def test_merge_stream_00(self, update):
+        """Ensure the streamed merge produces the same output as the regular merge."""
+        old = sorted(OLD + OLD_SINGLE_TO_MULTI, key=lambda x: x['case'])
+        new = sorted(NEW + NEW_SINGLE_TO_MULTI, key=lambda x: x['case'])
+        expected = to_json(sorted(merge(copy.deepcopy(old), copy.deepcopy(new), update), key=lambda x: x.case))
+        actual = io.StringIO()
+        write_records(actual, merge_stream(iter(old), iter(new), update))
+        assert actual.getvalue() == expected
+
+    @pytest.mark.parametrize('update', [True, False])
+    def test_merge_02(self, update):
+        """Ensure the trusted data and the unchanged entries produce the same output."""
+        old = json.loads(to_json(sorted(merge(OLD, NEW, True), key=lambda x: x.case)))
+        expected = to_json(sorted(merge(copy.deepcopy(old), NEW, update), key=lambda x: x.case))
+        actual = to_json(sorted(merge(copy.deepcopy(old), NEW, update, trusted=True), key=lambda x: x.case))
+        assert actual == expected
+
+    def test_load_trusted_00(self):
+        """Ensure a trusted entry is loaded with the default values."""
+        actual = load_trusted({'case': '19-0400694', 'fatalities': [{'age': 13}], 'unknown': 1})
+        assert actual.latitude == 0.0
+        assert actual.fatalities[0].age == 13
+        assert actual.fatalities[0].gender == model.Gender.undefined
+        assert not hasattr(actual, 'unknown')
+
+    def test_merge_stream_01(self):
+        """Ensure unsorted data sets are rejected."""
+        with pytest.raises(ValueError):
+            list(merge_stream(iter(NEW), iter([]), True))
+
+    def test_write_records_00(self):
+        """Ensure an empty data set is written like `to_json` does."""
+        actual = io.StringIO()
+        write_records(actual, iter([]))
+        assert actual.getvalue() == to_json([])
+
+    @pytest.mark.parametrize('old,new,expected', [
+        ({
+            'a': 1
+        }, {
+            'a': 1
+        }, []),
+        ({
+            'a': 1
+        }, {
+            'a': 2
+        }, [{
+            'op': 'replace',
+            'path': '/a',
+            'value': 2
+        }]),
+        ({
+            'a': 1,
+            'b/c': 2
+        }, {
+            'a': 1,
+            'd~': 3
+        }, [
+            {
+                'op': 'remove',
+                'path': '/b~1c'
+            },
+            {
+                'op': 'add',
+                'path': '/d~0',
+                'value': 3
+            },
+        ]),
+        ({
+            'f': [{
+                'age': 1
+            }, {
+                'age': 2
+            }]
+        }, {
+            'f': [{
+                'age': 1
+            }, {
+                'age': 3
+            }]
+        }, [
+            {
+                'op': 'replace',
+                'path': '/f/1/age',
+                'value': 3
+            },
+        ]),
+        ({
+            'f': [{
+                'age': 1
+            }]
+        }, {
+            'f': []
+        }, [{
+            'op': 'replace',
+            'path': '/f',
+            'value': []
+        }]),
+    ])
+    def test_diff_00(self, old, new, expected):
+        actual = diff(old, new)
+        assert actual == expected
+        assert apply_patch(copy.deepcopy(old), actual) == new
+
+    @pytest.mark.parametrize('update', [True, False])
+    def test_iter_delta_00(self, update):
+        """Ensure applying the delta to the old data set produces the merged data set."""
+        old = json.loads(to_json(sorted(OLD + OLD_SINGLE_TO_MULTI, key=lambda x: x['case'])))
+        new = sorted(NEW + NEW_SINGLE_TO_MULTI, key=lambda x: x['case'])
+        old_entries = {}
+        delta = new_delta()
+        results = list(
+            iter_delta(old_entries, merge_stream(remember_entries(iter(old), old_entries), iter(new), update), delta))
+        assert old_entries == {}
+        assert [e['case'] for e in delta['added']] == ['19-0150158']
+        assert [c['case'] for c in delta['changed']] == ['19-0400694', '20-0420110']
+        assert {'op': 'replace', 'path': '/latitude', 'value': 30.303625} in delta['changed'][0]['patch']
+        assert apply_delta(copy.deepcopy(old), delta) == json.loads(to_json(results))
+
+
+# Test data
+OLD = [
+    {
+        "case": "19-0400694",
+        "crash": 7,
+        "date": "2019-02-09",
+        "fatalities": [{
+            "age": 13,
+            "dob": "2005-12-05",
+            "ethnicity": "Black",
+            "first": "Messiah",
+            "gender": "Male",
+            "generation": "",
+            "last": "Mouton",
+            "middle": ""
+        }],
+        "latitude": 0.0,
+        "link": "http://austintexas.gov/news/traffic-fatality-7-4",
+        "location": "6000 block of Springdale Road",
+        "longitude": 0.0,
+        "notes": "The preliminary investigation shows that the driver of a 1997, red BMW was traveling northbound in the 6000 block of Springdale Road and lost control. The vehicle skidded sideways before flipping and striking a utility pole.\n\n\tThe passenger in the vehicle, Messiah Zion Mouton, was pronounced deceased at the scene.",
+        "time": "12:48:00"
+    },
+]
+
+NEW = [
+    {
+        "case": "19-0400694",
+        "crash": 7,
+        "date": "2019-02-09",
+        "fatalities": [{
+            "age": 13,
+            "dob": "2005-12-05",
+            "ethnicity": "Black",
+            "first": "Messiah",
+            "gender": "Male",
+            "generation": "",
+            "last": "Mouton",
+            "middle": ""
+        }],
+        "latitude": 30.303625,
+        "link": "http://austintexas.gov/news/traffic-fatality-7-4",
+        "location": "6000 block of Springdale Road",
+        "longitude": -97.67139,
+        "notes": "The preliminary investigation shows that the driver of a 1997, red BMW was traveling northbound in the 6000 block of Springdale Road and lost control. The vehicle skidded sideways before flipping and striking a utility pole.\n\n\tThe passenger in the vehicle, Messiah Zion Mouton, was pronounced deceased at the scene.",
+        "time": "12:48:00"
+    },
+    {
+        "case": "19-0150158",
+        "crash": 1,
+        "date": "2019-01-15",
+        "fatalities": [{
+            "age": 31,
+            "dob": "1987-07-09",
+            "ethnicity": "White",
+            "first": "David",
+            "gender": "Male",
+            "generation": "",
+            "last": "Sell",
+            "middle": ""
+        }],
+        "latitude": 0.0,
+        "link": "http://austintexas.gov/news/traffic-fatality-1-4",
+        "location": "10500 block of N IH 35 SB",
+        "longitude": 0.0,
+        "notes": "The preliminary investigation shows that a 2000 Peterbilt semi truck was travelling southbound in the center lane on IH 35 when it struck pedestrian David Sell. The driver stopped as soon as it was possible to do so and remained on scene. He reported not seeing the pedestrian prior to impact given that it was still dark at the time of the crash. Sell was pronounced deceased at the scene at 6:24 a.m. No charges are expected to be filed.",
+        "time": "06:20:00"
+    },
+]
+
+FINAL_JSON = [
+    {
+        "case": "19-0400694",
+        "crash": 7,
+        "date": "2019-02-09",
+        "fatalities": [{
+            "age": 13,
+            "dob": "2005-12-05",
+            "ethnicity": "Black",
+            "first": "Messiah",
+            "gender": "Male",
+            "generation": "",
+            "last": "Mouton",
+            "middle": ""
+        }],
+        "latitude": 30.303625,
+        "link": "http://austintexas.gov/news/traffic-fatality-7-4",
+        "location": "6000 block of Springdale Road",
+        "longitude": -97.67139,
+        "notes": "The preliminary investigation shows that the driver of a 1997, red BMW was traveling northbound in the 6000 block of Springdale Road and lost control. The vehicle skidded sideways before flipping and striking a utility pole.\n\n\tThe passenger in the vehicle, Messiah Zion Mouton, was pronounced deceased at the scene.",
+        "time": "12:48:00"
+    },
+    {
+        "case": "19-0150158",
+        "crash": 1,
+        "date": "2019-01-15",
+        "fatalities": [{
+            "age": 31,
+            "dob": "1987-07-09",
+            "ethnicity": "White",
+            "first": "David",
+            "gender": "Male",
+            "generation": "",
+            "last": "Sell",
+            "middle": ""
+        }],
+        "latitude": 0.0,
+        "link": "http://austintexas.gov/news/traffic-fatality-1-4",
+        "location": "10500 block of N IH 35 SB",
+        "longitude": 0.0,
+        "notes": "The preliminary investigation shows that a 2000 Peterbilt semi truck was travelling southbound in the center lane on IH 35 when it struck pedestrian David Sell. The driver stopped as soon as it was possible to do so and remained on scene. He reported not seeing the pedestrian prior to impact given that it was still dark at the time of the crash. Sell was pronounced deceased at the scene at 6:24 a.m. No charges are expected to be filed.",
+        "time": "06:20:00"
+    },
+]
+
+FINAL = [
+    model.Report(
+        case="19-0400694",
+        crash=7,
+        date=datetime.date(2019, 2, 9),
+        fatalities=[
+            model.Fatality(
+                age=13,
+                dob=datetime.date(2005, 12, 5),
+                ethnicity=model.Ethnicity.black,
+                first="Messiah",
+                gender=model.Gender.male,
+                generation="",
+                last="Mouton",
+                middle="",
+            ),
+        ],
+        latitude=30.303625,
+        link="http://austintexas.gov/news/traffic-fatality-7-4",
+        location="6000 block of Springdale Road",
+        longitude=-97.67139,
+        notes=
+        "The preliminary investigation shows that the driver of a 1997, red BMW was traveling northbound in the 6000 block of Springdale Road and lost control. The vehicle skidded sideways before flipping and striking a utility pole.\n\n\tThe passenger in the vehicle, Messiah Zion Mouton, was pronounced deceased at the scene.",
+        time="12:48:00"),
+    model.Report(
+        case="19-0150158",
+        crash=1,
+        date="2019-01-15",
+        fatalities=[
+            model.Fatality(
+                age=31,
+                dob="1987-07-09",
+                ethnicity=model.Ethnicity.white,
+                first="David",
+                gender=model.Gender.male,
+                generation="",
+                last="Sell",
+                middle="",
+            ),
+        ],
+        latitude=0.0,
+        link="http://austintexas.gov/news/traffic-fatality-1-4",
+        location="10500 block of N IH 35 SB",
+        longitude=0.0,
+        notes=
+        "The preliminary investigation shows that a 2000 Peterbilt semi truck was travelling southbound in the center lane on IH 35 when it struck pedestrian David Sell. The driver stopped as soon as it was possible to do so and remained on scene. He reported not seeing the pedestrian prior to impact given that it was still dark at the time of the crash. Sell was pronounced deceased at the scene at 6:24 a.m. No charges are expected to be filed.",
+        time="06:20:00",
+    ),
+]
+
+OLD_SINGLE_TO_MULTI = [{
+    "case": "20-0420110",
+    "crash": 15,
+    "date": "2020-02-11",
+    "fatalities": [{
+        "age": 21,
+        "dob": "1998-04-28",
+        "ethnicity": "White",
+        "first": "Owen",
+        "gender": "Male",
+        "generation": "",
+        "last": "Macki",
+        "middle": "William"
+    }],
+    "latitude": 0.0,
+    "link": "http://austintexas.gov/news/fatality-crash-15-2",
+    "location": "North Capital of Texas Hwy/North Mopac NB Svrd",
+    "longitude": 0.0,
+    "notes": "",
+    "time": "02:02:00"
+}]
+
+NEW_SINGLE_TO_MULTI = [{
+    "case": "20-0420110",
+    "crash": 15,
+    "date": "2020-02-11",
+    "fatalities": [
+        {
+            "age": 21,
+            "dob": "1998-04-28",
+            "ethnicity": "White",
+            "first": "Owen",
+            "gender": "Male",
+            "generation": "",
+            "last": "Macki",
+            "middle": "William"
+        },
+        {
+            "age": 24,
+            "dob": "1995-07-26",
+            "ethnicity": "Asian",
+            "first": "Raquel",
+            "gender": "Female",
+            "generation": "",
+            "last": "Aveytia",
+            "middle": "Gitane"
+        },
+    ],
+    "link": "http://austintexas.gov/news/fatality-crash-15-2",
+    "location": "North Capital of Texas Hwy/North Mopac NB Svrd",
+    "time": "02:02:00"
+}]
+
+FINAL_SINGLE_TO_MULTI = [
+    model.Report(
+        case='20-0420110',
+        crash=15,
+        date=datetime.date(2020, 2, 11),
+        fatalities=[
+            model.Fatality(
+                age=21,
+                dob=datetime.date(1998, 4, 28),
+                ethnicity=model.Ethnicity.white,
+                first='Owen',
+                gender=model.Gender.male,
+                last='Macki',
+                middle='William',
+            ),
+            model.Fatality(
+                age=24,
+                dob=datetime.date(1995, 7, 26),
+                ethnicity=model.Ethnicity.asian,
+                first='Raquel',
+                gender=model.Gender.female,
+                last='Aveytia',
+                middle='Gitane',
+            ),
+        ],
+        latitude=0.0,
+        link="http://austintexas.gov/news/fatality-crash-15-2",
+        location='North Capital of Texas Hwy/North Mopac NB Svrd',
+        longitude=0.0,
+        notes='',
+        time=datetime.time(2, 2),
+    )
+]
@@ -0,0 +1,106 @@
+"""Tests of `scrapd_datasets.metrics`."""
+import pathlib
+
+from scrapd_datasets.metrics import Metrics
+from scrapd_datasets.metrics import collect
+from scrapd_datasets.metrics import escape_label
+from scrapd_datasets.metrics import iter_counted
+from scrapd_datasets.metrics import to_prometheus
+
+
+class TestMetrics:
+    def test_stage_00(self):
+        """Ensure a stage is measured and its counters are recorded."""
+        metrics = Metrics('test')
+        with metrics.stage('merge', year=2019) as s:
+            metrics.count('cache_hits')
+            metrics.count('cache_hits', 2)
+            s['records_in'] = 10
+            s['records_out'] = 5
+        metrics.count('ignored')
+        actual = metrics.stages[0]
+        assert actual['stage'] == 'merge'
+        assert actual['labels'] == {'year': '2019'}
+        assert actual['counters'] == {'cache_hits': 3}
+        assert actual['records_in'] == 10
+        assert actual['wall_seconds'] >= 0
+        assert actual['cpu_seconds'] >= 0
+        assert actual['peak_rss_bytes'] > 0
+
+    def test_stage_01(self):
+        """Ensure the counters go to the innermost stage, and the peak RSS is propagated to the parent stage."""
+        metrics = Metrics('test')
+        with metrics.stage('year'):
+            with metrics.stage('geocoding'):
+                metrics.count('http_requests')
+                data = bytearray(32 * 1024 * 1024)
+                data[::4096] = b'\x01' * len(data[::4096])
+            del data
+        inner, outer = metrics.stages
+        assert inner['counters'] == {'http_requests': 1}
+        assert outer['counters'] == {}
+        assert outer['peak_rss_bytes'] >= inner['peak_rss_bytes'] > 32 * 1024 * 1024
+        assert 'peak_rss_child' not in outer
+
+    def test_stage_02(self, tmp_path):
+        """Ensure a stage is profiled."""
+        metrics = Metrics('test', profiler='cprofile', profile_dir=tmp_path)
+        with metrics.stage('merge', year=2019):
+            with metrics.stage('inner'):
+                sum(range(1000))
+        inner, outer = metrics.stages
+        assert 'profile' not in inner
+        assert pathlib.Path(outer['profile']).parent == tmp_path
+        assert pathlib.Path(outer['profile']).name.startswith('test-merge-2019-')
+        assert pathlib.Path(outer['profile']).exists()
+
+    def test_iter_counted_00(self):
+        metrics = Metrics('test')
+        with metrics.stage('merge') as s:
+            assert list(iter_counted(iter('abc'), s, 'records_in')) == ['a', 'b', 'c']
+            assert list(iter_counted(iter('de'), s, 'records_in')) == ['d', 'e']
+        assert metrics.stages[0]['records_in'] == 5
+
+    def test_collect_00(self, tmp_path):
+        for tool in ['merger', 'combiner']:
+            metrics = Metrics(tool)
+            with metrics.stage('run'):
+                pass
+            metrics.save(tmp_path)
+        Metrics('empty').save(tmp_path)
+        actual = collect(tmp_path)
+        assert [s['tool'] for s in actual] == ['merger', 'combiner']
+
+    def test_to_prometheus_00(self):
+        stages = [
+            {
+                'counters': {
+                    'cache_hits': 2
+                },
+                'cpu_seconds': 0.5,
+                'labels': {
+                    'year': '2019'
+                },
+                'peak_rss_bytes': 100,
+                'records_in': 10,
+                'records_out': None,
+                'stage': 'geocoding',
+                'tool': 'scrapd-pipeline',
+                'wall_seconds': 1.5,
+            },
+        ]
+        actual = to_prometheus(stages + stages)
+        labels = '{stage="geocoding",tool="scrapd-pipeline",year="2019"}'
+        assert '# TYPE scrapd_datasets_stage_wall_seconds gauge\n' in actual
+        assert f'scrapd_datasets_stage_wall_seconds{labels} 3.0\n' in actual
+        assert f'scrapd_datasets_stage_peak_rss_bytes{labels} 100\n' in actual
+        assert f'scrapd_datasets_cache_hits_total{labels} 4\n' in actual
+        assert '# HELP scrapd_datasets_cache_hits_total Number of cache hits.\n' in actual
+        assert '# TYPE scrapd_datasets_cache_hits_total counter\n' in actual
+        assert 'records_out' not in actual
+
+    def test_to_prometheus_01(self):
+        assert to_prometheus([]) == ''
+
+    def test_escape_label_00(self):
+        assert escape_label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
@@ -0,0 +1,99 @@
+"""Tests of `scrapd-pipeline`."""
+import json
+
+import pytest
+
+from conftest import load_tool
+from scrapd_datasets import metrics
+
+pipeline = load_tool('scrapd-pipeline')
+build_manifest = pipeline.build_manifest
+find_years = pipeline.find_years
+process_year = pipeline.process_year
+process_years = pipeline.process_years
+read_manifest = pipeline.read_manifest
+write_manifest = pipeline.write_manifest
+
+
+class TestPipeline:
+    def test_find_years_00(self, tmp_path):
+        """Ensure only the raw data sets are used to find the years."""
+        for name in ['fatalities-2019-raw.json', 'fatalities-2018-raw.json', 'fatalities-2018-augmented.json']:
+            (tmp_path / name).write_text('[]')
+        actual = find_years(tmp_path)
+        expected = [2018, 2019]
+        assert actual == expected
+
+    def test_process_year_00(self, tmp_path):
+        """Ensure the augmentations are applied to the raw data set."""
+        dataset_dir = tmp_path / 'datasets'
+        augmentation_dir = tmp_path / 'augmentations'
+        (augmentation_dir / '2019').mkdir(parents=True)
+        dataset_dir.mkdir()
+        (dataset_dir / 'fatalities-2019-raw.json').write_text(json.dumps(RAW))
+        (augmentation_dir / '2019' / 'augmentation-test-2019.json').write_text(json.dumps(AUGMENTATION))
+        process_year(2019, dataset_dir, augmentation_dir, [])
+        actual = json.loads((dataset_dir / 'fatalities-2019-augmented.json').read_text())
+        assert actual[0]['case'] == '19-0150158'
+        assert actual[1]['latitude'] == 30.303625
+        assert actual[1]['longitude'] == -97.67139
+
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_process_years_00(self, tmp_path, jobs):
+        """Ensure the years are processed and returned in order."""
+        dataset_dir = tmp_path / 'datasets'
+        augmentation_dir = tmp_path / 'augmentations'
+        dataset_dir.mkdir()
+        for year in [2018, 2019]:
+            (augmentation_dir / str(year)).mkdir(parents=True)
+            (dataset_dir / f'fatalities-{year}-raw.json').write_text(json.dumps(RAW))
+        start = len(metrics.METRICS.stages)
+        actual = list(process_years([2019, 2018], jobs, dataset_dir, augmentation_dir, []))
+        assert actual == [(2019, []), (2018, [])]
+        assert (dataset_dir / 'fatalities-2018-augmented.json').exists()
+
+        # The stages of the worker processes are reported by the main process.
+        stages = metrics.METRICS.stages[start:]
+        assert {(s['stage'], s['labels']['year'])
+                for s in stages if s['stage'] in ('load', 'write')} == {
+                    ('load', '2018'),
+                    ('load', '2019'),
+                    ('write', '2018'),
+                    ('write', '2019'),
+                }
+        assert [s['records_out'] for s in stages if s['stage'] == 'load'] == [len(RAW), len(RAW)]
+
+    def test_build_manifest_00(self, tmp_path):
+        """Ensure the manifest changes when an augmentation changes."""
+        (tmp_path / '2019').mkdir()
+        (tmp_path / 'fatalities-2019-raw.json').write_text(json.dumps(RAW))
+        augmentation = tmp_path / '2019' / 'augmentation-test-2019.json'
+        augmentation.write_text(json.dumps(AUGMENTATION))
+        before = build_manifest(2019, tmp_path, tmp_path, [])
+        write_manifest(2019, tmp_path, before)
+        assert read_manifest(2019, tmp_path) == before
+        augmentation.write_text('[]')
+        after = build_manifest(2019, tmp_path, tmp_path, [])
+        assert before['raw'] == after['raw']
+        assert before['augmentations'] != after['augmentations']
+
+
+# Test data.
+RAW = [
+    {
+        "case": "19-0400694",
+        "crash": 7,
+        "date": "2019-02-09",
+        "location": "6000 block of Springdale Road",
+        "time": "12:48:00"
+    },
+    {
+        "case": "19-0150158",
+        "crash": 1,
+        "date": "2019-01-15",
+        "location": "10500 block of N IH 35 SB",
+        "time": "06:20:00"
+    },
+]
+
+AUGMENTATION = [{"case": "19-0400694", "latitude": 30.303625, "longitude": -97.67139}]
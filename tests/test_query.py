@@ -0,0 +1,138 @@
+"""Tests of `scrapd-query`."""
+import pytest
+
+from conftest import load_tool
+
+query = load_tool('scrapd-query')
+QueryEngine = query.QueryEngine
+build_rows = query.build_rows
+iter_bits = query.iter_bits
+
+
+class TestQueryEngine:
+    def build_engine(self):
+        return QueryEngine(build_rows([FATALITIES, ARCHIVES]))
+
+    def test_build_rows_00(self):
+        """Ensure each fatality gets a row, and that the archive fields are added."""
+        rows = build_rows([FATALITIES, ARCHIVES])
+        assert [r['case'] for r in rows] == ['19-0000001', '19-0000001', '19-0000002', '18-0000003']
+        assert rows[0]['type'] == 'pedestrian'
+        assert rows[3]['age'] is None
+
+    @pytest.mark.parametrize('filters,expected', [
+        ({}, ['18-0000003', '19-0000001', '19-0000001', '19-0000002']),
+        ({
+            'date_from': '2019-01-01'
+        }, ['19-0000001', '19-0000001', '19-0000002']),
+        ({
+            'date_from': '2019-01-02',
+            'date_to': '2019-01-02'
+        }, ['19-0000002']),
+        ({
+            'date_to': '2018-12-31'
+        }, ['18-0000003']),
+        ({
+            'min_age': 60
+        }, ['19-0000001']),
+        ({
+            'min_age': 20,
+            'max_age': 40
+        }, ['19-0000001', '19-0000002']),
+        ({
+            'gender': 'female'
+        }, ['19-0000001']),
+        ({
+            'ethnicity': ['Black', 'white']
+        }, ['19-0000001', '19-0000001']),
+        ({
+            'type': 'pedestrian',
+            'min_age': 60,
+            'location': 'IH-35'
+        }, ['19-0000001']),
+        ({
+            'location': 'ih 35 nb'
+        }, []),
+        ({
+            'impairment': 'none'
+        }, ['18-0000003']),
+    ])
+    def test_query_00(self, filters, expected):
+        engine = self.build_engine()
+        actual = [engine.cases[row] for row in engine.query(**filters)]
+        assert actual == expected
+
+    def test_query_01(self):
+        engine = self.build_engine()
+        with pytest.raises(ValueError):
+            engine.query(color='red')
+
+    def test_get_row_00(self):
+        engine = self.build_engine()
+        actual = engine.get_row(engine.query(min_age=60)[0])
+        assert actual['date'] == '2019-01-01'
+        assert actual['gender'] == 'male'
+        assert actual['type'] == 'pedestrian'
+
+    def test_get_row_01(self):
+        """Ensure the zero values are not confused with the unknown ones."""
+        engine = QueryEngine([{'case': '19-0000004', 'date': '2019-01-03', 'age': 0, 'latitude': 0.0}])
+        actual = engine.get_row(0)
+        assert (actual['age'], actual['latitude'], actual['longitude']) == (0, 0.0, None)
+        assert engine.query(max_age=1) == [0]
+
+    @pytest.mark.parametrize('mask,expected', [
+        (0, []),
+        (0b1011, [0, 1, 3]),
+    ])
+    def test_iter_bits_00(self, mask, expected):
+        assert list(iter_bits(mask)) == expected
+
+
+# Test data.
+FATALITIES = [
+    {
+        "case": "19-0000001",
+        "date": "2019-01-01",
+        "fatalities": [
+            {
+                "age": 65,
+                "ethnicity": "White",
+                "gender": "Male"
+            },
+            {
+                "age": 30,
+                "ethnicity": "Black",
+                "gender": "Female"
+            },
+        ],
+        "location": "10500 block of N IH-35 SB",
+    },
+    {
+        "case": "19-0000002",
+        "date": "2019-01-02",
+        "fatalities": [{
+            "age": 25,
+            "ethnicity": "Hispanic",
+            "gender": "Male"
+        }],
+        "location": "1000 block of W. Oltorf Street",
+    },
+]
+
+ARCHIVES = [
+    {
+        "case": "19-0000001",
+        "date": "2019-01-01",
+        "impairment": "driver",
+        "location": "10500 n ih 35",
+        "type": "pedestrian"
+    },
+    {
+        "case": "18-0000003",
+        "date": "2018-06-01",
+        "impairment": "none",
+        "location": "1100 berger st",
+        "type": "motorcycle"
+    },
+]
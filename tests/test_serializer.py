@@ -0,0 +1,95 @@
+"""Tests of `scrapd_datasets.serializer`."""
+import io
+import json
+
+import pytest
+
+from scrapd_datasets.serializer import dumps
+from scrapd_datasets.serializer import has_unsafe_numbers
+from scrapd_datasets.serializer import iter_records
+from scrapd_datasets.serializer import replace_if_changed
+from scrapd_datasets.serializer import to_json
+from scrapd_datasets.serializer import write_if_changed
+
+
+class TestScrapdJson:
+    @pytest.mark.parametrize('obj', [
+        [],
+        {},
+        [{
+            'b': 1,
+            'a': [0.0, 30.303625, -97.67139, 1e-05, 1e16, 12345678901234567890, None, True],
+        }],
+        {
+            'notes': 'Café 😀 "quoted" \\ \n \x1f \x7f',
+            'empty': {},
+            'list': [[], [{}]],
+        },
+    ])
+    def test_dumps_00(self, obj):
+        """Ensure the output is identical to the one of the standard library."""
+        actual = dumps(obj)
+        expected = json.dumps(obj, sort_keys=True, indent=2)
+        assert actual == expected
+
+    @pytest.mark.parametrize('data,expected', [
+        (b'[30.303625, -97.67139, 0.0001, 123]', False),
+        (b'[1e16]', True),
+        (b'[1e-5]', True),
+        (b'[0.00001]', True),
+        (b'[12345678901234567000.0]', True),
+    ])
+    def test_has_unsafe_numbers_00(self, data, expected):
+        assert has_unsafe_numbers(data) == expected
+
+    def test_to_json_00(self):
+        """Ensure the output is identical to the one of ScrAPD."""
+        from scrapd.core import model
+        from scrapd.core.formatter import to_json as scrapd_to_json
+        report = model.Report(case='19-0150158',
+                              date='2019-01-15',
+                              time='19:25:00',
+                              fatalities=[{
+                                  'dob': '1980-03-02',
+                                  'ethnicity': 'White',
+                                  'gender': 'Female',
+                                  'first': 'Zoë'
+                              }])
+        assert to_json([report]) == scrapd_to_json([report])
+
+    def test_write_if_changed_00(self, tmp_path):
+        path = tmp_path / 'data.json'
+        assert write_if_changed(str(path), '[]')
+        mtime = path.stat().st_mtime_ns
+        assert not write_if_changed(str(path), '[]')
+        assert path.stat().st_mtime_ns == mtime
+        assert write_if_changed(str(path), '[1]')
+        assert path.read_text() == '[1]'
+        assert [p.name for p in tmp_path.iterdir()] == ['data.json']
+
+    def test_write_if_changed_01(self, tmp_path):
+        """Ensure the permissions are kept."""
+        path = tmp_path / 'data.json'
+        path.write_text('[]')
+        path.chmod(0o640)
+        write_if_changed(str(path), '[1]')
+        assert path.stat().st_mode & 0o777 == 0o640
+
+    def test_replace_if_changed_00(self, tmp_path):
+        path = tmp_path / 'data.json'
+        path.write_text('[]')
+        tmp = tmp_path / 'tmp'
+        tmp.write_text('[]')
+        assert not replace_if_changed(str(tmp), str(path))
+        assert not tmp.exists()
+        tmp.write_text('[1]')
+        assert replace_if_changed(str(tmp), str(path))
+        assert path.read_text() == '[1]'
+
+    @pytest.mark.parametrize('ndjson', [True, False])
+    def test_iter_records_00(self, ndjson):
+        """Ensure the JSON arrays and the NDJSON files are read incrementally."""
+        records = [{'case': '19-0150158', 'location': '[a, b]'}, {'case': '19-0400694', 'notes': 'Café {}'}, {}]
+        data = '\n'.join(json.dumps(record) for record in records) if ndjson else json.dumps(records, indent=2)
+        actual = list(iter_records(io.StringIO(data), chunk_size=7))
+        assert actual == records
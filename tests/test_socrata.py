@@ -0,0 +1,167 @@
+"""Tests of `scrapd_datasets.socrata`."""
+import json
+
+import pytest
+
+from scrapd_datasets.socrata import TIME_FALLBACKS
+from scrapd_datasets.socrata import clean_coordinates
+from scrapd_datasets.socrata import clean_date
+from scrapd_datasets.socrata import clean_time
+from scrapd_datasets.socrata import merge
+from scrapd_datasets.socrata import parse_time
+
+
+class TestMerge:
+    def test_merge_00(self):
+        actual = merge(json.loads(SCRAPD), json.loads(SOCRATA))
+        expected = json.loads(FINAL)
+        assert actual == expected
+
+    def test_merge_01(self):
+        """Ensure an entry whose case number was mistyped is linked to its ScrAPD entry."""
+        socrata = json.loads(SOCRATA)
+        scrapd = [{**entry, 'date': '2018-01-04', 'time': '23:57:00'} for entry in json.loads(SCRAPD)]
+        socrata[0]['case_number'] = '18-041689'
+        actual = merge(scrapd, socrata)
+        expected = json.loads(FINAL)
+        assert actual == expected
+
+    def test_merge_02(self):
+        """Ensure only the case numbers are matched without a link threshold."""
+        socrata = json.loads(SOCRATA)
+        socrata[0]['case_number'] = '18-041689'
+        actual = merge(json.loads(SCRAPD), socrata, link_threshold=None)
+        assert actual == []
+
+    @pytest.mark.parametrize('input_,expected', [
+        ('2018-01-04T00:00:00.000', '2018-01-04'),
+        ('01/04/2018', ''),
+    ])
+    def test_clean_date_00(self, input_, expected):
+        actual = clean_date(input_)
+        assert actual == expected
+
+    @pytest.mark.parametrize('input_,expected', [
+        ('-97.70766', -97.70766),
+        ('30.315355', 30.315355),
+        ('invalid', None),
+    ])
+    def test_clean_coordinates_00(self, input_, expected):
+        actual = clean_coordinates(input_)
+        assert actual == expected
+
+    @pytest.mark.parametrize('input_,expected', [
+        ('22:15', '22:15:00'),
+        ('8:57', '08:57:00'),
+        ('2018-01-04T00:00:00.000', '00:00:00'),
+    ])
+    def test_clean_time_00(self, input_, expected):
+        actual = clean_time(input_)
+        assert actual == expected
+
+    @pytest.mark.parametrize('input_,expected', [
+        ('22:15', '22:15:00'),
+        ('19:15:00', '19:15:00'),
+        ('2018-01-04T23:25:00.000', '23:25:00'),
+        ('11:57 p.m.', '23:57:00'),
+        ('12:05 a.m.', '00:05:00'),
+        ('12:05 PM', '12:05:00'),
+        ('9 p.m.', '21:00:00'),
+        ('25:00', None),
+        ('13:00 p.m.', None),
+        ('noon', None),
+    ])
+    def test_parse_time_00(self, input_, expected):
+        actual = parse_time(input_)
+        assert actual == expected
+
+    def test_clean_time_01(self):
+        """Ensure dateparser is only used for the unknown formats."""
+        TIME_FALLBACKS.clear()
+        assert clean_time('23:25') == '23:25:00'
+        assert clean_time('noon') == '12:00:00'
+        assert clean_time('not a time') == ''
+        assert clean_time('noon') == '12:00:00'
+        assert dict(TIME_FALLBACKS) == {'noon': 2, 'not a time': 1}
+
+
+# Test data.
+SCRAPD = """
+[
+    {
+        "case": "18-0041689",
+        "date": "01/04/2018",
+        "link": "http://austintexas.gov/news/traffic-fatality-1-3",
+        "location": "5600 N IH 35 Northbound",
+        "time": "11:57 p.m."
+    }
+]
+"""
+
+SOCRATA = """
+[
+    {
+        "area": "ID",
+        "case_number": "18-0041689",
+        "case_status": "Closed",
+        "charge": "Pending",
+        "date": "2018-01-04T00:00:00.000",
+        "day": "Thu",
+        "dl_status_incident": "suspended",
+        "failure_to_stop_and_render_aid": "n",
+        "fatal_crash_number": "1",
+        "hour": "23",
+        "killed_driver_pass": "driver and passenger",
+        "location": "5600 Block N IH 35 NB",
+        "month": "Jan",
+        "number_of_fatalities": "2",
+        "ran_red_light_or_stop_sign": "n",
+        "related": "mv/18 Wheel",
+        "restraint_type": "unknown",
+        "speeding": "n",
+        "suspected_impairment": "driver   ",
+        "time": "23:25",
+        "type": "MOTOR VEHICLE",
+        "type_of_road": "IH35",
+        "x_coord": "-97.70766",
+        "y_coord": "30.315355"
+    },
+    {
+        "area": "Charlie",
+        "case_number": "14-0511533",
+        "charge": "DOO",
+        "date": "2014-02-20T00:00:00.000",
+        "day": "Thu",
+        "drivers_license_status": "suspended",
+        "fatal_crash": "7",
+        "ftsra": "No",
+        "hour": "19",
+        "killed_driver_pass": "Pedestrian",
+        "location": "6400 FM 969",
+        "month": "Feb",
+        "number_of_fatalities": "1",
+        "ran_red_light": "N",
+        "related": "MV/PED",
+        "restraint_or_helmet": "n/a",
+        "speeding": "N",
+        "suspected_impairment": "PEDESTRIAN",
+        "time": "19:15:00",
+        "type": "Pedestrian",
+        "type_of_road": "high speed roadway",
+        "x_coord": "-97.659822",
+        "y_coord": "30.284725"
+    }
+]
+"""
+
+FINAL = """
+[
+    {
+        "case": "18-0041689",
+        "latitude": 30.315355,
+        "location": "5600 block n ih 35 nb",
+        "longitude": -97.70766,
+        "time": "23:25:00"
+    }
+]
+"""
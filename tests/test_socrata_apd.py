@@ -0,0 +1,82 @@
+"""Tests of `scrapd-socrata-apd`."""
+import pytest
+
+from conftest import load_tool
+
+socrata_apd = load_tool('scrapd-socrata-apd')
+find_years = socrata_apd.find_years
+generate_augmentation = socrata_apd.generate_augmentation
+get_case_year = socrata_apd.get_case_year
+partition = socrata_apd.partition
+
+
+class TestSocrataAPD:
+    @pytest.mark.parametrize('input_,expected', [
+        ('18-0041689', 2018),
+        ('13-1234567', 2013),
+        ('', None),
+        (None, None),
+        ('unknown', None),
+    ])
+    def test_get_case_year_00(self, input_, expected):
+        actual = get_case_year(input_)
+        assert actual == expected
+
+    def test_partition_00(self):
+        actual = partition(iter(SOCRATA))
+        assert sorted(actual, key=lambda x: (x is None, x)) == [2017, 2018, None]
+        assert actual[None] == [{'location': 'No case number'}]
+        assert [entry['case_number'] for entry in actual[2018]] == ['18-0041689', '18-0050112']
+
+    def test_generate_augmentation_00(self):
+        """Ensure the raw data set is joined with the partition of its year."""
+        actual = generate_augmentation(RAW, partition(SOCRATA))
+        assert [entry['case'] for entry in actual] == ['18-0041689']
+        assert actual[0]['time'] == '23:25:00'
+
+    def test_find_years_00(self, tmp_path):
+        (tmp_path / 'fatalities-2018-raw.json').write_text('[]')
+        (tmp_path / 'fatalities-2019-raw.json').write_text('[]')
+        actual = find_years(tmp_path, partition(SOCRATA))
+        assert actual == [2018]
+
+
+# Test data.
+RAW = [
+    {
+        "case": "18-0041689",
+        "date": "2018-01-04",
+        "location": "5600 N IH 35 Northbound",
+    },
+    {
+        "case": "18-0090000",
+        "date": "2018-01-09",
+        "location": "Unknown",
+    },
+]
+
+SOCRATA = [
+    {
+        "case_number": "18-0041689",
+        "date": "2018-01-04T00:00:00.000",
+        "location": "5600 Block N IH 35 NB",
+        "time": "23:25",
+        "x_coord": "-97.70766",
+        "y_coord": "30.315355"
+    },
+    {
+        "case_number": "17-0011111",
+        "date": "2017-01-01T00:00:00.000",
+        "location": "100 Congress Ave",
+        "time": "1:00",
+    },
+    {
+        "case_number": "18-0050112",
+        "date": "2018-01-05T00:00:00.000",
+        "location": "200 Lamar Blvd",
+        "time": "8:57",
+    },
+    {
+        "location": "No case number",
+    },
+]
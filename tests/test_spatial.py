@@ -0,0 +1,147 @@
+"""Tests of `scrapd-spatial`."""
+import json
+
+import pytest
+
+from conftest import load_tool
+
+spatial = load_tool('scrapd-spatial')
+SpatialIndex = spatial.SpatialIndex
+haversine = spatial.haversine
+
+
+class TestSpatialIndex:
+    def build_index(self):
+        index = SpatialIndex()
+        index.add_all(CRASHES, 'test.json')
+        return index
+
+    def test_haversine_00(self):
+        """Ensure the distance between the Capitol and the UT Tower is about 1.3 km."""
+        actual = haversine(30.2747, -97.7404, 30.2862, -97.7394)
+        assert actual == pytest.approx(1282, abs=5)
+
+    def test_add_00(self):
+        """Ensure the crashes without coordinates are ignored."""
+        index = self.build_index()
+        assert len(index.records) == 4
+
+    def test_add_01(self):
+        """Ensure the swapped coordinates are swapped back, and the ones out of range are ignored."""
+        index = SpatialIndex()
+        index.add_all(OUT_OF_RANGE_CRASHES)
+        assert [(r['case'], r['latitude'], r['longitude']) for r in index.records] == [('13-1631964', 30.2, -97.8)]
+        assert index.bounds == ((3020, -9780), (3020, -9780))
+
+    def test_radius_00(self):
+        index = self.build_index()
+        actual = [r['case'] for _, r in index.radius(30.2747, -97.7404, 1500)]
+        assert actual == ['19-0000001', '19-0000002']
+
+    def test_bbox_00(self):
+        index = self.build_index()
+        actual = sorted(r['case'] for r in index.bbox(30.2, -97.8, 30.3, -97.7))
+        assert actual == ['19-0000001', '19-0000002', '19-0000003']
+
+    @pytest.mark.parametrize('k,expected', [
+        (1, ['19-0000001']),
+        (3, ['19-0000001', '19-0000002', '19-0000003']),
+        (10, ['19-0000001', '19-0000002', '19-0000003', '19-0000004']),
+    ])
+    def test_nearest_00(self, k, expected):
+        index = self.build_index()
+        actual = [r['case'] for _, r in index.nearest(30.2747, -97.7404, k)]
+        assert actual == expected
+
+    def test_nearest_01(self):
+        """Ensure the nearest crashes match a linear scan."""
+        index = SpatialIndex(cell_size=0.001)
+        index.add_all(CRASHES)
+        for latitude, longitude in [(30.0, -97.0), (30.28, -97.74), (31.0, -98.0)]:
+            expected = sorted(index.records,
+                              key=lambda r: haversine(latitude, longitude, r['latitude'], r['longitude']))
+            actual = [r for _, r in index.nearest(latitude, longitude, 2)]
+            assert actual == expected[:2]
+
+    def test_nearest_02(self):
+        """Ensure the predicate selects the crashes."""
+        index = self.build_index()
+        actual = [r['case'] for _, r in index.nearest(30.2747, -97.7404, 1, lambda r: r['date'] < '2019-01-02')]
+        assert actual == ['19-0000002']
+
+    def test_nearest_03(self):
+        """Ensure the query stops once all the crashes were visited, when fewer than k crashes match."""
+        index = self.build_index()
+        index.add_all(OUT_OF_RANGE_CRASHES)
+        actual = [r['case'] for _, r in index.nearest(30.2747, -97.7404, 10, lambda r: r['date'] < '2019-01-03')]
+        assert actual == ['19-0000002', '19-0000003', '13-1631964']
+
+    def test_build_00(self, tmp_path):
+        """Ensure the saved index is reused until a data set changes."""
+        dataset = tmp_path / 'fatalities-2019-augmented.json'
+        dataset.write_text(json.dumps(CRASHES))
+        path = tmp_path / 'index.json'
+        index = SpatialIndex.build([dataset], path)
+        assert len(index.records) == 4
+        data = json.loads(path.read_text())
+        data['records'] = data['records'][:1]
+        path.write_text(json.dumps(data))
+        assert len(SpatialIndex.build([dataset], path).records) == 1
+        dataset.write_text(json.dumps(CRASHES[:2]))
+        assert len(SpatialIndex.build([dataset], path).records) == 2
+
+
+# Test data.
+CRASHES = [
+    {
+        "case": "19-0000001",
+        "date": "2019-01-03",
+        "latitude": 30.2750,
+        "location": "1100 Congress Ave",
+        "longitude": -97.7400,
+    },
+    {
+        "case": "19-0000002",
+        "date": "2019-01-01",
+        "latitude": 30.2860,
+        "location": "2400 Guadalupe St",
+        "longitude": -97.7420,
+    },
+    {
+        "case": "19-0000003",
+        "date": "2019-01-02",
+        "latitude": 30.2200,
+        "location": "4500 S Congress Ave",
+        "longitude": -97.7600,
+    },
+    {
+        "case": "19-0000004",
+        "date": "2019-01-04",
+        "latitude": 30.4000,
+        "location": "12000 N Lamar Blvd",
+        "longitude": -97.6800,
+    },
+    {
+        "case": "19-0000005",
+        "date": "2019-01-05",
+        "latitude": 0.0,
+        "location": "Unknown",
+        "longitude": 0.0,
+    },
+]
+OUT_OF_RANGE_CRASHES = [
+    {
+        "case": "13-1631964",
+        "date": "2013-04-02",
+        "latitude": -97.8,
+        "location": "Swapped coordinates",
+        "longitude": 30.2,
+    },
+    {
+        "case": "13-1631965",
+        "date": "2013-04-03",
+        "latitude": 48.85,
+        "location": "Out of range",
+        "longitude": 2.35,
+    },
+]
@@ -0,0 +1,131 @@
+"""Tests of `scrapd-store`."""
+import pathlib
+
+import pytest
+from scrapd.core import model
+
+from conftest import load_tool
+from scrapd_datasets import merger
+from scrapd_datasets.serializer import to_json
+
+tool = load_tool('scrapd-store')
+AUGMENTED = tool.AUGMENTED
+RAW = tool.RAW
+RAW_PATTERN = tool.RAW_PATTERN
+Store = tool.Store
+YEAR_PATTERN = tool.YEAR_PATTERN
+get_year = tool.get_year
+serialize = tool.serialize
+
+
+class TestStore:
+    def test_merge_00(self):
+        """Ensure the reports are stored as they would be written in a data set."""
+        store = Store()
+        assert store.merge(RAW_DATA, 2019) == 2
+        actual = list(store.iter_reports(RAW, 2019))
+        expected = [serialize(model.Report(**entry)) for entry in RAW_DATA]
+        assert actual == expected
+        assert store.merge(RAW_DATA, 2019, trusted=True) == 0
+
+    def test_merge_01(self):
+        """Ensure only the empty fields are filled, unless updating."""
+        store = Store()
+        store.merge(RAW_DATA, 2019)
+        new = {'case': '19-0150158', 'location': 'Somewhere else', 'notes': 'Some notes'}
+        store.merge([new], 2019)
+        actual = store.get('19-0150158')
+        assert actual['location'] == '1000 E Stassney Ln'
+        assert actual['notes'] == 'Some notes'
+        store.merge([{**RAW_DATA[0], **new}], 2019, update=True)
+        assert store.get('19-0150158')['location'] == 'Somewhere else'
+
+    def test_augment_00(self):
+        """Ensure the layers are applied, and removed."""
+        store = Store()
+        store.merge(RAW_DATA, 2019)
+        assert store.augment('augmentation-test-2019.json', 2019, AUGMENTATION) == 2
+        actual = store.get('19-0150158', AUGMENTED)
+        assert actual['latitude'] == 30.303625
+        assert store.get('19-0150158', RAW)['latitude'] == 0.0
+        assert store.get('19-9999999', AUGMENTED)['location'] == 'Extra'
+        assert store.augment('augmentation-test-2019.json', 2019, AUGMENTATION[:1]) == 1
+        assert store.get('19-9999999', AUGMENTED) is None
+
+    def test_query_00(self):
+        store = Store()
+        store.merge(RAW_DATA, 2019)
+        store.augment('augmentation-test-2019.json', 2019, AUGMENTATION)
+        actual = [r['case'] for r in store.query(date_from='2019-01-16')]
+        assert actual == ['19-0161105']
+        actual = [r['case'] for r in store.query(bbox=(30.3, -97.7, 30.4, -97.6))]
+        assert actual == ['19-0150158']
+        actual = [r['case'] for r in store.query(RAW, bbox=(30.3, -97.7, 30.4, -97.6))]
+        assert actual == []
+
+    def test_export_00(self, tmp_path):
+        """Ensure the reports are exported like the merger writes them."""
+        store = Store(tmp_path / 'store.sqlite')
+        store.merge(RAW_DATA, 2019)
+        expected = to_json(sorted(merger.merge([], RAW_DATA, False), key=lambda x: x.case))
+        assert to_json(list(store.iter_reports(RAW, 2019))) == expected
+        assert store.get_years() == [2019]
+        store.close()
+
+    @pytest.mark.parametrize('path,pattern,expected', [
+        ('datasets/fatalities-2019-raw.json', RAW_PATTERN, 2019),
+        ('augmentations/2018/augmentation-manual.json', YEAR_PATTERN, 2018),
+    ])
+    def test_get_year_00(self, path, pattern, expected):
+        actual = get_year(pathlib.Path(path), pattern)
+        assert actual == expected
+
+
+# Test data.
+RAW_DATA = [
+    {
+        "case": "19-0150158",
+        "crash": 2,
+        "date": "2019-01-15",
+        "fatalities": [{
+            "age": 38,
+            "dob": "1980-03-02",
+            "ethnicity": "White",
+            "first": "Jane",
+            "gender": "Female",
+            "generation": "",
+            "last": "Doe",
+            "middle": ""
+        }],
+        "latitude": 0.0,
+        "link": "http://austintexas.gov/news/traffic-fatality-2-4",
+        "location": "1000 E Stassney Ln",
+        "longitude": 0.0,
+        "notes": "",
+        "time": "19:25:00"
+    },
+    {
+        "case": "19-0161105",
+        "crash": 3,
+        "date": "2019-01-16",
+        "fatalities": [],
+        "latitude": 0.0,
+        "link": "http://austintexas.gov/news/traffic-fatality-3-4",
+        "location": "183 Service Road Westbound and Payton Gin Rd.",
+        "longitude": 0.0,
+        "notes": "",
+        "time": None
+    },
+]
+
+AUGMENTATION = [
+    {
+        "case": "19-0150158",
+        "latitude": 30.303625,
+        "longitude": -97.67139
+    },
+    {
+        "case": "19-9999999",
+        "location": "Extra"
+    },
+]
@@ -15,10 +15,16 @@ echo "==> INFO <=="
 scrapd --version
 echo "==> <==> <=="
 
-# Generate the current data set.
-for YEAR in {2017..2020}; do
+# Define the number of years processed in parallel.
+: "${JOBS:=$(nproc)}"
+LOG_DIR=$(mktemp -d)
+trap 'rm -rf "${LOG_DIR}"' EXIT
+
+# Check the data set of a year.
+check_year() {
+  local YEAR=$1
+  local DATASET="${DATASET_DIR}/fatalities-${YEAR}-raw.json"
   echo "=> Processing year ${YEAR}..."
-  DATASET="${DATASET_DIR}/fatalities-${YEAR}-raw.json"
   echo -e "\t>>> BEFORE >>>"
   echo -n -e "\tCrash count:"
   jq '[ .[] | {}] | length' "${DATASET}"
@@ -30,4 +36,23 @@ for YEAR in {2017..2020}; do
   jq '[ .[] | {}] | length' "${DATASET}"
   echo -n -e "\tFatality count:"
   jq '[ .[].fatalities[] | {}] | length' "${DATASET}"
+}
+
+# Generate the current data set.
+YEARS=({2017..2020})
+declare -A PIDS
+for YEAR in "${YEARS[@]}"; do
+  while [ "$(jobs -rp | wc -l)" -ge "${JOBS}" ]; do
+    wait -n || true
+  done
+  check_year "${YEAR}" > "${LOG_DIR}/${YEAR}.log" 2>&1 &
+  PIDS[${YEAR}]=$!
+done
+
+# Report the years in order.
+STATUS=0
+for YEAR in "${YEARS[@]}"; do
+  wait "${PIDS[${YEAR}]}" || STATUS=1
+  cat "${LOG_DIR}/${YEAR}.log"
 done
+exit "${STATUS}"
@@ -0,0 +1,531 @@
+"""
+`scrapd-benchmark` is a tool to measure how the tools scale with the size of the data sets.
+
+The data sets are generated synthetically from a seed, therefore the runs are reproducible: ScrAPD reports, Socrata APD
+rows, ScrAPD 2 entries and augmentations, at any scale. The geocoder is benchmarked against a local stand-in for the
+Geo Census API, which returns deterministic coordinates and can simulate a network latency.
+
+Each benchmark runs in its own process, so that its peak memory usage can be measured. The throughput, the latency
+percentiles of the runs and the peak RSS are written to a JSON file, which can be compared with a previous one to
+detect the regressions.
+
+Usage examples:
+
+$ python scrapd-benchmark.py -o benchmark.json
+$ python scrapd-benchmark.py --sizes 1k 100k --benchmarks merger importer-socrata -o benchmark.json
+$ python scrapd-benchmark.py --sizes 100k --compare baseline.json -o benchmark.json
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import copy
+import datetime
+import importlib.util
+import io
+import json
+import math
+import multiprocessing
+import os
+import pathlib
+import platform
+import random
+import resource
+import sys
+import time
+
+from loguru import logger
+
+from scrapd_datasets.census_server import start_server
+from scrapd_datasets.serializer import dumps
+from scrapd_datasets.serializer import write_if_changed
+
+# Benchmark settings.
+SIZES = {'1k': 1000, '100k': 100000, '1M': 1000000}
+DEFAULT_SIZES = ['1k']
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 42
+DEFAULT_TOLERANCE = 0.2
+PERCENTILES = [50, 90, 99]
+
+# Synthetic data settings.
+# The proportion of the cases which are changed or added by the new data set.
+CHANGE_RATIO = 0.1
+ADDITION_RATIO = 0.05
+# The proportion of the Socrata rows whose case number is truncated.
+MISTYPED_RATIO = 0.01
+AUSTIN_BOUNDING_BOX = ((30.1, -97.9), (30.5, -97.6))
+STREETS = [
+    'N. Lamar Blvd.',
+    'S. Lamar Blvd.',
+    'N. IH 35 SB',
+    'S. IH 35 NB',
+    'Springdale Road',
+    'E. Riverside Drive',
+    'S. Congress Avenue',
+    'Burnet Road',
+    'E. 7th Street',
+    'W. Slaughter Lane',
+    'E. Ben White Blvd.',
+    'Cameron Road',
+    'Airport Blvd.',
+    'Research Blvd.',
+    'Parmer Lane',
+    'Manor Road',
+    'William Cannon Drive',
+    'Rundberg Lane',
+    'MLK Jr. Blvd.',
+    'US 183 NB',
+]
+FIRST_NAMES = ['David', 'Maria', 'James', 'Ana', 'Robert', 'Linda', 'José', 'Emily', 'Michael', 'Sofía']
+LAST_NAMES = ['Smith', 'Garcia', 'Johnson', 'Martinez', 'Brown', 'Nguyen', 'Davis', 'Hernández', 'Wilson', 'Lee']
+ETHNICITIES = ['White', 'Black', 'Hispanic', 'Asian', 'Other']
+GENDERS = ['Male', 'Female']
+SOCRATA_TYPES = ['Motor Vehicle', 'Motorcycle', 'Pedestrian', 'Bicycle']
+SOCRATA_TIME_FORMATS = ['%H:%M:%S', '%H:%M', '%I:%M %p']
+
+# Stand-in geocoder settings.
+GEOCODER_CONCURRENCY = 16
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+
+    # Run the benchmarks.
+    results = []
+    for size in args.sizes:
+        for name in args.benchmarks:
+            logger.info(f'Running {name} with {size} records...')
+            result = run_isolated(name, SIZES[size], args.repeat, args.seed, args.latency)
+            logger.info(f'\t{result["throughput"]:.0f} records/s, p50 {result["latency"]["p50"]:.3f}s, '
+                        f'peak RSS {result["peak_rss"] / 1024 ** 2:.1f} MiB')
+            results.append(result)
+    report = {'environment': get_environment(), 'seed': args.seed, 'results': results}
+
+    # Write the report.
+    report_str = dumps(report) + '\n'
+    if args.output:
+        write_if_changed(args.output, report_str)
+    else:
+        print(report_str, end='')
+
+    # Compare with the baseline.
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.tolerance)
+        for regression in regressions:
+            logger.warning(regression)
+        if regressions:
+            sys.exit(1)
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Benchmark the tools with synthetic data sets.')
+    parser.add_argument('-b',
+                        '--benchmarks',
+                        nargs='+',
+                        choices=sorted(BENCHMARKS),
+                        default=sorted(BENCHMARKS),
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('-s',
+                        '--sizes',
+                        nargs='+',
+                        choices=list(SIZES),
+                        default=DEFAULT_SIZES,
+                        help='Numbers of records (default: %(default)s)')
+    parser.add_argument('-r',
+                        '--repeat',
+                        type=int,
+                        default=DEFAULT_REPEAT,
+                        help='Number of runs of each benchmark (default: %(default)s)')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=DEFAULT_SEED,
+                        help='Seed of the synthetic data (default: %(default)s)')
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0,
+                        help='Latency of the stand-in geocoder in seconds (default: %(default)s)')
+    parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    parser.add_argument('--compare', type=pathlib.Path, help='Previous results to compare with')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=DEFAULT_TOLERANCE,
+                        help='Tolerated slowdown or memory increase (default: %(default)s)')
+
+    return parser
+
+
+def get_environment():
+    """
+    Describe the environment running the benchmarks.
+
+    :return: the Python version, the platform, the number of CPUs and the optional dependencies
+    :rtype: dict
+    """
+    return {
+        'cpu_count': os.cpu_count(),
+        'orjson': importlib.util.find_spec('orjson') is not None,
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+    }
+
+
+def generate_reports(count, seed=DEFAULT_SEED):
+    """
+    Generate realistic ScrAPD reports.
+
+    :param int count: number of reports
+    :param int seed: seed of the random generator
+    :return: the reports, sorted by case number, which are all even
+    :rtype: list(dict)
+    """
+    rng = random.Random(seed)
+    (south, west), (north, east) = AUSTIN_BOUNDING_BOX
+    reports = []
+    case = 0
+    for i in range(count):
+        case += rng.randint(1, 500) * 2
+        year = 2010 + case // 10**7
+        date = datetime.date(year, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+        fatalities = []
+        for _ in range(rng.choice([1, 1, 1, 1, 2])):
+            age = rng.randint(16, 90)
+            dob = date - datetime.timedelta(days=age * 365 + rng.randrange(365))
+            fatalities.append({
+                'age': age,
+                'dob': dob.isoformat(),
+                'ethnicity': rng.choice(ETHNICITIES),
+                'first': rng.choice(FIRST_NAMES),
+                'gender': rng.choice(GENDERS),
+                'generation': '',
+                'last': rng.choice(LAST_NAMES),
+                'middle': '',
+            })
+        location = f'{rng.randrange(1, 130) * 100} block of {rng.choice(STREETS)}'
+        reports.append({
+            'case': f'{year % 100:02d}-{case % 10**7:07d}',
+            'crash': i % 100 + 1,
+            'date': date.isoformat(),
+            'fatalities': fatalities,
+            'latitude': round(rng.uniform(south, north), 6),
+            'link': f'http://austintexas.gov/news/traffic-fatality-{i % 100 + 1}-{rng.randrange(10)}',
+            'location': location,
+            'longitude': round(rng.uniform(west, east), 6),
+            'notes': f'The preliminary investigation shows that a vehicle was traveling in the {location}.',
+            'time': f'{rng.randrange(24):02d}:{rng.randrange(60):02d}:00',
+        })
+    return reports
+
+
+def generate_changes(reports, seed=DEFAULT_SEED):
+    """
+    Generate a newer version of a data set, with changed and added reports.
+
+    The case numbers of the added reports are odd, therefore they are interleaved with the existing ones.
+
+    :param list(dict) reports: reports of the data set
+    :param int seed: seed of the random generator
+    :return: the changed and added reports, sorted by case number
+    :rtype: list(dict)
+    """
+    rng = random.Random(seed)
+    changes = []
+    for report in rng.sample(reports, int(len(reports) * CHANGE_RATIO)):
+        change = copy.deepcopy(report)
+        change['notes'] += ' The investigation is ongoing.'
+        change['fatalities'][0]['age'] += 1
+        changes.append(change)
+    count = int(len(reports) * ADDITION_RATIO)
+    additions = generate_reports(count, seed + 1)
+    for report, addition in zip(rng.sample(reports, count), additions):
+        addition['case'] = report['case'][:-1] + str(int(report['case'][-1]) + 1)
+    return sorted(changes + additions, key=lambda x: x['case'])
+
+
+def generate_socrata(reports, seed=DEFAULT_SEED):
+    """
+    Generate Socrata APD rows matching ScrAPD reports.
+
+    The rows mix the schema variants and the time formats found in the Socrata APD data sets.
+
+    :param list(dict) reports: ScrAPD reports
+    :param int seed: seed of the random generator
+    :return: the Socrata rows
+    :rtype: list(dict)
+    """
+    rng = random.Random(seed)
+    rows = []
+    for report in reports:
+        date = datetime.datetime.strptime(f'{report["date"]} {report["time"]}', '%Y-%m-%d %H:%M:%S')
+        row = {
+            'case_number': report['case'],
+            'date': date.strftime('%Y-%m-%dT00:00:00.000'),
+            'location': report['location'].replace(' block of', ''),
+            'number_of_fatalities': str(len(report['fatalities'])),
+            'time': date.strftime(rng.choice(SOCRATA_TIME_FORMATS)),
+            'type': rng.choice(SOCRATA_TYPES),
+        }
+        x, y = rng.choice([('x_coord', 'y_coord'), ('xcoord', 'ycoord')])
+        row[x] = str(report['longitude'])
+        row[y] = str(report['latitude'])
+        rows.append(row)
+    return rows
+
+
+def generate_scrapd2(reports):
+    """
+    Generate ScrAPD 2 entries from ScrAPD reports.
+
+    :param list(dict) reports: ScrAPD reports
+    :return: the ScrAPD 2 entries
+    :rtype: list(dict)
+    """
+    entries = []
+    for report in reports:
+        fatality = report['fatalities'][0]
+        entries.append({
+            'Age': fatality['age'],
+            'Case': report['case'],
+            'DOB': datetime.date.fromisoformat(fatality['dob']).strftime('%m/%d/%Y'),
+            'Date': datetime.date.fromisoformat(report['date']).strftime('%B %d, %Y'),
+            'Ethnicity': fatality['ethnicity'],
+            'Fatal crashes this year': str(report['crash']),
+            'First Name': fatality['first'],
+            'Gender': fatality['gender'].lower(),
+            'Last Name': fatality['last'],
+            'Latitude': report['latitude'],
+            'Link': report['link'],
+            'Location': report['location'],
+            'Longitude': report['longitude'],
+            'Notes': report['notes'],
+            'Time': datetime.datetime.strptime(report['time'], '%H:%M:%S').strftime('%I:%M %p').lstrip('0'),
+        })
+    return entries
+
+
+def generate_augmentation(reports, seed=DEFAULT_SEED):
+    """
+    Generate a geocoding augmentation for ScrAPD reports.
+
+    :param list(dict) reports: ScrAPD reports
+    :param int seed: seed of the random generator
+    :return: the augmentation, sorted by case number
+    :rtype: list(dict)
+    """
+    rng = random.Random(seed)
+    return [{
+        'case': report['case'],
+        'latitude': round(report['latitude'] + rng.uniform(-0.001, 0.001), 6),
+        'longitude': round(report['longitude'] + rng.uniform(-0.001, 0.001), 6),
+    } for report in reports]
+
+
+def prepare_merger(count, seed, latency):
+    """Prepare the merger benchmark: merge a newer version of a data set."""
+    from scrapd_datasets import merger  # pylint: disable=import-outside-toplevel
+    old = generate_reports(count, seed)
+    new = generate_changes(old, seed)
+    return lambda: merger.merge(old, new, True, trusted=True)
+
+
+def prepare_merger_stream(count, seed, latency):
+    """Prepare the streamed merger benchmark: merge and write a newer version of a data set."""
+    from scrapd_datasets import merger  # pylint: disable=import-outside-toplevel
+    old = generate_reports(count, seed)
+    new = generate_changes(old, seed)
+    return lambda: merger.write_records(io.StringIO(), merger.merge_stream(iter(old), iter(new), True, trusted=True))
+
+
+def prepare_augmentations(count, seed, latency):
+    """Prepare the augmentation benchmark: apply an augmentation to a data set."""
+    from scrapd_datasets import merger  # pylint: disable=import-outside-toplevel
+    reports = generate_reports(count, seed)
+    augmentation = generate_augmentation(reports, seed)
+    return lambda: merger.merge(reports, augmentation, False, trusted=True)
+
+
+def prepare_importer_socrata(count, seed, latency):
+    """Prepare the Socrata importer benchmark."""
+    from scrapd_datasets import socrata  # pylint: disable=import-outside-toplevel
+    reports = generate_reports(count, seed)
+    rows = generate_socrata(reports, seed)
+
+    def run():
+        socrata.parse_time_fallback.cache_clear()
+        return socrata.merge(reports, rows)
+
+    return run
+
+
+def prepare_linkage(count, seed, latency):
+    """Prepare the record linkage benchmark: import Socrata rows whose case numbers were truncated."""
+    from scrapd_datasets import socrata  # pylint: disable=import-outside-toplevel
+    reports = generate_reports(count, seed)
+    rows = generate_socrata(reports, seed)
+    for row in random.Random(seed).sample(rows, int(len(rows) * MISTYPED_RATIO)):
+        row['case_number'] = row['case_number'][:-1]
+    return lambda: socrata.merge(reports, rows)
+
+
+def prepare_archive(count, seed, latency):
+    """Prepare the Socrata archive benchmark."""
+    from scrapd_datasets import archive  # pylint: disable=import-outside-toplevel
+    from scrapd_datasets import socrata  # pylint: disable=import-outside-toplevel
+    rows = generate_socrata(generate_reports(count, seed), seed)
+
+    def run():
+        socrata.parse_time_fallback.cache_clear()
+        return archive.merge([], rows, extras=True)
+
+    return run
+
+
+def prepare_scrapd2to3(count, seed, latency):
+    """Prepare the ScrAPD 2 conversion benchmark."""
+    from scrapd_datasets import convert  # pylint: disable=import-outside-toplevel
+    entries = generate_scrapd2(generate_reports(count, seed))
+    return lambda: convert.convert(entries)
+
+
+def prepare_geocoder(count, seed, latency):
+    """Prepare the geocoder benchmark: geocode a data set with the stand-in geocoder and an empty cache."""
+    from scrapd_datasets import geocensus  # pylint: disable=import-outside-toplevel
+    reports = [{'case': r['case'], 'location': r['location']} for r in generate_reports(count, seed)]
+
+    async def run_async():
+        runner, url = await start_server(latency)
+        try:
+            return await geocensus.async_update_entries(reports, url=url, concurrency=GEOCODER_CONCURRENCY)
+        finally:
+            await runner.cleanup()
+
+    return lambda: asyncio.run(run_async())
+
+
+def prepare_serializer(count, seed, latency):
+    """Prepare the serializer benchmark: serialize a data set."""
+    reports = generate_reports(count, seed)
+    return lambda: dumps(reports)
+
+
+BENCHMARKS = {
+    'archive': prepare_archive,
+    'augmentations': prepare_augmentations,
+    'geocoder': prepare_geocoder,
+    'importer-socrata': prepare_importer_socrata,
+    'linkage': prepare_linkage,
+    'merger': prepare_merger,
+    'merger-stream': prepare_merger_stream,
+    'scrapd2to3': prepare_scrapd2to3,
+    'serializer': prepare_serializer,
+}
+
+
+def run_isolated(name, count, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED, latency=0):
+    """
+    Run a benchmark in a new process.
+
+    :param str name: name of the benchmark
+    :param int count: number of records
+    :param int repeat: number of runs
+    :param int seed: seed of the synthetic data
+    :param float latency: latency of the stand-in geocoder in seconds
+    :return: the benchmark results (see `run_benchmark`)
+    :rtype: dict
+    """
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_benchmark, name, count, repeat, seed, latency).result()
+
+
+def run_benchmark(name, count, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED, latency=0):
+    """
+    Run a benchmark.
+
+    The peak RSS is the one of the current process, therefore the benchmark should run in its own process.
+
+    :param str name: name of the benchmark
+    :param int count: number of records
+    :param int repeat: number of runs
+    :param int seed: seed of the synthetic data
+    :param float latency: latency of the stand-in geocoder in seconds
+    :return: the throughput, the latency percentiles and the peak RSS
+    :rtype: dict
+    """
+    run = BENCHMARKS[name](count, seed, latency)
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    median = percentile(durations, 50)
+    return {
+        'benchmark': name,
+        'durations': [round(d, 6) for d in durations],
+        'latency': {f'p{p}': round(percentile(durations, p), 6)
+                    for p in PERCENTILES},
+        'peak_rss': get_peak_rss(),
+        'records': count,
+        'throughput': round(count / median, 3) if median else None,
+    }
+
+
+def percentile(values, p):
+    """
+    Compute a percentile with the nearest-rank method.
+
+    :param list(float) values: values
+    :param float p: percentile, between 0 and 100
+    :return: the percentile
+    :rtype: float
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def get_peak_rss():
+    """
+    Get the peak resident set size of the current process.
+
+    :return: the peak RSS in bytes
+    :rtype: int
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports the peak RSS in KiB, macOS in bytes.
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def compare(baseline, report, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare benchmark results with previous ones.
+
+    Only the benchmarks present in both results are compared.
+
+    :param dict baseline: previous results
+    :param dict report: current results
+    :param float tolerance: tolerated slowdown or memory increase, as a ratio
+    :return: the descriptions of the regressions
+    :rtype: list(str)
+    """
+    previous = {(r['benchmark'], r['records']): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        key = (result['benchmark'], result['records'])
+        if key not in previous:
+            continue
+        before = previous[key]
+        name = f'{result["benchmark"]} ({result["records"]} records)'
+        if before['latency']['p50'] and result['latency']['p50'] > before['latency']['p50'] * (1 + tolerance):
+            regressions.append(f'{name} is slower: p50 {before["latency"]["p50"]:.3f}s -> '
+                               f'{result["latency"]["p50"]:.3f}s')
+        if result['peak_rss'] > before['peak_rss'] * (1 + tolerance):
+            regressions.append(f'{name} uses more memory: peak RSS {before["peak_rss"]} -> {result["peak_rss"]} bytes')
+    return regressions
+
+
+if __name__ == "__main__":
+    main()
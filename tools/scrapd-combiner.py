@@ -0,0 +1,158 @@
+"""
+`scrapd-combiner` is a tool to combine several ScrAPD data sets into a single one.
+
+The data sets must be sorted by case number. They are read incrementally and merged with a k-way merge, therefore the
+memory usage stays constant regardless of their number and size. The cases appearing more than once are reported.
+
+The output is identical to the one of `jq -s add` on the yearly data sets: the keys keep their order, integral floats
+are written as integers and non-ASCII characters are not escaped.
+
+Usage examples:
+
+$ python scrapd-combiner.py fatalities-20{17..20}-raw.json > fatalities-all-raw.json
+$ python scrapd-combiner.py --strict -o fatalities-all-augmented.json fatalities-20{17..20}-augmented.json
+"""
+import argparse
+import heapq
+import json
+import os
+import pathlib
+import sys
+import tempfile
+
+from loguru import logger
+
+from scrapd_datasets import metrics
+from scrapd_datasets.serializer import iter_records
+from scrapd_datasets.serializer import replace_if_changed
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+    metrics.init('scrapd-combiner')
+
+    # Combine the data sets.
+    files = [open(dataset, 'rt', encoding='utf-8') for dataset in args.datasets]
+    duplicates = []
+    try:
+        with metrics.stage('combine', dataset=os.path.basename(args.output or '-')) as stage:
+            datasets = [metrics.iter_counted(iter_records(f), stage, 'records_in') for f in files]
+            records = combine(datasets, [str(d) for d in args.datasets], duplicates)
+            records = metrics.iter_counted(records, stage, 'records_out')
+            if args.output:
+                # Write to a temporary file first, in order to never leave a partial data set behind.
+                # The output is only replaced if its content changed.
+                output_dir = os.path.dirname(os.path.abspath(args.output))
+                with tempfile.NamedTemporaryFile('wt', encoding='utf-8', dir=output_dir, delete=False) as f:
+                    try:
+                        write_records(f, records)
+                    except BaseException:
+                        f.close()
+                        os.remove(f.name)
+                        raise
+                replace_if_changed(f.name, args.output)
+            else:
+                write_records(sys.stdout, records)
+    finally:
+        for f in files:
+            f.close()
+
+    # Report the duplicated cases.
+    for case in duplicates:
+        logger.warning(f'Case "{case}" appears more than once.')
+    if duplicates and args.strict:
+        sys.exit(1)
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Combine ScrAPD data sets sorted by case number.')
+    parser.add_argument('datasets', nargs='+', type=pathlib.Path, help='Data sets to combine')
+    parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    parser.add_argument('--strict', action='store_true', help='Fail if a case appears more than once')
+
+    return parser
+
+
+def combine(datasets, names=None, duplicates=None):
+    """
+    Combine data sets sorted by case number.
+
+    All the entries are kept, including the duplicated ones.
+
+    :param list(iterator(dict)) datasets: data sets to combine
+    :param list(str) names: names of the data sets, used in the error messages
+    :param list duplicates: list receiving the case numbers appearing more than once
+    :return: the entries of all the data sets, sorted by case number
+    :rtype: iterator(dict)
+    :raises ValueError: if a data set is not sorted by case number
+    """
+    names = names or [str(i) for i in range(len(datasets))]
+    duplicates = [] if duplicates is None else duplicates
+    previous = None
+    for entry in heapq.merge(*[ensure_sorted(d, n) for d, n in zip(datasets, names)], key=lambda x: x['case']):
+        case = entry['case']
+        if case == previous and (not duplicates or duplicates[-1] != case):
+            duplicates.append(case)
+        previous = case
+        yield entry
+
+
+def ensure_sorted(entries, name):
+    """
+    Ensure the entries of a data set are sorted by case number.
+
+    :param iterator(dict) entries: data set entries
+    :param str name: name of the data set
+    :return: the entries
+    :rtype: iterator(dict)
+    :raises ValueError: if the entries are not sorted by case number
+    """
+    previous = None
+    for entry in entries:
+        if previous is not None and entry['case'] < previous:
+            raise ValueError(f'{name} is not sorted by case: "{entry["case"]}" found after "{previous}"')
+        previous = entry['case']
+        yield entry
+
+
+def to_jq_numbers(value):
+    """
+    Convert the integral floats of a value to integers, like jq does.
+
+    :param value: JSON value
+    :return: the converted value
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: to_jq_numbers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_jq_numbers(v) for v in value]
+    return value
+
+
+def write_records(f, records):
+    """
+    Write records incrementally.
+
+    The JSON output is identical to the one of jq, which also escapes the DEL character.
+
+    :param file f: file to write to
+    :param iterator(dict) records: records to write
+    """
+    separator = '[\n'
+    for record in records:
+        f.write(separator)
+        # Indent the record as an item of the array.
+        record_str = json.dumps(to_jq_numbers(record), indent=2, ensure_ascii=False).replace('\x7f', '\\u007f')
+        f.write('  ' + record_str.replace('\n', '\n  '))
+        separator = ',\n'
+    f.write('[]\n' if separator == '[\n' else '\n]\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+`scrapd-exporter-arrow` is a tool to export data sets to Parquet or Arrow files.
+
+Each data set is split into 2 tables linked by the `case` column:
+
+* `{name}-crashes.{format}`: one row per crash,
+* `{name}-fatalities.{format}`: one row per fatality, only written if the data set contains fatalities.
+
+The files are written to the `exports` directory of the repository by default, which is not tracked by git, so that
+the exports are not committed along with the data sets.
+
+The column types are derived from the ScrAPD models. The fields which are not part of the models, like the extra fields
+of the archive data set, are exported as strings.
+
+This tool requires `pyarrow`, which is an optional dependency:
+
+$ pip install pyarrow
+
+Usage examples:
+
+$ python scrapd-exporter-arrow.py datasets/fatalities-all-augmented.json datasets/archives-all.json
+$ python scrapd-exporter-arrow.py --format arrow --output-dir /tmp datasets/fatalities-2020-augmented.json
+"""
+import argparse
+import datetime
+import enum
+import json
+import pathlib
+
+from loguru import logger
+from scrapd.core import model
+
+TOPDIR = pathlib.Path(__file__).resolve().parent.parent
+EXPORT_DIR = TOPDIR / 'exports'
+
+# Export formats and their file extension.
+FORMATS = {
+    'arrow': 'arrow',
+    'parquet': 'parquet',
+}
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+
+    # Export the data sets.
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    for dataset in args.datasets:
+        for path in export(json.loads(dataset.read_text()), args.output_dir, get_name(dataset), args.format):
+            logger.info(f'=> Exported {path}.')
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Export data sets to Parquet or Arrow files.')
+    parser.add_argument('datasets', nargs='+', type=pathlib.Path, help='Data sets to export')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet', help='Export format')
+    parser.add_argument('--output-dir',
+                        type=pathlib.Path,
+                        default=EXPORT_DIR,
+                        help=f'Output directory (default: {EXPORT_DIR})')
+
+    return parser
+
+
+def get_name(dataset):
+    """
+    Get the name of the exported files of a data set.
+
+    :param pathlib.Path dataset: path of the data set
+    :return: the name of the data set, without its extension
+    :rtype: str
+    """
+    return dataset.name[:-len(''.join(dataset.suffixes))] if dataset.suffixes else dataset.name
+
+
+def import_pyarrow():
+    """
+    Import pyarrow.
+
+    :return: the pyarrow module
+    :rtype: module
+    :raises RuntimeError: if pyarrow is not installed
+    """
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise RuntimeError('pyarrow is required to export data sets: pip install pyarrow') from e
+    return pyarrow
+
+
+def get_arrow_type(pa, type_):
+    """
+    Get the Arrow type of a model field type.
+
+    :param module pa: the pyarrow module
+    :param type type_: model field type
+    :return: the Arrow type
+    :rtype: pyarrow.DataType
+    """
+    if isinstance(type_, type) and issubclass(type_, enum.Enum):
+        return pa.dictionary(pa.int8(), pa.string())
+    types = {
+        bool: pa.bool_(),
+        int: pa.int64(),
+        float: pa.float64(),
+        datetime.date: pa.date32(),
+        datetime.time: pa.time32('s'),
+    }
+    return types.get(type_, pa.string())
+
+
+def convert(value, type_):
+    """
+    Convert a JSON value to the Python type of a model field.
+
+    :param value: JSON value
+    :param type type_: model field type
+    :return: the converted value, or None if it is empty or invalid
+    """
+    if value is None or value == '':
+        return None
+    try:
+        if type_ is datetime.date:
+            return datetime.date.fromisoformat(value)
+        if type_ is datetime.time:
+            return datetime.time.fromisoformat(value)
+        if isinstance(type_, type) and issubclass(type_, enum.Enum):
+            return type_(value).value
+        if type_ in (int, float):
+            return type_(value)
+    except (TypeError, ValueError):
+        return None
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def build_table(pa, rows, model_class, keys=None, exclude=None):
+    """
+    Build an Arrow table.
+
+    :param module pa: the pyarrow module
+    :param list(dict) rows: rows of the table
+    :param pydantic.BaseModel model_class: model describing the columns
+    :param list(str) keys: columns to add first, typed as strings
+    :param list(str) exclude: model fields to leave out
+    :return: the table
+    :rtype: pyarrow.Table
+    """
+    keys = keys or []
+    exclude = set(exclude or []) | set(keys)
+    fields = {name: field.type_ for name, field in model_class.__fields__.items() if name not in exclude}
+    extras = sorted({k for row in rows for k in row} - set(fields) - exclude)
+    types = {**{k: str for k in keys}, **fields, **{k: str for k in extras}}
+
+    arrays = []
+    schema = []
+    for name, type_ in types.items():
+        arrow_type = get_arrow_type(pa, type_)
+        values = [convert(row.get(name), type_) for row in rows]
+        if pa.types.is_dictionary(arrow_type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode().cast(arrow_type))
+        else:
+            arrays.append(pa.array(values, arrow_type))
+        schema.append(pa.field(name, arrow_type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(schema))
+
+
+def build_tables(entries):
+    """
+    Build the crash and fatality tables of a data set.
+
+    :param list(dict) entries: data set entries
+    :return: the crash table, and the fatality table or None if the data set has no fatalities
+    :rtype: tuple
+    """
+    pa = import_pyarrow()
+    crashes = build_table(pa, entries, model.Report, exclude=['fatalities'])
+    if not any('fatalities' in entry for entry in entries):
+        return crashes, None
+
+    rows = [{**fatality, 'case': entry.get('case')} for entry in entries for fatality in entry.get('fatalities') or []]
+    fatalities = build_table(pa, rows, model.Fatality, keys=['case'])
+    return crashes, fatalities
+
+
+def export(entries, output_dir, name, format_='parquet'):
+    """
+    Export a data set.
+
+    :param list(dict) entries: data set entries
+    :param pathlib.Path output_dir: output directory
+    :param str name: name of the data set
+    :param str format_: export format, `parquet` or `arrow`
+    :return: the paths of the exported files
+    :rtype: list(pathlib.Path)
+    """
+    crashes, fatalities = build_tables(entries)
+    paths = []
+    for suffix, table in [('crashes', crashes), ('fatalities', fatalities)]:
+        if table is None:
+            continue
+        path = output_dir / f'{name}-{suffix}.{FORMATS[format_]}'
+        write_table(table, path, format_)
+        paths.append(path)
+    return paths
+
+
+def write_table(table, path, format_):
+    """
+    Write a table.
+
+    :param pyarrow.Table table: table to write
+    :param pathlib.Path path: output file
+    :param str format_: export format, `parquet` or `arrow`
+    """
+    if format_ == 'parquet':
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        pyarrow.parquet.write_table(table, str(path))
+    else:
+        import pyarrow.feather  # pylint: disable=import-outside-toplevel
+        pyarrow.feather.write_feather(table, str(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+`scrapd-pipeline` is a tool to generate the augmented data sets in a single process.
+
+For each year, the raw data set is loaded once, the augmentations are applied in memory (1st pass), the augmenters are
+run, the augmentations are applied again (2nd pass) and the augmented data set is written once.
+
+The years are processed in parallel, by a pool of `--jobs` processes.
+
+A manifest recording the hashes of the inputs and of the tools is written to the cache directory for each augmented
+data set. A year whose manifest is still valid is skipped, unless `--force` is used. No manifest is written for a year
+whose augmenters failed to process some entries, so that it is processed again by the next run.
+
+Usage examples:
+
+$ python scrapd-pipeline.py
+$ python scrapd-pipeline.py --years 2019 2020
+$ python scrapd-pipeline.py --skip-augmenters
+$ python scrapd-pipeline.py --force
+$ python scrapd-pipeline.py --offline
+$ python scrapd-pipeline.py --jobs 4
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import importlib
+import json
+import os
+import pathlib
+import re
+
+from loguru import logger
+
+from scrapd_datasets import merger
+from scrapd_datasets import metrics
+from scrapd_datasets.serializer import to_json
+from scrapd_datasets.serializer import write_if_changed
+
+TOPDIR = pathlib.Path(__file__).resolve().parent.parent
+TOOL_DIR = TOPDIR / 'tools'
+DATASET_DIR = TOPDIR / 'datasets'
+AUGMENTATION_DIR = TOPDIR / 'augmentations'
+CACHE_DIR = pathlib.Path(os.environ.get('XDG_CACHE_HOME', pathlib.Path.home() / '.cache')) / 'scrapd-datasets'
+MANIFEST_DIR = CACHE_DIR / 'manifests'
+
+# Augmenter modules to run, and the name of the augmentation file they generate.
+AUGMENTERS = [
+    ('scrapd_datasets.geocensus', 'augmentation-geocoding-geocensus-{year}.json'),
+]
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+    metrics.init('scrapd-pipeline')
+
+    # Process the years.
+    years = args.years or find_years(args.dataset_dir)
+    augmenters = [] if args.skip_augmenters else AUGMENTERS
+    stale_years = []
+    for year in years:
+        manifest = build_manifest(year, args.dataset_dir, args.augmentation_dir, augmenters)
+        if not args.force and manifest == read_manifest(year, args.manifest_dir):
+            logger.info(f'=> Skipping year {year}: nothing changed.')
+            continue
+        stale_years.append(year)
+
+    # The manifests are written in order, once each year is processed.
+    for year, failures in process_years(stale_years, args.jobs, args.dataset_dir, args.augmentation_dir, augmenters,
+                                        args.offline):
+        if failures:
+            logger.warning(f'=> Not writing the manifest of year {year}: {len(failures)} entries failed.')
+            continue
+        manifest = build_manifest(year, args.dataset_dir, args.augmentation_dir, augmenters)
+        write_manifest(year, args.manifest_dir, manifest)
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Generate the augmented data sets.')
+    parser.add_argument('-y', '--years', nargs='+', type=int, help='Years to process (default: all the raw data sets)')
+    parser.add_argument('--dataset-dir', type=pathlib.Path, default=DATASET_DIR, help='Data set directory')
+    parser.add_argument('--augmentation-dir',
+                        type=pathlib.Path,
+                        default=AUGMENTATION_DIR,
+                        help='Augmentation directory')
+    parser.add_argument('--manifest-dir',
+                        type=pathlib.Path,
+                        default=MANIFEST_DIR,
+                        help=f'Manifest directory (default: {MANIFEST_DIR})')
+    parser.add_argument('--skip-augmenters', action='store_true', help='Only apply the existing augmentations')
+    parser.add_argument('-f', '--force', action='store_true', help='Process the years even if nothing changed')
+    parser.add_argument('--offline', action='store_true', help='Run the augmenters without using the network')
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='Number of years to process in parallel (default: number of CPUs)')
+
+    return parser
+
+
+def find_years(dataset_dir):
+    """
+    Find the years having a raw data set.
+
+    :param pathlib.Path dataset_dir: data set directory
+    :return: the sorted list of years
+    :rtype: list(int)
+    """
+    pattern = re.compile(r'fatalities-(\d{4})-raw\.json')
+    matches = [pattern.fullmatch(f.name) for f in dataset_dir.glob('fatalities-*-raw.json')]
+    return sorted(int(m.group(1)) for m in matches if m)
+
+
+def hash_file(path):
+    """
+    Compute the SHA-256 hash of a file.
+
+    :param pathlib.Path path: path of the file
+    :return: the hex digest of the file, or an empty string if it does not exist
+    :rtype: str
+    """
+    if not path.exists():
+        return ''
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def hash_package():
+    """
+    Compute the SHA-256 hash of the `scrapd_datasets` package, which implements the tools.
+
+    :return: the hex digest of the modules of the package
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    for path in sorted((TOOL_DIR / 'scrapd_datasets').glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def get_scrapd_version():
+    """Get the version of the installed ScrAPD package."""
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover
+        # Python < 3.8.
+        import pkg_resources
+        return pkg_resources.get_distribution('scrapd').version
+    return metadata.version('scrapd')
+
+
+def get_manifest_path(year, manifest_dir):
+    """Get the path of the manifest of the augmented data set of a year."""
+    return manifest_dir / f'fatalities-{year}-augmented.json.manifest'
+
+
+def build_manifest(year, dataset_dir, augmentation_dir, augmenters):
+    """
+    Build the manifest of the augmented data set of a year.
+
+    The manifest contains the hashes of the raw data set, of the augmentations, of the augmented data set and of the
+    tools used to generate it: the pipeline, the augmenters and the `scrapd_datasets` package implementing them.
+
+    :param int year: year to process
+    :param pathlib.Path dataset_dir: data set directory
+    :param pathlib.Path augmentation_dir: augmentation directory
+    :param list(tuple) augmenters: augmenter module names and augmentation file patterns
+    :return: the manifest
+    :rtype: dict
+    """
+    augmentations = {f.name: hash_file(f) for f in sorted((augmentation_dir / str(year)).glob('*.json'))}
+    tools = {'scrapd-pipeline': hash_file(TOOL_DIR / 'scrapd-pipeline.py')}
+    for module_name, _ in augmenters:
+        tools[module_name] = hash_file(pathlib.Path(importlib.import_module(module_name).__file__))
+    tools['scrapd'] = get_scrapd_version()
+    tools['scrapd_datasets'] = hash_package()
+    return {
+        'augmentations': augmentations,
+        'augmented': hash_file(dataset_dir / f'fatalities-{year}-augmented.json'),
+        'raw': hash_file(dataset_dir / f'fatalities-{year}-raw.json'),
+        'tools': tools,
+    }
+
+
+def read_manifest(year, manifest_dir):
+    """
+    Read the manifest of the augmented data set of a year.
+
+    :param int year: year of the data set
+    :param pathlib.Path manifest_dir: manifest directory
+    :return: the manifest, or an empty dict if there is none
+    :rtype: dict
+    """
+    path = get_manifest_path(year, manifest_dir)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def write_manifest(year, manifest_dir, manifest):
+    """
+    Write the manifest of the augmented data set of a year.
+
+    :param int year: year of the data set
+    :param pathlib.Path manifest_dir: manifest directory
+    :param dict manifest: manifest to write
+    """
+    manifest_dir.mkdir(parents=True, exist_ok=True)
+    write_if_changed(get_manifest_path(year, manifest_dir), json.dumps(manifest, sort_keys=True, indent=2) + '\n')
+
+
+def apply_augmentations(entries, augmentation_dir):
+    """
+    Apply all the augmentations of a directory to the entries.
+
+    :param list(dict) entries: entries to augment
+    :param pathlib.Path augmentation_dir: directory containing the augmentation files
+    :return: the augmented entries
+    :rtype: list(dict)
+    """
+    for augmentation in sorted(augmentation_dir.glob('*.json')):
+        logger.info(f'\t\t- {augmentation.name}')
+        results = merger.merge(entries, json.loads(augmentation.read_text()), False, trusted=True)
+        entries = [r.dict() for r in sorted(results, key=lambda x: x.case)]
+    return entries
+
+
+def process_years(years, jobs, dataset_dir, augmentation_dir, augmenters, offline_only=False):
+    """
+    Generate the augmented data sets of several years.
+
+    The years are processed in parallel by a pool of processes, but are returned in order, regardless of the order in
+    which they complete.
+
+    :param list(int) years: years to process
+    :param int jobs: number of processes
+    :param pathlib.Path dataset_dir: data set directory
+    :param pathlib.Path augmentation_dir: augmentation directory
+    :param list(tuple) augmenters: augmenter module names and augmentation file patterns
+    :param bool offline_only: run the augmenters without using the network
+    :return: the processed years, and the cases the augmenters failed to process for each of them
+    :rtype: iterator(tuple(int, list(str)))
+    """
+    if jobs <= 1 or len(years) <= 1:
+        for year in years:
+            yield year, process_year(year, dataset_dir, augmentation_dir, augmenters, offline_only)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(run_year, year, dataset_dir, augmentation_dir, augmenters, offline_only) for year in years
+        ]
+        for year, future in zip(years, futures):
+            stages, failures = future.result()
+            metrics.METRICS.stages.extend(stages)
+            yield year, failures
+
+
+def run_year(year, dataset_dir, augmentation_dir, augmenters, offline_only=False):
+    """
+    Generate the augmented data set of a year in a worker process.
+
+    :param int year: year to process
+    :param pathlib.Path dataset_dir: data set directory
+    :param pathlib.Path augmentation_dir: augmentation directory
+    :param list(tuple) augmenters: augmenter module names and augmentation file patterns
+    :param bool offline_only: run the augmenters without using the network
+    :return: the stages measured while processing the year, to be reported by the main process, and the cases the
+        augmenters failed to process
+    :rtype: tuple(list(dict), list(str))
+    """
+    start = len(metrics.METRICS.stages)
+    failures = process_year(year, dataset_dir, augmentation_dir, augmenters, offline_only)
+    return metrics.METRICS.stages[start:], failures
+
+
+def process_year(year, dataset_dir, augmentation_dir, augmenters, offline_only=False):
+    """
+    Generate the augmented data set of a year.
+
+    :param int year: year to process
+    :param pathlib.Path dataset_dir: data set directory
+    :param pathlib.Path augmentation_dir: augmentation directory
+    :param list(tuple) augmenters: augmenter module names and augmentation file patterns
+    :param bool offline_only: run the augmenters without using the network
+    :return: the cases the augmenters failed to process, e.g. because of request failures
+    :rtype: list(str)
+    """
+    logger.info(f'=> Processing year {year}...')
+    year_augmentation_dir = augmentation_dir / str(year)
+    year_augmentation_dir.mkdir(parents=True, exist_ok=True)
+
+    # Load the raw data set.
+    with metrics.stage('load', year=year) as stage:
+        raw_entries = json.loads((dataset_dir / f'fatalities-{year}-raw.json').read_text())
+        stage['records_out'] = len(raw_entries)
+
+    # Apply the augmentations (1st pass).
+    # This is to restore the previous state as we rebuilt the data set from scratch.
+    logger.info('\t- Applying augmentations (1st pass)...')
+    with metrics.stage('augmentations-1st-pass', year=year) as stage:
+        stage['records_in'] = len(raw_entries)
+        entries = apply_augmentations(raw_entries, year_augmentation_dir)
+        stage['records_out'] = len(entries)
+
+    # Generate the augmentations.
+    logger.info('\t- Generating new augmentations...')
+    failures = []
+    for module_name, augmentation_pattern in augmenters:
+        augmentation_file = year_augmentation_dir / augmentation_pattern.format(year=year)
+        logger.info(f'\t\t- {augmentation_file.name}')
+        with metrics.stage('augmenter', year=year, augmentation=augmentation_file.name) as stage:
+            augmenter = importlib.import_module(module_name)
+            stage['records_in'] = len(entries)
+            # The augmenters update their augmentation file incrementally.
+            # Their reference data is read from the repository containing the data sets.
+            results = augmenter.augment(json.loads(to_json(entries)),
+                                        reference_dir=dataset_dir.resolve().parent,
+                                        offline_only=offline_only,
+                                        augmentation_path=augmentation_file,
+                                        failures=failures)
+            stage['records_out'] = len(results)
+
+    # Apply the augmentations (2nd pass).
+    # This is to add the new augmentations if any. They are applied to the raw data set again, so the augmentations
+    # which changed replace the values of the 1st pass.
+    logger.info('\t- Applying augmentations (2nd pass)...')
+    with metrics.stage('augmentations-2nd-pass', year=year) as stage:
+        stage['records_in'] = len(raw_entries)
+        entries = apply_augmentations(raw_entries, year_augmentation_dir)
+        stage['records_out'] = len(entries)
+
+    # Write the augmented data set.
+    with metrics.stage('write', year=year) as stage:
+        stage['records_in'] = len(entries)
+        write_if_changed(dataset_dir / f'fatalities-{year}-augmented.json', to_json(entries))
+
+    return failures
+
+
+if __name__ == "__main__":
+    main()
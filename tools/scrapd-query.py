@@ -0,0 +1,293 @@
+"""
+`scrapd-query` is a tool to query the fatalities by date, demographics and location.
+
+The data sets are loaded once into typed columns, with one row per fatality, sorted by date. The crashes without
+fatality information, like the ones of the archive data set, have a single row with empty demographics. The Socrata
+fields of the archive data set, like the type of crash, are added to the matching crashes.
+
+The date ranges are found by binary search, the categorical columns and the location tokens are indexed with bitmaps,
+and the filters are combined with bitwise operations.
+
+Usage examples:
+
+$ python scrapd-query.py --from 2019-01-01 --to 2019-12-31 --type pedestrian --min-age 60 --location "ih 35"
+$ python scrapd-query.py --gender female --ethnicity hispanic --count
+"""
+import argparse
+import array
+import bisect
+import collections
+import datetime
+import json
+import math
+import pathlib
+import re
+
+TOPDIR = pathlib.Path(__file__).resolve().parent.parent
+DATASET_DIR = TOPDIR / 'datasets'
+
+# Indexed categorical columns.
+CATEGORIES = ['ethnicity', 'gender', 'impairment', 'type']
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+
+    # Load the data sets and run the query.
+    engine = QueryEngine.from_datasets(args.datasets or get_default_datasets(DATASET_DIR))
+    filters = {
+        'date_from': args.date_from,
+        'date_to': args.date_to,
+        'min_age': args.min_age,
+        'max_age': args.max_age,
+        'location': args.location,
+        **{category: getattr(args, category)
+           for category in CATEGORIES},
+    }
+    rows = engine.query(**filters)
+    if args.count:
+        print(len(rows))
+    else:
+        print(json.dumps([engine.get_row(row) for row in rows], sort_keys=True, indent=2))
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Query the fatalities.')
+    parser.add_argument('--datasets',
+                        nargs='+',
+                        type=pathlib.Path,
+                        help='Data sets to load (default: the augmented data sets and the archives)')
+    parser.add_argument('--from', dest='date_from', help='First date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='Last date (YYYY-MM-DD)')
+    parser.add_argument('--min-age', type=int, help='Minimum age')
+    parser.add_argument('--max-age', type=int, help='Maximum age')
+    parser.add_argument('--location', help='Words of the location')
+    for category in CATEGORIES:
+        parser.add_argument(f'--{category}', nargs='+', help=f'Values of the {category}')
+    parser.add_argument('--count', action='store_true', help='Only display the number of fatalities')
+
+    return parser
+
+
+def get_default_datasets(dataset_dir):
+    """
+    Get the data sets loaded by default.
+
+    :param pathlib.Path dataset_dir: data set directory
+    :return: the yearly augmented data sets and the archive data set
+    :rtype: list(pathlib.Path)
+    """
+    datasets = sorted(dataset_dir.glob('fatalities-[0-9][0-9][0-9][0-9]-augmented.json'))
+    archive = dataset_dir / 'archives-all.json'
+    return datasets + ([archive] if archive.exists() else [])
+
+
+def tokenize(text):
+    """
+    Split a text into lower case words.
+
+    :param str text: text to split
+    :return: the words
+    :rtype: list(str)
+    """
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+def to_ordinal(date):
+    """
+    Convert a date to an ordinal.
+
+    :param str date: date as `YYYY-MM-DD`
+    :return: the proleptic Gregorian ordinal of the date, or 0 if the date is empty or invalid
+    :rtype: int
+    """
+    try:
+        return datetime.date.fromisoformat(date).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+def iter_bits(mask):
+    """
+    Iterate over the bits set in a bitmap.
+
+    :param int mask: bitmap
+    :return: the positions of the bits, in increasing order
+    :rtype: iterator(int)
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class QueryEngine:
+    """
+    Query fatalities stored in memory as columns.
+
+    The rows are sorted by date, and each indexed value maps to a bitmap of the rows having this value.
+    """
+
+    def __init__(self, rows):
+        """
+        Initialize the engine.
+
+        :param list(dict) rows: rows, with the keys `case`, `date`, `time`, `location`, `latitude`, `longitude`, `age`
+            and the categories
+        """
+        rows = sorted(rows, key=lambda r: (to_ordinal(r.get('date')), r.get('case') or ''))
+        self.size = len(rows)
+        self.all = (1 << self.size) - 1
+
+        # Typed columns.
+        self.dates = array.array('l', (to_ordinal(r.get('date')) for r in rows))
+        # The unknown ages are stored as -1, and the unknown coordinates as NaN.
+        self.ages = array.array('h', (-1 if r.get('age') is None else r['age'] for r in rows))
+        self.latitudes = array.array('d', (math.nan if r.get('latitude') is None else r['latitude'] for r in rows))
+        self.longitudes = array.array('d', (math.nan if r.get('longitude') is None else r['longitude'] for r in rows))
+        self.cases = [r.get('case') or '' for r in rows]
+        self.times = [r.get('time') for r in rows]
+        self.locations = [r.get('location') or '' for r in rows]
+
+        # Bitmap indexes.
+        self.categories = {category: collections.defaultdict(int) for category in CATEGORIES}
+        self.codes = {category: array.array('H') for category in CATEGORIES}
+        self.values = {category: [] for category in CATEGORIES}
+        self.age_index = collections.defaultdict(int)
+        self.tokens = collections.defaultdict(int)
+        lookups = {category: {} for category in CATEGORIES}
+        for i, row in enumerate(rows):
+            bit = 1 << i
+            for category in CATEGORIES:
+                value = (row.get(category) or '').lower()
+                code = lookups[category].setdefault(value, len(self.values[category]))
+                if code == len(self.values[category]):
+                    self.values[category].append(value)
+                self.categories[category][value] |= bit
+                self.codes[category].append(code)
+            self.age_index[self.ages[i]] |= bit
+            for token in set(tokenize(row.get('location'))):
+                self.tokens[token] |= bit
+
+    @classmethod
+    def from_datasets(cls, datasets):
+        """
+        Load data sets.
+
+        :param list(pathlib.Path) datasets: ScrAPD data sets, and Socrata archive data sets
+        :return: the engine
+        :rtype: QueryEngine
+        """
+        return cls(build_rows([json.loads(dataset.read_text()) for dataset in datasets]))
+
+    def query(self, date_from=None, date_to=None, min_age=None, max_age=None, location=None, **categories):
+        """
+        Find the rows matching all the filters.
+
+        :param str date_from: first date, as `YYYY-MM-DD`
+        :param str date_to: last date, as `YYYY-MM-DD`
+        :param int min_age: minimum age
+        :param int max_age: maximum age
+        :param str location: words which must all appear in the location
+        :param dict categories: accepted values of each category
+        :return: the row numbers, sorted by date
+        :rtype: list(int)
+        """
+        mask = self.all
+
+        # Date range.
+        if date_from or date_to:
+            lo = bisect.bisect_left(self.dates, to_ordinal(date_from)) if date_from else 0
+            hi = bisect.bisect_right(self.dates, to_ordinal(date_to)) if date_to else self.size
+            lo = max(lo, bisect.bisect_right(self.dates, 0))
+            mask &= ((1 << hi) - 1) ^ ((1 << lo) - 1) if hi > lo else 0
+
+        # Age range.
+        if min_age is not None or max_age is not None:
+            low = 0 if min_age is None else min_age
+            high = float('inf') if max_age is None else max_age
+            age_mask = 0
+            for age, bitmap in self.age_index.items():
+                if age >= 0 and low <= age <= high:
+                    age_mask |= bitmap
+            mask &= age_mask
+
+        # Categories.
+        for category, values in categories.items():
+            if category not in self.categories:
+                raise ValueError(f'unknown category: "{category}"')
+            if values:
+                if isinstance(values, str):
+                    values = [values]
+                category_mask = 0
+                for value in values:
+                    category_mask |= self.categories[category].get(value.lower(), 0)
+                mask &= category_mask
+
+        # Location.
+        for token in tokenize(location):
+            mask &= self.tokens.get(token, 0)
+
+        return list(iter_bits(mask))
+
+    def get_row(self, row):
+        """
+        Get the values of a row.
+
+        :param int row: row number
+        :return: the values of the row
+        :rtype: dict
+        """
+        date = self.dates[row]
+        values = {
+            'age': self.ages[row] if self.ages[row] >= 0 else None,
+            'case': self.cases[row],
+            'date': datetime.date.fromordinal(date).isoformat() if date else None,
+            'latitude': None if math.isnan(self.latitudes[row]) else self.latitudes[row],
+            'location': self.locations[row],
+            'longitude': None if math.isnan(self.longitudes[row]) else self.longitudes[row],
+            'time': self.times[row],
+        }
+        values.update({c: self.values[c][self.codes[c][row]] or None for c in CATEGORIES})
+        return values
+
+
+def build_rows(datasets):
+    """
+    Build one row per fatality.
+
+    The first data set containing a case provides its crash and fatality fields. The categories found in the other data
+    sets, like the Socrata fields of the archive data set, complete them.
+
+    :param list(list(dict)) datasets: data sets
+    :return: the rows
+    :rtype: list(dict)
+    """
+    crashes = {}
+    for dataset in datasets:
+        for entry in dataset:
+            crash = crashes.setdefault(entry['case'], {**entry, 'fatalities': entry.get('fatalities') or []})
+            for category in CATEGORIES:
+                if not crash.get(category) and entry.get(category):
+                    crash[category] = entry[category]
+
+    rows = []
+    for crash in crashes.values():
+        fields = {k: v for k, v in crash.items() if k != 'fatalities'}
+        for fatality in crash['fatalities'] or [{}]:
+            rows.append({
+                **fields,
+                'age': fatality.get('age'),
+                'ethnicity': fatality.get('ethnicity'),
+                'gender': fatality.get('gender'),
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    main()
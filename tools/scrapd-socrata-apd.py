@@ -0,0 +1,142 @@
+"""
+`scrapd-socrata-apd` is a tool to generate all the Socrata APD augmentations and the archive data set in one pass.
+
+The Socrata data set is read once and its entries are partitioned by the year of their case number. Each raw data set
+is joined with the partitions of its case numbers to generate the `augmentation-import-apd-{year}.json` files, and all
+the entries are used to generate the archive data set.
+
+Usage examples:
+
+$ python scrapd-socrata-apd.py
+$ python scrapd-socrata-apd.py --years 2017
+"""
+import argparse
+import collections
+import json
+import pathlib
+import re
+
+from loguru import logger
+
+from scrapd_datasets import archive
+from scrapd_datasets import socrata
+from scrapd_datasets.serializer import dumps
+from scrapd_datasets.serializer import iter_records
+from scrapd_datasets.serializer import write_if_changed
+
+TOPDIR = pathlib.Path(__file__).resolve().parent.parent
+DATASET_DIR = TOPDIR / 'datasets'
+AUGMENTATION_DIR = TOPDIR / 'augmentations'
+SOCRATA_DATASET = TOPDIR / 'external-datasets' / 'socrata-apd-archives' / 'socrata-apd-all.json'
+ARCHIVE_DATASET = DATASET_DIR / 'archives-all.json'
+
+# Case numbers start with the last 2 digits of the year, e.g. "18-0041689".
+CASE_YEAR_PATTERN = re.compile(r'^\s*(\d{2})-')
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+
+    # Read the Socrata data set once.
+    with args.socrata.open() as f:
+        partitions = partition(iter_records(f))
+
+    # Generate the augmentations.
+    years = args.years or find_years(args.dataset_dir, partitions)
+    for year in years:
+        logger.info(f'=> Generating Socrata APD augmentation for {year}...')
+        raw = json.loads((args.dataset_dir / f'fatalities-{year}-raw.json').read_text())
+        augmentation = generate_augmentation(raw, partitions)
+        augmentation_file = args.augmentation_dir / str(year) / f'augmentation-import-apd-{year}.json'
+        augmentation_file.parent.mkdir(parents=True, exist_ok=True)
+        write_if_changed(augmentation_file, dumps(augmentation) + '\n')
+
+    # Generate the archive data set.
+    if not args.skip_archive:
+        logger.info('=> Generating archive data set...')
+        entries = [entry for year in sorted(partitions, key=lambda x: (x is None, x)) for entry in partitions[year]]
+        write_if_changed(args.archive, dumps(archive.merge([], entries, extras=True)) + '\n')
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Generate the Socrata APD augmentations and archive data set.')
+    parser.add_argument('-y',
+                        '--years',
+                        nargs='+',
+                        type=int,
+                        help='Years to process (default: the years having both raw and Socrata entries)')
+    parser.add_argument('--socrata', type=pathlib.Path, default=SOCRATA_DATASET, help='Socrata data set')
+    parser.add_argument('--dataset-dir', type=pathlib.Path, default=DATASET_DIR, help='Data set directory')
+    parser.add_argument('--augmentation-dir',
+                        type=pathlib.Path,
+                        default=AUGMENTATION_DIR,
+                        help='Augmentation directory')
+    parser.add_argument('--archive', type=pathlib.Path, default=ARCHIVE_DATASET, help='Archive data set')
+    parser.add_argument('--skip-archive', action='store_true', help='Do not generate the archive data set')
+
+    return parser
+
+
+def get_case_year(case):
+    """
+    Get the year of a case number.
+
+    :param str case: case number
+    :return: the year of the case, or None if the case number is invalid
+    :rtype: int
+    """
+    match = CASE_YEAR_PATTERN.match(case or '')
+    if not match:
+        return None
+    return 2000 + int(match.group(1))
+
+
+def partition(entries):
+    """
+    Partition the Socrata entries by the year of their case number.
+
+    :param iterator(dict) entries: socrata data
+    :return: the entries of each year, in their original order, the entries without a valid case number being under
+        None
+    :rtype: dict
+    """
+    partitions = collections.defaultdict(list)
+    for entry in entries:
+        partitions[get_case_year(entry.get('case_number'))].append(entry)
+    return dict(partitions)
+
+
+def find_years(dataset_dir, partitions):
+    """
+    Find the years having both a raw data set and Socrata entries.
+
+    :param pathlib.Path dataset_dir: data set directory
+    :param dict partitions: Socrata entries by year
+    :return: the sorted list of years
+    :rtype: list(int)
+    """
+    return sorted(year for year in partitions if year and (dataset_dir / f'fatalities-{year}-raw.json').exists())
+
+
+def generate_augmentation(raw, partitions):
+    """
+    Join a raw data set with the Socrata entries.
+
+    Only the partitions matching the case numbers of the raw data set are used.
+
+    :param list(dict) raw: raw data set
+    :param dict partitions: Socrata entries by year
+    :return: the Socrata APD augmentation
+    :rtype: list(dict)
+    """
+    years = sorted({get_case_year(entry.get('case')) for entry in raw} & set(partitions) - {None})
+    entries = [entry for year in years for entry in partitions[year]]
+    return socrata.merge(raw, entries)
+
+
+if __name__ == "__main__":
+    main()
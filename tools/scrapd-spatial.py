@@ -0,0 +1,389 @@
+"""
+`scrapd-spatial` is a tool to query the crashes by location.
+
+The crashes having coordinates are stored in a spatial index made of grid cells. The index supports radius, bounding
+box and k-nearest queries, and the distances are computed with the haversine formula.
+
+The coordinates outside of the Austin area are ignored, unless they are valid once the latitude and the longitude are
+swapped back, which happens in the archives.
+
+The index is saved in the cache directory, along with the hashes of the data sets it was built from. It is reused as
+long as the data sets do not change.
+
+Usage examples:
+
+$ python scrapd-spatial.py radius 30.2672 -97.7431 500
+$ python scrapd-spatial.py bbox 30.26 -97.75 30.28 -97.73
+$ python scrapd-spatial.py nearest 30.2672 -97.7431 -k 5 --before 2019-01-01
+$ python scrapd-spatial.py --datasets datasets/archives-all.json nearest 30.2672 -97.7431
+"""
+import argparse
+import collections
+import hashlib
+import heapq
+import json
+import math
+import os
+import pathlib
+
+from loguru import logger
+
+TOPDIR = pathlib.Path(__file__).resolve().parent.parent
+DATASET_DIR = TOPDIR / 'datasets'
+CACHE_DIR = pathlib.Path(os.environ.get('XDG_CACHE_HOME', pathlib.Path.home() / '.cache')) / 'scrapd-datasets'
+INDEX_PATH = CACHE_DIR / 'spatial-index.json'
+INDEX_VERSION = 1
+
+# Size of the grid cells, in degrees (about 1.1 km of latitude).
+CELL_SIZE = 0.01
+EARTH_RADIUS = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+# The bounding box is used to discard the invalid coordinates, as ((south, west), (north, east)).
+AUSTIN_BOUNDING_BOX = ((29.9, -98.2), (30.7, -97.3))
+
+# Fields of the crashes kept in the index.
+RECORD_FIELDS = ['case', 'date', 'latitude', 'location', 'longitude', 'time']
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+
+    # Load the index.
+    datasets = args.datasets or get_default_datasets(DATASET_DIR)
+    index = SpatialIndex.build(datasets, None if args.no_cache else args.index)
+
+    # Run the query.
+    if args.command == 'radius':
+        results = index.radius(args.latitude, args.longitude, args.meters)
+    elif args.command == 'bbox':
+        results = [(None, record) for record in index.bbox(args.south, args.west, args.north, args.east)]
+    else:
+        predicate = (lambda r: (r.get('date') or '') < args.before) if args.before else None
+        results = index.nearest(args.latitude, args.longitude, args.k, predicate)
+    print(json.dumps([{**record, 'distance': d} for d, record in results], sort_keys=True, indent=2))
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Query the crashes by location.')
+    parser.add_argument('--datasets',
+                        nargs='+',
+                        type=pathlib.Path,
+                        help='Data sets to index (default: the augmented data sets and the archives)')
+    parser.add_argument('--index', type=pathlib.Path, default=INDEX_PATH, help='Path of the saved index')
+    parser.add_argument('--no-cache', action='store_true', help='Do not load or save the index')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    radius_parser = subparsers.add_parser('radius', help='Find the crashes within a distance')
+    radius_parser.add_argument('latitude', type=float)
+    radius_parser.add_argument('longitude', type=float)
+    radius_parser.add_argument('meters', type=float)
+
+    bbox_parser = subparsers.add_parser('bbox', help='Find the crashes within a bounding box')
+    bbox_parser.add_argument('south', type=float)
+    bbox_parser.add_argument('west', type=float)
+    bbox_parser.add_argument('north', type=float)
+    bbox_parser.add_argument('east', type=float)
+
+    nearest_parser = subparsers.add_parser('nearest', help='Find the nearest crashes')
+    nearest_parser.add_argument('latitude', type=float)
+    nearest_parser.add_argument('longitude', type=float)
+    nearest_parser.add_argument('-k', type=int, default=1, help='Number of crashes')
+    nearest_parser.add_argument('--before', help='Only consider the crashes prior to this date (YYYY-MM-DD)')
+
+    return parser
+
+
+def get_default_datasets(dataset_dir):
+    """
+    Get the data sets indexed by default.
+
+    :param pathlib.Path dataset_dir: data set directory
+    :return: the yearly augmented data sets and the archive data set
+    :rtype: list(pathlib.Path)
+    """
+    datasets = sorted(dataset_dir.glob('fatalities-[0-9][0-9][0-9][0-9]-augmented.json'))
+    archive = dataset_dir / 'archives-all.json'
+    return datasets + ([archive] if archive.exists() else [])
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Compute the distance between 2 points.
+
+    :param float lat1: latitude of the 1st point
+    :param float lon1: longitude of the 1st point
+    :param float lat2: latitude of the 2nd point
+    :param float lon2: longitude of the 2nd point
+    :return: the distance in meters
+    :rtype: float
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2)**2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def hash_file(path):
+    """
+    Compute the SHA-256 hash of a file.
+
+    :param pathlib.Path path: path of the file
+    :return: the hex digest of the file
+    :rtype: str
+    """
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class SpatialIndex:
+    """
+    Index crashes by location.
+
+    The crashes are stored in square grid cells of `cell_size` degrees. A query only visits the cells which may contain
+    results.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        """
+        Initialize the index.
+
+        :param float cell_size: size of the grid cells, in degrees
+        """
+        self.cell_size = cell_size
+        self.records = []
+        self.cells = collections.defaultdict(list)
+        self.bounds = None
+        self.sources = {}
+
+    @classmethod
+    def build(cls, datasets, path=INDEX_PATH):
+        """
+        Build an index from data sets, or load it if it was saved from the same data sets.
+
+        :param list(pathlib.Path) datasets: data sets to index
+        :param pathlib.Path path: path of the saved index, or None to neither load nor save it
+        :return: the index
+        :rtype: SpatialIndex
+        """
+        sources = {str(dataset): hash_file(dataset) for dataset in datasets}
+        if path and path.exists():
+            index = cls.load(path)
+            if index and index.sources == sources:
+                return index
+
+        index = cls()
+        for dataset in datasets:
+            index.add_all(json.loads(dataset.read_text()), dataset.name)
+        index.sources = sources
+        if path:
+            index.save(path)
+        logger.debug(f'Indexed {len(index.records)} crashes.')
+        return index
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a saved index.
+
+        :param pathlib.Path path: path of the saved index
+        :return: the index, or None if it was saved by another version of this tool
+        :rtype: SpatialIndex
+        """
+        data = json.loads(path.read_text())
+        if data.get('version') != INDEX_VERSION:
+            return None
+        index = cls(data['cell_size'])
+        for record in data['records']:
+            index.add(record)
+        index.sources = data['sources']
+        return index
+
+    def save(self, path):
+        """
+        Save the index.
+
+        :param pathlib.Path path: path of the saved index
+        """
+        data = {
+            'cell_size': self.cell_size,
+            'records': self.records,
+            'sources': self.sources,
+            'version': INDEX_VERSION,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(data, sort_keys=True))
+        os.replace(str(tmp), str(path))
+
+    def add_all(self, entries, source=''):
+        """
+        Add the entries of a data set.
+
+        :param list(dict) entries: data set entries
+        :param str source: name of the data set
+        """
+        for entry in entries:
+            record = {field: entry.get(field) for field in RECORD_FIELDS}
+            record['source'] = source
+            self.add(record)
+
+    def add(self, record):
+        """
+        Add a crash.
+
+        The crashes without coordinates or outside of `AUSTIN_BOUNDING_BOX` are ignored. The coordinates which were
+        swapped are swapped back.
+
+        :param dict record: crash, with at least a latitude and a longitude
+        """
+        if not record.get('latitude') or not record.get('longitude'):
+            return
+        if not is_in_bounding_box(record['latitude'], record['longitude']):
+            if not is_in_bounding_box(record['longitude'], record['latitude']):
+                logger.debug(f'Ignoring the crash {record.get("case")}, whose coordinates are out of range.')
+                return
+            record = {**record, 'latitude': record['longitude'], 'longitude': record['latitude']}
+        cell = self.get_cell(record['latitude'], record['longitude'])
+        self.records.append(record)
+        self.cells[cell].append(record)
+        if self.bounds:
+            (min_row, min_col), (max_row, max_col) = self.bounds
+            self.bounds = ((min(min_row, cell[0]), min(min_col, cell[1])), (max(max_row,
+                                                                                cell[0]), max(max_col, cell[1])))
+        else:
+            self.bounds = (cell, cell)
+
+    def get_cell(self, latitude, longitude):
+        """
+        Get the grid cell of a point.
+
+        :param float latitude: latitude of the point
+        :param float longitude: longitude of the point
+        :return: the cell coordinates
+        :rtype: tuple(int, int)
+        """
+        return (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+
+    def bbox(self, south, west, north, east):
+        """
+        Find the crashes within a bounding box.
+
+        :param float south: minimum latitude
+        :param float west: minimum longitude
+        :param float north: maximum latitude
+        :param float east: maximum longitude
+        :return: the crashes
+        :rtype: list(dict)
+        """
+        (min_row, min_col), (max_row, max_col) = self.get_cell(south, west), self.get_cell(north, east)
+        results = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                results.extend(r for r in self.cells.get((row, col), [])
+                               if south <= r['latitude'] <= north and west <= r['longitude'] <= east)
+        return results
+
+    def radius(self, latitude, longitude, meters):
+        """
+        Find the crashes within a distance of a point.
+
+        :param float latitude: latitude of the point
+        :param float longitude: longitude of the point
+        :param float meters: distance
+        :return: the distances and the crashes, sorted by distance
+        :rtype: list(tuple(float, dict))
+        """
+        dlat = meters / METERS_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+        candidates = self.bbox(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+        results = [(haversine(latitude, longitude, r['latitude'], r['longitude']), r) for r in candidates]
+        return sorted((result for result in results if result[0] <= meters), key=lambda x: x[0])
+
+    def nearest(self, latitude, longitude, k=1, predicate=None):
+        """
+        Find the nearest crashes of a point.
+
+        The cells are visited by rings of increasing size, until the remaining rings cannot contain closer crashes, or
+        all the crashes were visited.
+
+        :param float latitude: latitude of the point
+        :param float longitude: longitude of the point
+        :param int k: number of crashes
+        :param callable predicate: function selecting the crashes to consider
+        :return: the distances and the crashes, sorted by distance
+        :rtype: list(tuple(float, dict))
+        """
+        if not self.cells or k <= 0:
+            return []
+
+        # Shortest side of a cell, in meters.
+        cell_meters = self.cell_size * METERS_PER_DEGREE * min(
+            math.cos(math.radians(min(abs(latitude) + self.cell_size, 90))), 1)
+        row, col = self.get_cell(latitude, longitude)
+        (min_row, min_col), (max_row, max_col) = self.bounds
+        max_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+
+        heap = []
+        visited = 0
+        for ring in range(max_ring + 1):
+            # The crashes of this ring are at least `ring - 1` cells away.
+            if len(heap) == k and (ring - 1) * cell_meters > -heap[0][0]:
+                break
+            if visited == len(self.records):
+                break
+            for cell in iter_ring(row, col, ring):
+                records = self.cells.get(cell, [])
+                visited += len(records)
+                for record in records:
+                    if predicate and not predicate(record):
+                        continue
+                    distance = haversine(latitude, longitude, record['latitude'], record['longitude'])
+                    item = (-distance, id(record), record)
+                    if len(heap) < k:
+                        heapq.heappush(heap, item)
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, item)
+        return [(-d, record) for d, _, record in sorted(heap, key=lambda x: (-x[0], x[1]))]
+
+
+def is_in_bounding_box(latitude, longitude):
+    """
+    Check whether a point is within `AUSTIN_BOUNDING_BOX`.
+
+    :param float latitude: latitude of the point
+    :param float longitude: longitude of the point
+    :return: True if the point is within the bounding box
+    :rtype: bool
+    """
+    (south, west), (north, east) = AUSTIN_BOUNDING_BOX
+    return south <= latitude <= north and west <= longitude <= east
+
+
+def iter_ring(row, col, ring):
+    """
+    Iterate over the cells of a square ring.
+
+    :param int row: row of the center cell
+    :param int col: column of the center cell
+    :param int ring: distance of the ring to the center cell, in cells
+    :return: the cells of the ring
+    :rtype: iterator(tuple(int, int))
+    """
+    if ring == 0:
+        yield (row, col)
+        return
+    for c in range(col - ring, col + ring + 1):
+        yield (row - ring, c)
+        yield (row + ring, c)
+    for r in range(row - ring + 1, row + ring):
+        yield (r, col - ring)
+        yield (r, col + ring)
+
+
+if __name__ == "__main__":
+    main()
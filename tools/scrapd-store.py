@@ -0,0 +1,415 @@
+"""
+`scrapd-store` is a tool to manage the data sets in an indexed SQLite database.
+
+The store holds the raw reports, the augmentation layers and the augmented reports of every year. The reports are
+indexed by case number, date and coordinates.
+
+The raw reports are merged with transactional UPSERTs, using the same rules as the `scrapd-merger` tool. Each
+augmentation file is stored as a layer, and only the reports whose raw entry or layers changed are augmented again. The
+augmented reports are the raw reports with all the layers applied by order of name, like in the `scrapd-pipeline` tool.
+The JSON data sets can then be generated from the store.
+
+Usage examples:
+
+$ python scrapd-store.py fatalities.sqlite import datasets/fatalities-*-raw.json
+$ python scrapd-store.py fatalities.sqlite import -u -y 2020 <(scrapd --format json --from "Jan 1 2020")
+$ python scrapd-store.py fatalities.sqlite augment augmentations/*/augmentation-*.json
+$ python scrapd-store.py fatalities.sqlite export --dataset-dir datasets
+$ python scrapd-store.py fatalities.sqlite query --from 2019-01-01 --to 2019-01-31
+$ python scrapd-store.py fatalities.sqlite query --bbox 30.2 -97.8 30.3 -97.7
+"""
+import argparse
+import json
+import pathlib
+import re
+import sqlite3
+
+from loguru import logger
+from scrapd.core import model
+
+from scrapd_datasets import merger
+from scrapd_datasets.serializer import to_json
+from scrapd_datasets.serializer import write_if_changed
+
+TOPDIR = pathlib.Path(__file__).resolve().parent.parent
+DATASET_DIR = TOPDIR / 'datasets'
+
+# Data sets of the store.
+RAW = 'raw'
+AUGMENTED = 'augmented'
+
+# Columns of the tables.
+REPORT_COLUMNS = ['case', 'crash', 'date', 'latitude', 'link', 'location', 'longitude', 'notes', 'time']
+FATALITY_COLUMNS = ['age', 'dob', 'ethnicity', 'first', 'gender', 'generation', 'last', 'middle']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    dataset TEXT, year INTEGER, "case" TEXT, crash INTEGER, date TEXT, latitude REAL, link TEXT, location TEXT,
+    longitude REAL, notes TEXT, time TEXT,
+    PRIMARY KEY (dataset, "case"));
+CREATE INDEX IF NOT EXISTS reports_case ON reports ("case");
+CREATE INDEX IF NOT EXISTS reports_year ON reports (dataset, year);
+CREATE INDEX IF NOT EXISTS reports_date ON reports (dataset, date);
+CREATE INDEX IF NOT EXISTS reports_coordinates ON reports (dataset, latitude, longitude);
+CREATE TABLE IF NOT EXISTS fatalities (
+    dataset TEXT, "case" TEXT, position INTEGER, age INTEGER, dob TEXT, ethnicity TEXT, first TEXT, gender TEXT,
+    generation TEXT, last TEXT, middle TEXT,
+    PRIMARY KEY (dataset, "case", position));
+CREATE TABLE IF NOT EXISTS augmentations (
+    layer TEXT, year INTEGER, "case" TEXT, entry TEXT,
+    PRIMARY KEY (layer, "case"));
+CREATE INDEX IF NOT EXISTS augmentations_case ON augmentations ("case");
+"""
+
+# File name patterns.
+RAW_PATTERN = re.compile(r'fatalities-(\d{4})-raw\.json')
+YEAR_PATTERN = re.compile(r'(\d{4})')
+
+
+def main():
+    """Define the main entrypoint of the program."""
+    # Create the CLI.
+    parser = get_cli_parser()
+    args = parser.parse_args()
+
+    store = Store(args.store)
+    try:
+        if args.command == 'import':
+            for dataset in args.datasets:
+                year = args.year or get_year(dataset, RAW_PATTERN)
+                changed = store.merge(json.loads(dataset.read_text()), year, args.update, args.trusted)
+                logger.info(f'=> Imported {dataset}: {changed} report(s) changed.')
+        elif args.command == 'augment':
+            for augmentation in args.augmentations:
+                year = args.year or get_year(augmentation, YEAR_PATTERN)
+                changed = store.augment(augmentation.name, year, json.loads(augmentation.read_text()))
+                logger.info(f'=> Applied {augmentation}: {changed} report(s) changed.')
+        elif args.command == 'export':
+            for year in args.years or store.get_years():
+                for dataset in [RAW, AUGMENTED]:
+                    path = args.dataset_dir / f'fatalities-{year}-{dataset}.json'
+                    write_if_changed(path, to_json(list(store.iter_reports(dataset, year))))
+        elif args.command == 'query':
+            dataset = RAW if args.raw else AUGMENTED
+            print(to_json(list(store.query(dataset, args.date_from, args.date_to, args.bbox, args.case))))
+    finally:
+        store.close()
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Manage the data sets in a SQLite store.')
+    parser.add_argument('store', type=pathlib.Path, help='Path of the SQLite store')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    import_parser = subparsers.add_parser('import', help='Merge raw data sets into the store')
+    import_parser.add_argument('datasets', nargs='+', type=pathlib.Path)
+    import_parser.add_argument('-y', '--year', type=int, help='Year of the data sets (default: from the file name)')
+    import_parser.add_argument('-u', '--update', action='store_true', help='Update existing fields')
+    import_parser.add_argument('-t', '--trusted', action='store_true', help='Do not validate the stored reports again')
+
+    augment_parser = subparsers.add_parser('augment', help='Store augmentation files as layers')
+    augment_parser.add_argument('augmentations', nargs='+', type=pathlib.Path)
+    augment_parser.add_argument('-y', '--year', type=int, help='Year of the layers (default: from the file path)')
+
+    export_parser = subparsers.add_parser('export', help='Generate the JSON data sets')
+    export_parser.add_argument('-y', '--years', nargs='+', type=int, help='Years to export (default: all)')
+    export_parser.add_argument('--dataset-dir', type=pathlib.Path, default=DATASET_DIR, help='Data set directory')
+
+    query_parser = subparsers.add_parser('query', help='Query the augmented reports')
+    query_parser.add_argument('--from', dest='date_from', help='First date (YYYY-MM-DD)')
+    query_parser.add_argument('--to', dest='date_to', help='Last date (YYYY-MM-DD)')
+    query_parser.add_argument('--bbox',
+                              nargs=4,
+                              type=float,
+                              metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'),
+                              help='Bounding box')
+    query_parser.add_argument('--case', help='Case number')
+    query_parser.add_argument('--raw', action='store_true', help='Query the raw reports instead')
+
+    return parser
+
+
+def get_year(path, pattern):
+    """
+    Get the year of a data set or of an augmentation from its path.
+
+    :param pathlib.Path path: path of the file
+    :param re.Pattern pattern: pattern capturing the year
+    :return: the year
+    :rtype: int
+    :raises ValueError: if the path does not contain a year
+    """
+    for part in [path.name, path.parent.name]:
+        match = pattern.search(part)
+        if match:
+            return int(match.group(1))
+    raise ValueError(f'cannot find the year of "{path}", use --year')
+
+
+def serialize(report):
+    """
+    Convert a report to JSON values.
+
+    :param model.Report report: report to convert
+    :return: the JSON representation of the report
+    :rtype: dict
+    """
+    return json.loads(to_json(report))
+
+
+class Store:
+    """
+    Store the data sets in a SQLite database.
+
+    The reports are kept as JSON values, exactly as they are written in the data sets.
+    """
+
+    def __init__(self, path=':memory:'):
+        """
+        Initialize the store.
+
+        :param str path: path of the SQLite database, defaults to an in-memory database
+        """
+        self.connection = sqlite3.connect(str(path), timeout=60)
+        self.connection.executescript(SCHEMA)
+
+    def get(self, case, dataset=RAW):
+        """
+        Retrieve a report.
+
+        :param str case: case number
+        :param str dataset: data set, `raw` or `augmented`
+        :return: the report, or None if it is missing
+        :rtype: dict
+        """
+        rows = self.connection.execute(
+            f'SELECT {", ".join(quote(c) for c in REPORT_COLUMNS)} FROM reports WHERE dataset = ? AND "case" = ?',
+            (dataset, case)).fetchall()
+        reports = self._load_reports(dataset, rows)
+        return reports[0] if reports else None
+
+    def put(self, report, year, dataset=RAW):
+        """
+        Write a report.
+
+        The caller is responsible for the transaction.
+
+        :param dict report: report, as JSON values
+        :param int year: year of the report
+        :param str dataset: data set, `raw` or `augmented`
+        """
+        case = report['case']
+        self.connection.execute(
+            f'INSERT INTO reports (dataset, year, {", ".join(quote(c) for c in REPORT_COLUMNS)}) '
+            f'VALUES (?, ?, {", ".join("?" * len(REPORT_COLUMNS))}) '
+            f'ON CONFLICT (dataset, "case") DO UPDATE SET year = excluded.year, '
+            f'{", ".join(f"{quote(c)} = excluded.{quote(c)}" for c in REPORT_COLUMNS[1:])}',
+            (dataset, year, *(report.get(c) for c in REPORT_COLUMNS)))
+        self.connection.execute('DELETE FROM fatalities WHERE dataset = ? AND "case" = ?', (dataset, case))
+        self.connection.executemany(
+            f'INSERT INTO fatalities (dataset, "case", position, {", ".join(quote(c) for c in FATALITY_COLUMNS)}) '
+            f'VALUES (?, ?, ?, {", ".join("?" * len(FATALITY_COLUMNS))})',
+            [(dataset, case, position, *(fatality.get(c) for c in FATALITY_COLUMNS))
+             for position, fatality in enumerate(report.get('fatalities') or [])])
+
+    def delete(self, case, dataset=RAW):
+        """
+        Delete a report.
+
+        The caller is responsible for the transaction.
+
+        :param str case: case number
+        :param str dataset: data set, `raw` or `augmented`
+        """
+        self.connection.execute('DELETE FROM reports WHERE dataset = ? AND "case" = ?', (dataset, case))
+        self.connection.execute('DELETE FROM fatalities WHERE dataset = ? AND "case" = ?', (dataset, case))
+
+    def merge(self, entries, year, update=False, trusted=False):
+        """
+        Merge entries into the raw reports, in a single transaction.
+
+        :param list(dict) entries: entries to merge
+        :param int year: year of the entries
+        :param bool update: update the existing fields
+        :param bool trusted: the stored reports were already validated, and are loaded without being validated again
+        :return: the number of reports which changed
+        :rtype: int
+        """
+        changed = set()
+        with self.connection:
+            for entry in entries:
+                old = self.get(entry['case'])
+                report = merger.merge_entries(old, entry, update, trusted) if old else model.Report(**entry)
+                new = serialize(report)
+                if new != old:
+                    self.put(new, year)
+                    changed.add(new['case'])
+            self.refresh(changed, year)
+        return len(changed)
+
+    def augment(self, layer, year, entries):
+        """
+        Replace an augmentation layer, in a single transaction.
+
+        :param str layer: name of the layer, usually the name of the augmentation file
+        :param int year: year of the layer
+        :param list(dict) entries: augmentation entries
+        :return: the number of reports which changed
+        :rtype: int
+        """
+        old = {
+            case: json.loads(entry)
+            for case, entry in self.connection.execute('SELECT "case", entry FROM augmentations WHERE layer = ?', (
+                layer, ))
+        }
+        new = {entry['case']: entry for entry in entries}
+        changed = {case for case in old.keys() | new.keys() if old.get(case) != new.get(case)}
+        with self.connection:
+            for case in changed:
+                if case in new:
+                    self.connection.execute('INSERT OR REPLACE INTO augmentations VALUES (?, ?, ?, ?)',
+                                            (layer, year, case, json.dumps(new[case], sort_keys=True)))
+                else:
+                    self.connection.execute('DELETE FROM augmentations WHERE layer = ? AND "case" = ?', (layer, case))
+            self.refresh(changed, year)
+        return len(changed)
+
+    def refresh(self, cases, year):
+        """
+        Augment reports again.
+
+        The layers are applied to the raw report by order of name. The caller is responsible for the transaction.
+
+        :param set(str) cases: case numbers
+        :param int year: year of the reports which are not in the store yet
+        """
+        for case in sorted(cases):
+            report = self.get(case)
+            row = self.connection.execute('SELECT year FROM reports WHERE dataset = ? AND "case" = ?',
+                                          (RAW, case)).fetchone()
+            report_year = row[0] if row else year
+            layers = self.connection.execute('SELECT year, entry FROM augmentations WHERE "case" = ? ORDER BY layer',
+                                             (case, ))
+            for layer_year, entry in layers:
+                entry = json.loads(entry)
+                if report is None:
+                    report_year = layer_year
+                    report = serialize(model.Report(**entry))
+                else:
+                    report = serialize(merger.merge_entries(report, entry, False, trusted=True))
+            if report is None:
+                self.delete(case, AUGMENTED)
+            else:
+                self.put(report, report_year, AUGMENTED)
+
+    def get_years(self):
+        """
+        Get the years of the reports.
+
+        :return: the sorted list of years
+        :rtype: list(int)
+        """
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT year FROM reports ORDER BY year')]
+
+    def iter_reports(self, dataset=AUGMENTED, year=None):
+        """
+        Read the reports of a data set, sorted by case number.
+
+        :param str dataset: data set, `raw` or `augmented`
+        :param int year: year of the reports, or None for all the years
+        :return: the reports
+        :rtype: iterator(dict)
+        """
+        conditions = [] if year is None else [('year = ?', year)]
+        return self._select(dataset, conditions)
+
+    def query(self, dataset=AUGMENTED, date_from=None, date_to=None, bbox=None, case=None):
+        """
+        Query the reports, using the indexes.
+
+        :param str dataset: data set, `raw` or `augmented`
+        :param str date_from: first date, as `YYYY-MM-DD`
+        :param str date_to: last date, as `YYYY-MM-DD`
+        :param tuple bbox: bounding box, as (south, west, north, east)
+        :param str case: case number
+        :return: the matching reports, sorted by case number
+        :rtype: iterator(dict)
+        """
+        conditions = []
+        if date_from:
+            conditions.append(('date >= ?', date_from))
+        if date_to:
+            conditions.append(('date <= ?', date_to))
+        if bbox:
+            south, west, north, east = bbox
+            conditions.extend([('latitude BETWEEN ? AND ?', (south, north)),
+                               ('longitude BETWEEN ? AND ?', (west, east))])
+        if case:
+            conditions.append(('"case" = ?', case))
+        return self._select(dataset, conditions)
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
+
+    def _select(self, dataset, conditions, batch_size=500):
+        """
+        Select reports.
+
+        :param str dataset: data set, `raw` or `augmented`
+        :param list(tuple) conditions: SQL conditions and their parameters
+        :param int batch_size: number of reports loaded at once
+        :return: the reports, sorted by case number
+        :rtype: iterator(dict)
+        """
+        where = ' AND '.join(['dataset = ?'] + [c for c, _ in conditions])
+        params = [dataset]
+        for _, param in conditions:
+            params.extend(param if isinstance(param, tuple) else [param])
+        cursor = self.connection.execute(
+            f'SELECT {", ".join(quote(c) for c in REPORT_COLUMNS)} FROM reports WHERE {where} ORDER BY "case"', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from self._load_reports(dataset, rows)
+
+    def _load_reports(self, dataset, rows):
+        """
+        Load reports and their fatalities.
+
+        :param str dataset: data set, `raw` or `augmented`
+        :param list(tuple) rows: report rows
+        :return: the reports
+        :rtype: list(dict)
+        """
+        reports = [dict(zip(REPORT_COLUMNS, row)) for row in rows]
+        if not reports:
+            return reports
+        by_case = {report['case']: report for report in reports}
+        for report in reports:
+            report['fatalities'] = []
+        cursor = self.connection.execute(
+            f'SELECT "case", {", ".join(quote(c) for c in FATALITY_COLUMNS)} FROM fatalities '
+            f'WHERE dataset = ? AND "case" IN ({", ".join("?" * len(by_case))}) ORDER BY "case", position',
+            (dataset, *by_case))
+        for case, *values in cursor:
+            by_case[case]['fatalities'].append(dict(zip(FATALITY_COLUMNS, values)))
+        return reports
+
+
+def quote(column):
+    """
+    Quote a column name.
+
+    :param str column: column name
+    :return: the quoted column name
+    :rtype: str
+    """
+    return f'"{column}"'
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""
+`scrapd_datasets` contains the tools maintaining the ScrAPD data sets.
+
+The tools are run with the `scrapd-datasets` entry point (see `scrapd_datasets.cli`).
+"""
@@ -0,0 +1,4 @@
+"""Run the `scrapd-datasets` entry point with `python -m scrapd_datasets`."""
+from scrapd_datasets.cli import main
+
+main()
@@ -0,0 +1,75 @@
+"""
+`scrapd_datasets.address` is a module shared by the tools to normalize the crash locations.
+
+The locations are written differently by the APD news releases and the Socrata data sets, e.g. "8100 block of N. Lamar
+Blvd." and "8100 blk N Lamar Boulevard". They are normalized into a street number and a street name, which the offline
+geocoder and the record linkage compare.
+"""
+import re
+
+STREET_ABBREVIATIONS = {
+    'avenue': 'ave',
+    'boulevard': 'blvd',
+    'circle': 'cir',
+    'court': 'ct',
+    'drive': 'dr',
+    'east': 'e',
+    'expressway': 'expy',
+    'highway': 'hwy',
+    'i': 'ih',
+    'interstate': 'ih',
+    'lane': 'ln',
+    'north': 'n',
+    'parkway': 'pkwy',
+    'place': 'pl',
+    'road': 'rd',
+    'south': 's',
+    'street': 'st',
+    'trail': 'trl',
+    'west': 'w',
+}
+STREET_IGNORED_TOKENS = {
+    'block',
+    'blk',
+    'eastbound',
+    'eb',
+    'nb',
+    'northbound',
+    'of',
+    'proper',
+    'sb',
+    'southbound',
+    'srvd',
+    'svrd',
+    'wb',
+    'westbound',
+}
+
+
+def parse_address(address):
+    """
+    Parse an address into a street number and a normalized street.
+
+    The intersections are normalized as "street 1 / street 2", with the streets sorted alphabetically.
+
+    :param str address: address to parse
+    :return: the street number (None if there is none) and the normalized street
+    :rtype: tuple
+    """
+    addr = address.lower()
+    addr = re.sub(r'^\s*(\d+)\s*-\s*\d+', r'\1', addr)
+    addr = re.sub(r'\b(ih|i|us|sh|fm|rm)\s*-?\s*(\d+)', r'\1 \2', addr)
+    addr = addr.replace('service road', ' ')
+    parts = [p for p in re.split(r'/|&|\band\b|\bat\b', addr) if p.strip()]
+
+    streets = []
+    number = None
+    for part in parts:
+        tokens = re.findall(r'[a-z0-9]+', part)
+        if len(parts) == 1 and tokens and tokens[0].isdigit():
+            number = int(tokens.pop(0))
+        tokens = [STREET_ABBREVIATIONS.get(t, t) for t in tokens if t not in STREET_IGNORED_TOKENS]
+        if tokens:
+            streets.append(' '.join(tokens))
+
+    return number, ' / '.join(sorted(streets))
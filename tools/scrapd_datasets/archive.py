@@ -0,0 +1,187 @@
+"""
+`scrapd-datasets archive` generates an archive data set from the Socrata APD data sets.
+
+The data sets are expected to be arrays of objects (see the test data of `tests/test_archive.py`).
+
+The Socrata entries are normalized column by column: the field aliases are resolved once per schema variant, and each
+distinct value of a column is only normalized once. The values are cleaned, and the entries whose case numbers do not
+match are linked, like in `scrapd_datasets.socrata`.
+
+Usage examples:
+
+$ scrapd-datasets archive scrapd-data-set.json <(cat socarata-data-set.json)
+$ echo "[]" > empty.json && scrapd-datasets archive --extras empty.json socrata-apd-all.json
+"""
+import argparse
+import collections
+import json
+import sys
+
+from loguru import logger
+
+from scrapd_datasets import linkage
+from scrapd_datasets.socrata import TIME_FALLBACKS
+from scrapd_datasets.socrata import clean_coordinates
+from scrapd_datasets.socrata import clean_date
+from scrapd_datasets.socrata import clean_time
+from scrapd_datasets.socrata import link_entries
+from scrapd_datasets.socrata import make_record
+
+# Socrata fields of each ScrAPD field, by order of precedence.
+FIELD_ALIASES = {
+    # Common fields.
+    'case': ['case_number'],
+    'date': ['date'],
+    'latitude': ['y_coord', 'ycoord'],
+    'location': ['location'],
+    'longitude': ['x_coord', 'xcoord', 'coord_x'],
+    'time': ['time'],
+
+    # Extra fields.
+    'hit and run': ['failure_to_stop_and_render_aid'],
+    'impairment': ['suspected_impairment'],
+    'killed': ['killed_driver_pass'],
+    'ran light/stop': ['ran_red_light_or_stop_sign'],
+    'speeding': ['speeding'],
+    'type': ['type'],
+}
+
+
+def run(args):
+    """
+    Generate the archive data set from the Socrata data set given on the command line.
+
+    :param argparse.Namespace args: arguments of the `archive` subcommand
+    """
+    # Merge the data.
+    link_threshold = None if args.exact else args.link_threshold
+    results = merge(json.loads(args.scrapd.read()), json.loads(args.socrata.read()), args.extras, link_threshold)
+    results_str = json.dumps(results, sort_keys=True, indent=2)
+    print(results_str)
+
+    # Report the times which required dateparser.
+    if TIME_FALLBACKS:
+        logger.info(f'{sum(TIME_FALLBACKS.values())} time(s) required dateparser: {dict(TIME_FALLBACKS)}')
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Generate archive data set from Socrata.')
+    parser.add_argument('scrapd', type=argparse.FileType('r+t'))
+    parser.add_argument('socrata', type=argparse.FileType('rt'), default=sys.stdin)
+    parser.add_argument('--extras', action='store_true', help='Add Socrata entries that do not match a ScrAPD entry')
+    parser.add_argument('--exact', action='store_true', help='Only match the entries by case number')
+    parser.add_argument('--link-threshold',
+                        type=float,
+                        default=linkage.LINK_THRESHOLD,
+                        help=f'Minimum score of the entries linked without matching case numbers, '
+                        f'defaults to {linkage.LINK_THRESHOLD}')
+
+    return parser
+
+
+def merge(scrapd, socrata, extras=False, link_threshold=linkage.LINK_THRESHOLD):
+    """
+    Merge `socrata` data into `scrapd` data.
+
+    :param list(dict) scrapd: scrapd data
+    :param list(dict) socrata: socrata data
+    :param float link_threshold: minimum score of the entries linked without matching case numbers, None to only
+        match the case numbers
+    :return: the socrata data merged into the scrapd data
+    :rtype: list(dict)
+    """
+    # Read the scrapd values.
+    scrapd_dict = {entry['case']: entry for entry in scrapd}
+
+    # Map a Socrata entry to ScrAPD entry.
+    columns = normalize_columns(load_columns(socrata))
+    socrata_dict = {}
+    indexes = {}
+    for index, (case, values) in enumerate(zip(columns['case'], zip(*columns.values()))):
+        socrata_dict[case] = {k: v for k, v in zip(columns, values) if v}
+        indexes[case] = index
+
+    # Link the entries whose case numbers do not match.
+    if link_threshold is not None:
+        link_entries(scrapd_dict, socrata_dict, lambda case: make_record(socrata[indexes[case]]), link_threshold)
+
+    # Merge the results.
+    final_dict = {}
+    for entry in scrapd_dict:
+        # Match the Socrata entry with a ScrAPD entry.
+        socrata_entry = socrata_dict.pop(entry, {})
+        if not socrata_entry:
+            continue
+
+        # Remove empty values.
+        final_dict[entry] = {k: v for k, v in socrata_entry.items() if v is not None}
+    if extras:
+        final_dict.update(socrata_dict)
+
+    return list(final_dict.values())
+
+
+def load_columns(socrata):
+    """
+    Load Socrata entries into columns.
+
+    The entries are grouped by schema variant, and the Socrata fields of each ScrAPD field are resolved once per variant.
+    Missing values are empty strings.
+
+    :param list(dict) socrata: socrata data
+    :return: the raw values of each ScrAPD field, in the order of the entries
+    :rtype: dict
+    """
+    variants = collections.defaultdict(list)
+    for index, entry in enumerate(socrata):
+        variants[frozenset(entry)].append(index)
+
+    columns = {field: [''] * len(socrata) for field in FIELD_ALIASES}
+    for keys, indexes in variants.items():
+        for field, aliases in FIELD_ALIASES.items():
+            present = [alias for alias in aliases if alias in keys]
+            column = columns[field]
+            if len(present) == 1:
+                alias = present[0]
+                for index in indexes:
+                    column[index] = socrata[index][alias] or ''
+            elif present:
+                for index in indexes:
+                    entry = socrata[index]
+                    column[index] = next((entry[alias] for alias in present if entry[alias]), '')
+
+    return columns
+
+
+def normalize_columns(columns):
+    """
+    Normalize the values of each column.
+
+    :param dict columns: the raw values of each ScrAPD field
+    :return: the normalized values of each ScrAPD field
+    :rtype: dict
+    """
+    cleaners = {
+        'date': lambda value: clean_date(value.lower().strip()),
+        'latitude': lambda value: clean_coordinates(value.strip()),
+        'longitude': lambda value: clean_coordinates(value.strip()),
+        'time': lambda value: clean_time(value.lower().strip()),
+    }
+    return {
+        field: normalize_column(column, cleaners.get(field, lambda value: value.lower().strip()))
+        for field, column in columns.items()
+    }
+
+
+def normalize_column(column, cleaner):
+    """
+    Normalize a column, cleaning each distinct value only once.
+
+    :param list column: raw values
+    :param callable cleaner: function normalizing a value
+    :return: the normalized values
+    :rtype: list
+    """
+    cleaned = {value: cleaner(value) for value in set(column)}
+    return [cleaned[value] for value in column]
@@ -0,0 +1,140 @@
+"""
+`scrapd-datasets census-server` is a local stand-in for the Geo Census API.
+
+It answers the single address requests and the batch uploads like the Geo Census service does, but computes
+deterministic coordinates from the addresses, without any network access. It can simulate the latency of the service,
+and fail a proportion of the requests with HTTP 503, to test the retries and the concurrency of the geocensus augmenter.
+
+The endpoints have the same paths as the ones of the Geo Census service, and are also available at `/` and `/batch`.
+
+Usage examples:
+
+$ scrapd-datasets census-server --port 8080
+$ scrapd-datasets census-server --port 8080 --latency 0.2 --error-rate 0.05 --seed 42
+$ scrapd-datasets geocode --url http://127.0.0.1:8080/ --no-cache fatalities.json
+"""
+import argparse
+import asyncio
+import csv
+import io
+import random
+import socket
+import zlib
+
+import aiohttp.web
+
+# Paths of the Geo Census endpoints.
+ADDRESS_PATH = '/geocoder/geographies/address'
+BATCH_PATH = '/geocoder/geographies/addressbatch'
+
+# Stand-in settings.
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+# The coordinates are spread over this box, as ((south, west), (north, east)).
+BOUNDING_BOX = ((30.1, -97.9), (30.5, -97.6))
+
+
+def run(args):
+    """
+    Serve the stand-in until interrupted.
+
+    :param argparse.Namespace args: arguments of the `census-server` subcommand
+    """
+    app = create_app(args.latency, args.error_rate, args.seed)
+    aiohttp.web.run_app(app, host=args.host, port=args.port)
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the Geo Census API.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Listening address, defaults to {DEFAULT_HOST}')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Listening port, defaults to {DEFAULT_PORT}')
+    parser.add_argument('--latency', type=float, default=0, help='Latency of each response in seconds, defaults to 0')
+    parser.add_argument('--error-rate',
+                        type=float,
+                        default=0,
+                        help='Proportion of the requests failing with HTTP 503, defaults to 0')
+    parser.add_argument('--seed', type=int, help='Seed of the error generator')
+
+    return parser
+
+
+def geocode(address):
+    """
+    Compute the deterministic coordinates of an address.
+
+    :param str address: address to geocode
+    :return: the latitude and the longitude
+    :rtype: tuple(float, float)
+    """
+    (south, west), (north, east) = BOUNDING_BOX
+    checksum = zlib.crc32(address.lower().encode())
+    latitude = south + (north - south) * (checksum & 0xffff) / 0xffff
+    longitude = west + (east - west) * (checksum >> 16) / 0xffff
+    return round(latitude, 6), round(longitude, 6)
+
+
+def create_app(latency=0, error_rate=0, seed=None):
+    """
+    Create a stand-in for the Geo Census API.
+
+    Both the single address endpoint and the batch endpoint are supported. The coordinates are computed from the
+    address (see `geocode`).
+
+    :param float latency: latency of each response in seconds
+    :param float error_rate: proportion of the requests failing with HTTP 503
+    :param int seed: seed of the error generator, defaults to None
+    :return: the application
+    :rtype: aiohttp.web.Application
+    """
+    rng = random.Random(seed)
+
+    async def handler(request):
+        await asyncio.sleep(latency)
+        if rng.random() < error_rate:
+            return aiohttp.web.Response(status=503)
+        street = request.query.get('street', '')
+        latitude, longitude = geocode(street)
+        match = {'coordinates': {'x': longitude, 'y': latitude}, 'matchedAddress': street.upper()}
+        return aiohttp.web.json_response({'result': {'input': dict(request.query), 'addressMatches': [match]}})
+
+    async def batch_handler(request):
+        await asyncio.sleep(latency)
+        if rng.random() < error_rate:
+            return aiohttp.web.Response(status=503)
+        data = await request.post()
+        upload = data['addressFile'].file.read().decode()
+        output = io.StringIO()
+        writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+        for row in csv.reader(io.StringIO(upload)):
+            latitude, longitude = geocode(row[1])
+            writer.writerow([row[0], ', '.join(row[1:]), 'Match', 'Exact', row[1].upper(), f'{longitude},{latitude}'])
+        return aiohttp.web.Response(text=output.getvalue(), content_type='text/csv')
+
+    app = aiohttp.web.Application()
+    for path in ('/', ADDRESS_PATH):
+        app.router.add_get(path, handler)
+    for path in ('/batch', BATCH_PATH):
+        app.router.add_post(path, batch_handler)
+    return app
+
+
+async def start_server(latency=0, error_rate=0, seed=None, host=DEFAULT_HOST, port=0, app=None):
+    """
+    Start the stand-in in the running event loop.
+
+    :param float latency: latency of each response in seconds
+    :param float error_rate: proportion of the requests failing with HTTP 503
+    :param int seed: seed of the error generator, defaults to None
+    :param str host: listening address
+    :param int port: listening port, defaults to a free port
+    :param aiohttp.web.Application app: application to serve instead of the stand-in, defaults to None
+    :return: the runner, to clean up when done, and the URL of the stand-in
+    :rtype: tuple(aiohttp.web.AppRunner, str)
+    """
+    sock = socket.socket()
+    sock.bind((host, port))
+    runner = aiohttp.web.AppRunner(app or create_app(latency, error_rate, seed))
+    await runner.setup()
+    await aiohttp.web.SockSite(runner, sock).start()
+    return runner, f'http://{host}:{sock.getsockname()[1]}'
@@ -0,0 +1,58 @@
+"""
+`scrapd-datasets` is the entry point of the tools maintaining the data sets.
+
+Each subcommand lives in its own module, which is only imported once the subcommand is known. The heavy dependencies,
+like ScrAPD or aiohttp, are therefore only loaded by the subcommands using them, and `scrapd-datasets --help` starts in
+a few tens of milliseconds.
+
+Usage examples:
+
+$ scrapd-datasets merge -i datasets/fatalities-2019-raw.json new.json
+$ scrapd-datasets geocode --offline-only datasets/fatalities-2019-raw.json
+$ scrapd-datasets import-socrata datasets/fatalities-2019-raw.json socrata-apd-2019.json
+$ scrapd-datasets merge --help
+"""
+import argparse
+import importlib
+
+# Module and description of each subcommand.
+COMMANDS = {
+    'archive': ('scrapd_datasets.archive', 'Generate an archive data set from the Socrata APD data sets'),
+    'census-server': ('scrapd_datasets.census_server', 'Serve a local stand-in for the Geo Census API'),
+    'convert': ('scrapd_datasets.convert', 'Convert a data set from the ScrAPD 2 to the ScrAPD 3 format'),
+    'geocode': ('scrapd_datasets.geocensus', 'Geocode the crash locations with the Geo Census service'),
+    'import-socrata': ('scrapd_datasets.socrata', 'Generate the Socrata APD augmentations'),
+    'merge': ('scrapd_datasets.merger', 'Merge 2 ScrAPD data sets together'),
+    'metrics': ('scrapd_datasets.metrics', 'Collect the metrics written by the tools'),
+}
+
+
+def main(argv=None):
+    """
+    Define the main entrypoint of the program.
+
+    :param list(str) argv: command line arguments, defaults to `sys.argv[1:]`
+    """
+    # Find the subcommand.
+    parser = get_cli_parser()
+    args = parser.parse_args(argv)
+
+    # Load the subcommand, then parse its own arguments.
+    module = importlib.import_module(COMMANDS[args.command][0])
+    command_parser = module.get_cli_parser()
+    command_parser.prog = f'{parser.prog} {args.command}'
+    module.run(command_parser.parse_args(args.args))
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    commands = '\n'.join(f'  {name:<16}{description}' for name, (_, description) in sorted(COMMANDS.items()))
+    parser = argparse.ArgumentParser(prog='scrapd-datasets',
+                                     description='Maintain the ScrAPD data sets.',
+                                     epilog=f'commands:\n{commands}\n\nUse "scrapd-datasets COMMAND --help" for the '
+                                     'arguments of a command.',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=sorted(COMMANDS), metavar='COMMAND')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments of the command')
+
+    return parser
@@ -0,0 +1,91 @@
+"""
+`scrapd-datasets convert` converts existing data sets from the ScrAPD 2 to the ScrAPD 3 format.
+"""
+import argparse
+import json
+import sys
+
+from scrapd.core import date_utils
+from scrapd.core import model
+
+from scrapd_datasets.serializer import to_json
+from scrapd_datasets.serializer import write_if_changed
+
+
+def run(args):
+    """
+    Convert the data set given on the command line.
+
+    :param argparse.Namespace args: arguments of the `convert` subcommand
+    """
+    # Merge the data.
+    results = convert(json.loads(args.infile.read()))
+    sorted_results = sorted(results, key=lambda x: x.case)
+
+    # Write the data to the data set file.
+    if args.in_place:
+        args.infile.close()
+        write_if_changed(args.infile.name, to_json(sorted_results))
+    else:
+        # Display the results.
+        print(to_json(sorted_results))
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Convert data set from ScrAPD 2 to ScrAPD 3.')
+    parser.add_argument('infile', type=argparse.FileType('r+t'), default=sys.stdin)
+    parser.add_argument('-i', '--in-place', action='store_true', help="Update OLD in place")
+
+    return parser
+
+
+def convert(entries):
+    result = [load_scrapd2(entry) for entry in entries]
+    return result
+
+
+def load_scrapd2(entry):
+    """
+    Load a ScrAPD 2 entry and returns a ScrAPD3 one.
+    """
+    r = model.Report(case=entry['Case'], date=date_utils.parse_date(entry.get('Date')))
+    if entry.get('Fatal crashes this year'):
+        r.crash = int(entry.get('Fatal crashes this year'))
+    if entry.get('Link'):
+        r.link = entry.get('Link')
+    if entry.get('Latitude'):
+        r.latitude = entry.get('Latitude')
+    if entry.get('Location'):
+        r.location = entry.get('Location')
+    if entry.get('Longitude'):
+        r.longitude = entry.get('Longitude')
+    if entry.get('Notes'):
+        r.notes = entry.get('Notes')
+    if entry.get('Time'):
+        r.time = date_utils.parse_time(entry.get('Time'))
+
+    f = model.Fatality()
+    if entry.get('Age'):
+        f.age = int(entry.get('Age'))
+    if entry.get('DOB'):
+        f.dob = date_utils.parse_date(entry.get('DOB'))
+    if entry.get('Ethnicity'):
+        try:
+            f.ethnicity = model.Ethnicity(entry.get('Ethnicity').capitalize())
+        except ValueError:
+            f.ethnicity = model.Ethnicity.undefined
+    if entry.get('First Name'):
+        f.first = entry.get('First Name')
+    if entry.get('Gender'):
+        try:
+            f.gender = model.Gender(entry.get('Gender').capitalize())
+        except ValueError:
+            f.gender = model.Gender.undefined
+    if entry.get('Last Name'):
+        f.last = entry.get('Last Name')
+
+    r.fatalities = [f]
+    r.compute_fatalities_age()
+
+    return r
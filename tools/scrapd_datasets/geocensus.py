@@ -0,0 +1,1136 @@
+"""
+`scrapd-datasets geocode` is an augmenter geocoding the crash locations.
+
+It uses the Geo Census database. The script does not recode entries which already have their geolocation.
+
+The geocoding results are stored in a persistent SQLite cache, therefore an address is only sent to the Geo Census
+service once. Addresses which could not be geocoded are cached as well, but for a shorter period of time.
+
+The number of concurrent requests adapts to the response of the service (AIMD), up to `--concurrency`. Throttled or
+failed requests are retried with a jittered exponential backoff, and the entries which could not be geocoded because of
+a failure are reported at the end of the run.
+
+Before using the network, the addresses are looked up in an offline geocoder built from the locations which were
+already geocoded (the geocensus and Socrata augmentations, the Socrata archives and the archive data set) of the data
+sets repository given with `--reference-dir`, the current directory by default. Use `--offline-only` to never use the
+network, or `--no-offline` to disable the offline geocoder. The geolocations found offline are marked with a
+`"geocoder": "offline"` field in the results, and are not used again to build the offline geocoder.
+
+In batch mode (`--batch`), the addresses are uploaded to the Geo Census batch endpoint by chunks of up to 10,000
+addresses, instead of sending one request per address.
+
+With `--augmentation`, an existing augmentation file is updated incrementally: only the new cases and the cases whose
+location changed since they were geocoded are processed, and the results are merged into the file. The file is also
+written regularly while the addresses are geocoded, so an interrupted run resumes where it stopped.
+
+The responses of the Geo Census service can be recorded to a cassette file (`--record`), then replayed without any
+network access (`--replay`). The replayed responses can be delayed (`--replay-latency`), and a proportion of them can
+fail with HTTP 503 (`--replay-error-rate`) to exercise the retries. The service can also be replaced by a
+local stand-in with `--url` (see `scrapd-datasets census-server`).
+
+Usage examples:
+
+$ scrapd-datasets geocode fatalities.json
+$ scrapd-datasets geocode --cache /tmp/geocensus.sqlite fatalities.json
+$ scrapd-datasets geocode --no-cache fatalities.json
+$ scrapd-datasets geocode --batch archives.json
+$ scrapd-datasets geocode --offline-only fatalities.json
+$ scrapd-datasets geocode --augmentation augmentation-geocoding-geocensus-2019.json fatalities-2019-raw.json
+$ scrapd-datasets geocode --no-cache --no-offline --record geocensus-2019.json fatalities.json
+$ scrapd-datasets geocode --no-cache --no-offline --replay geocensus-2019.json --replay-error-rate 0.1 fatalities.json
+"""
+import argparse
+import asyncio
+import bisect
+import collections
+import csv
+import difflib
+import io
+import json
+import os
+import pathlib
+import random
+import sqlite3
+import time
+import urllib.parse
+
+import aiohttp
+from loguru import logger
+
+from scrapd_datasets import metrics
+from scrapd_datasets.address import parse_address
+from scrapd_datasets.serializer import dumps
+from scrapd_datasets.serializer import write_if_changed
+
+GEO_CENSUS_URL = "https://geocoding.geo.census.gov/geocoder/geographies/address"
+GEO_CENSUS_BATCH_URL = "https://geocoding.geo.census.gov/geocoder/geographies/addressbatch"
+GEO_CENSUS_BENCHMARK = "Public_AR_Census2010"
+GEO_CENSUS_VINTAGE = "Census2010_Census2010"
+
+# Geocode cache settings.
+CACHE_DIR = pathlib.Path(os.environ.get('XDG_CACHE_HOME', pathlib.Path.home() / '.cache')) / 'scrapd-datasets'
+CACHE_PATH = CACHE_DIR / 'geocensus.sqlite'
+CACHE_TTL = 365 * 24 * 3600
+CACHE_NEGATIVE_TTL = 30 * 24 * 3600
+
+# HTTP client settings.
+MAX_CONCURRENCY = 16
+INITIAL_CONCURRENCY = 4
+TARGET_LATENCY = 2.0
+REQUEST_TIMEOUT = 30
+KEEPALIVE_TIMEOUT = 30
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# Batch mode settings.
+BATCH_SIZE = 10000
+BATCH_CONCURRENCY = 2
+BATCH_TIMEOUT = 900
+
+# Incremental geocoding settings.
+# The augmentation file is written every `CHECKPOINT_INTERVAL` seconds while the addresses are geocoded.
+CHECKPOINT_INTERVAL = 30
+
+# Offline geocoder settings.
+# The geolocations found offline are marked with the `OFFLINE_GEOCODER` source.
+# The bounding box is used to discard the invalid coordinates.
+OFFLINE_GEOCODER = 'offline'
+AUSTIN_BOUNDING_BOX = ((29.9, -98.2), (30.7, -97.3))
+FUZZY_CUTOFF = 0.9
+MAX_INTERPOLATION_SPAN = 2000
+MAX_EXTRAPOLATION_SPAN = 100
+
+
+def run(args):
+    """
+    Geocode the data set given on the command line.
+
+    :param argparse.Namespace args: arguments of the `geocode` subcommand
+    """
+    metrics.init('scrapd-augmenter-geocoding-geocensus')
+
+    # Merge the data.
+    entries = json.loads(args.infile.read())
+    cache_path = ':memory:' if args.no_cache else args.cache
+    cassette = None
+    if args.record or args.replay:
+        cassette = Cassette(args.record or args.replay,
+                            record=bool(args.record),
+                            latency=args.replay_latency,
+                            error_rate=args.replay_error_rate,
+                            seed=args.replay_seed)
+    with metrics.stage('geocoding', dataset=os.path.basename(args.infile.name)) as stage:
+        stage['records_in'] = len(entries)
+        try:
+            results = augment(entries,
+                              cache_path,
+                              url=args.url,
+                              concurrency=args.concurrency,
+                              retries=args.retries,
+                              timeout=args.timeout,
+                              reference_dir=None if args.no_offline else pathlib.Path(args.reference_dir),
+                              offline_only=args.offline_only,
+                              batch_size=args.batch_size if args.batch else 0,
+                              batch_url=args.batch_url,
+                              augmentation_path=args.augmentation,
+                              cassette=cassette)
+        finally:
+            # Keep the responses recorded before an interruption.
+            if cassette:
+                cassette.save()
+        stage['records_out'] = len(results)
+
+    # Write the data to `old` file, unless the augmentation file was updated.
+    if args.augmentation:
+        return
+    if args.in_place:
+        args.infile.close()
+        write_if_changed(args.infile.name, dumps(results))
+    else:
+        # Display the results.
+        print(dumps(results))
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Geocode the crash locations.')
+    parser.add_argument('infile', type=argparse.FileType('r+t'))
+    parser.add_argument('-i', '--in-place', action='store_true', help="Update OLD in place")
+    parser.add_argument('--cache', default=CACHE_PATH, help=f'Geocode cache file, defaults to "{CACHE_PATH}"')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the persistent geocode cache')
+    parser.add_argument('--concurrency',
+                        type=int,
+                        default=MAX_CONCURRENCY,
+                        help=f'Maximum number of concurrent requests, defaults to {MAX_CONCURRENCY}')
+    parser.add_argument('--retries',
+                        type=int,
+                        default=MAX_RETRIES,
+                        help=f'Number of retries of a failed request, defaults to {MAX_RETRIES}')
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=REQUEST_TIMEOUT,
+                        help=f'Timeout of a request in seconds, defaults to {REQUEST_TIMEOUT}')
+    parser.add_argument('--batch', action='store_true', help='Use the batch geocoding endpoint')
+    parser.add_argument('--batch-size',
+                        type=int,
+                        default=BATCH_SIZE,
+                        help=f'Number of addresses per batch, defaults to {BATCH_SIZE}')
+    parser.add_argument('--no-offline', action='store_true', help='Do not use the offline geocoder')
+    parser.add_argument('--offline-only', action='store_true', help='Only use the offline geocoder')
+    parser.add_argument(
+        '--reference-dir',
+        default='.',
+        help='Data sets repository the offline geocoder is built from, defaults to the current directory')
+    parser.add_argument('-a',
+                        '--augmentation',
+                        help='Augmentation file to update incrementally, instead of displaying the results')
+    parser.add_argument('--url', default=GEO_CENSUS_URL, help='Geocoder URL, defaults to the Geo Census service')
+    parser.add_argument('--batch-url',
+                        default=GEO_CENSUS_BATCH_URL,
+                        help='Batch geocoder URL, defaults to the Geo Census service')
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument('--record', metavar='CASSETTE', help='Record the responses of the geocoder to a cassette')
+    cassette.add_argument('--replay', metavar='CASSETTE', help='Replay the responses of a cassette, offline')
+    parser.add_argument('--replay-latency',
+                        type=float,
+                        default=0,
+                        help='Latency of the replayed responses in seconds, defaults to 0')
+    parser.add_argument('--replay-error-rate',
+                        type=float,
+                        default=0,
+                        help='Proportion of the replayed requests failing with HTTP 503, defaults to 0')
+    parser.add_argument('--replay-seed', type=int, help='Seed of the replay error generator')
+
+    return parser
+
+
+def augment(entries, cache_path=CACHE_PATH, reference_dir=None, augmentation_path=None, **kwargs):
+    """
+    Generate the geocoding augmentation for a list of entries.
+
+    The geolocations record the location they were computed from. When an augmentation file is given, its geolocations
+    are kept if the location of their entry did not change, and only the other entries are geocoded. The file is written
+    regularly with the geolocations found so far, and once they are all found.
+
+    :param list(dict) entries: ScrAPD entries
+    :param str cache_path: path of the geocode cache, defaults to `CACHE_PATH`
+    :param pathlib.Path reference_dir: top directory of the data sets repository to build the offline geocoder from,
+        defaults to None (no offline geocoder)
+    :param str augmentation_path: path of the augmentation file to update, defaults to None
+    :param kwargs: geocoding settings (see `async_update_entries`)
+    :return: the geolocation of each entry, sorted by case number
+    :rtype: list(dict)
+    """
+    if cache_path != ':memory:':
+        pathlib.Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+
+    # Only geocode the entries which are not up to date in the augmentation file.
+    kept = []
+    on_checkpoint = None
+    if augmentation_path:
+        kept, entries = split_entries(entries, read_augmentation(augmentation_path))
+        logger.info(f'Incremental geocoding: {len(kept)} up to date, {len(entries)} to geocode.')
+        metrics.count('geocode_up_to_date', len(kept))
+
+        def write_checkpoint(partial_results):
+            write_augmentation(augmentation_path, kept + add_locations(partial_results, entries))
+
+        on_checkpoint = write_checkpoint
+
+    cache = GeocodeCache(cache_path)
+    geocoder = OfflineGeocoder.from_directory(reference_dir) if reference_dir and entries else None
+    try:
+        results = asyncio.run(
+            async_update_entries(entries, cache, geocoder=geocoder, checkpoint=on_checkpoint, **kwargs))
+    finally:
+        cache.close()
+    results = kept + add_locations(results, entries)
+    if augmentation_path:
+        write_augmentation(augmentation_path, results)
+    if geocoder:
+        logger.info(f'Offline geocoder: {geocoder.hits} hits, {geocoder.misses} misses.')
+        metrics.count('offline_geocoder_hits', geocoder.hits)
+        metrics.count('offline_geocoder_misses', geocoder.misses)
+    logger.info(f'Geocode cache: {cache.hits} hits, {cache.misses} misses, {cache.coalesced} coalesced.')
+    metrics.count('geocode_cache_hits', cache.hits)
+    metrics.count('geocode_cache_misses', cache.misses)
+    metrics.count('geocode_cache_coalesced', cache.coalesced)
+    return sorted(results, key=lambda x: x['case'])
+
+
+def split_entries(entries, augmentation):
+    """
+    Split the entries between the ones whose geolocation is up to date in an augmentation, and the ones to geocode.
+
+    A geolocation is up to date when the location of its entry did not change since it was computed. The geolocations
+    written before the locations were recorded are considered up to date.
+
+    The entries whose location changed are geocoded again, without the coordinates of their previous geolocation.
+
+    :param list(dict) entries: ScrAPD entries
+    :param list(dict) augmentation: geolocations of a previous run
+    :return: the geolocations which are up to date, and the entries to geocode
+    :rtype: tuple(list(dict), list(dict))
+    """
+    geolocations = {geolocation['case']: geolocation for geolocation in augmentation}
+    kept = []
+    pending = []
+    for entry in entries:
+        geolocation = geolocations.get(entry.get('case'))
+        location = entry.get('location') or ''
+        if not geolocation:
+            pending.append(entry)
+        elif geolocation.get('location', location) == location:
+            kept.append({**geolocation, 'location': location})
+        else:
+            pending.append({key: value for key, value in entry.items() if key not in ('latitude', 'longitude')})
+    return kept, pending
+
+
+def add_locations(results, entries):
+    """
+    Record the location of their entry in the geolocations.
+
+    :param list(dict) results: geolocations
+    :param list(dict) entries: ScrAPD entries which were geocoded
+    :return: the geolocations with their location
+    :rtype: list(dict)
+    """
+    locations = {entry.get('case'): entry.get('location') or '' for entry in entries}
+    return [{**result, 'location': locations[result['case']]} for result in results]
+
+
+def read_augmentation(path):
+    """
+    Read an augmentation file.
+
+    :param str path: path of the augmentation file
+    :return: the augmentation, or an empty list if the file does not exist
+    :rtype: list(dict)
+    """
+    try:
+        return json.loads(pathlib.Path(path).read_text())
+    except FileNotFoundError:
+        return []
+
+
+def write_augmentation(path, results):
+    """
+    Write an augmentation file, sorted by case number.
+
+    :param str path: path of the augmentation file
+    :param list(dict) results: geolocations
+    :return: True if the file was written, False if it was already up to date
+    :rtype: bool
+    """
+    return write_if_changed(str(path), dumps(sorted(results, key=lambda x: x['case'])) + '\n')
+
+
+class GeocodeCache:
+    """
+    Store the geocoding results in a SQLite database.
+
+    The entries are keyed by normalized address, benchmark and vintage. Empty results are stored as well, in order to
+    avoid querying again addresses which cannot be geocoded. They expire after `negative_ttl` seconds instead of `ttl`.
+    """
+
+    def __init__(self, path=':memory:', ttl=CACHE_TTL, negative_ttl=CACHE_NEGATIVE_TTL):
+        """
+        Initialize the cache.
+
+        :param str path: path of the SQLite database, defaults to an in-memory database
+        :param int ttl: lifetime of a geolocation in seconds
+        :param int negative_ttl: lifetime of an empty result in seconds
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # The cache may be shared by several processes.
+        self.connection = sqlite3.connect(str(path), timeout=60)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS geocodes ('
+                                'address TEXT, benchmark TEXT, vintage TEXT, geolocation TEXT, created REAL, '
+                                'PRIMARY KEY (address, benchmark, vintage))')
+
+    def get(self, key):
+        """
+        Retrieve a geolocation from the cache.
+
+        :param tuple key: the cache key (see `make_cache_key`)
+        :return: the geolocation (which is empty for a negative entry), or None if the entry is missing or expired
+        :rtype: dict
+        """
+        row = self.connection.execute(
+            'SELECT geolocation, created FROM geocodes WHERE address = ? AND benchmark = ? AND vintage = ?',
+            key).fetchone()
+        if row:
+            geolocation = json.loads(row[0])
+            ttl = self.ttl if geolocation else self.negative_ttl
+            if time.time() - row[1] < ttl:
+                self.hits += 1
+                return geolocation
+        self.misses += 1
+        return None
+
+    def set(self, key, geolocation):
+        """
+        Store a geolocation in the cache.
+
+        :param tuple key: the cache key (see `make_cache_key`)
+        :param dict geolocation: the geolocation, empty if the address could not be geocoded
+        """
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)',
+                                    (*key, json.dumps(geolocation, sort_keys=True), time.time()))
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
+
+
+class Cassette:
+    """
+    Record the responses of the geocoder to a JSON file, or replay them without any network access.
+
+    The responses are keyed by request parameters, therefore a cassette recorded from the Geo Census service can be
+    replayed for any URL. When replaying, each response is delayed by `latency` seconds, and a proportion `error_rate`
+    of the requests fails with HTTP 503, like a throttled service. The requests which are not in the cassette fail.
+    """
+
+    def __init__(self, path, record=False, latency=0, error_rate=0, seed=None):
+        """
+        Initialize the cassette.
+
+        :param str path: path of the cassette file, which may not exist when recording
+        :param bool record: record the responses instead of replaying them
+        :param float latency: latency of the replayed responses in seconds
+        :param float error_rate: proportion of the replayed requests failing with HTTP 503
+        :param int seed: seed of the error generator, defaults to None
+        """
+        self.path = path
+        self.record = record
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(path) as f:
+                self.responses = json.load(f)
+        except FileNotFoundError:
+            if not record:
+                raise
+            self.responses = {}
+
+    @staticmethod
+    def make_key(params):
+        """
+        Make the key of a request.
+
+        :param dict params: request parameters
+        :return: the sorted and encoded parameters
+        :rtype: str
+        """
+        return urllib.parse.urlencode(sorted(params.items()))
+
+    def get(self, params):
+        """
+        Retrieve the response of a request.
+
+        :param dict params: request parameters
+        :return: the response, or None if the request is not in the cassette
+        :rtype: dict
+        """
+        response = self.responses.get(self.make_key(params))
+        if response is None:
+            self.misses += 1
+            metrics.count('cassette_misses')
+        else:
+            self.hits += 1
+        return response
+
+    def set(self, params, response):
+        """
+        Store the response of a request.
+
+        :param dict params: request parameters
+        :param dict response: response of the geocoder
+        """
+        self.responses[self.make_key(params)] = response
+
+    def replay(self, response):
+        """
+        Replay a response.
+
+        :param dict response: response to replay
+        :return: a new response context manager, like `aiohttp.ClientSession.get`
+        :rtype: ReplayedResponse
+        """
+        status = 503 if self.random.random() < self.error_rate else 200
+        return ReplayedResponse(response, status, self.latency)
+
+    def save(self):
+        """Write the recorded responses to the cassette file."""
+        if self.record:
+            write_if_changed(self.path, dumps(self.responses) + '\n')
+
+
+class ReplayedResponse:
+    """Replace an aiohttp response with a response of a cassette."""
+
+    def __init__(self, data, status=200, latency=0):
+        """
+        Initialize the response.
+
+        :param dict data: JSON content of the response
+        :param int status: HTTP status
+        :param float latency: delay before the response is available in seconds
+        """
+        self.data = data
+        self.status = status
+        self.latency = latency
+
+    async def __aenter__(self):
+        """Wait for the response."""
+        await asyncio.sleep(self.latency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Release the response."""
+
+    def raise_for_status(self):
+        """Do nothing, the failed responses are handled as throttled ones."""
+
+    async def json(self):
+        """Get the JSON content of the response."""
+        return self.data
+
+
+class OfflineGeocoder:
+    """
+    Geocode the addresses using the locations which were already geocoded.
+
+    The addresses are normalized, then looked up in an index. When an address is not found, its position is
+    interpolated from the closest known street numbers of the same street. When the street is not found, the closest
+    street name is used instead.
+    """
+
+    def __init__(self):
+        """Initialize the geocoder."""
+        self.addresses = {}
+        self.streets = collections.defaultdict(dict)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_directory(cls, topdir):
+        """
+        Build a geocoder from the data sets of the repository.
+
+        The sources are added by order of preference.
+
+        :param pathlib.Path topdir: top directory of the repository
+        :return: the geocoder
+        :rtype: OfflineGeocoder
+        """
+        geocoder = cls()
+
+        # Geocensus augmentations, whose locations are in the raw data sets.
+        for augmentation in sorted(topdir.glob('augmentations/*/augmentation-geocoding-geocensus-*.json')):
+            raw = topdir / 'datasets' / f'fatalities-{augmentation.parent.name}-raw.json'
+            if not raw.exists():
+                continue
+            locations = {entry['case']: entry.get('location', '') for entry in json.loads(raw.read_text())}
+            for entry in json.loads(augmentation.read_text()):
+                if entry.get('geocoder') == OFFLINE_GEOCODER:
+                    continue
+                geocoder.add(locations.get(entry['case'], ''), entry.get('latitude'), entry.get('longitude'))
+
+        # Socrata augmentations and archives.
+        sources = sorted(topdir.glob('augmentations/*/augmentation-import-apd-*.json'))
+        sources.append(topdir / 'datasets' / 'archives-all.json')
+        for source in sources:
+            if not source.exists():
+                continue
+            for entry in json.loads(source.read_text()):
+                geocoder.add(entry.get('location', ''), entry.get('latitude'), entry.get('longitude'))
+        for source in sorted(topdir.glob('external-datasets/socrata-apd-archives/socrata-apd-*.json')):
+            for entry in json.loads(source.read_text()):
+                latitude = entry.get('y_coord') or entry.get('ycoord')
+                longitude = entry.get('x_coord') or entry.get('xcoord') or entry.get('coord_x')
+                geocoder.add(entry.get('location', ''), latitude, longitude)
+
+        return geocoder
+
+    def add(self, address, latitude, longitude):
+        """
+        Add a geocoded address to the index.
+
+        The address is ignored if the coordinates are not valid. If the address is already known, the first
+        coordinates are kept.
+
+        :param str address: address
+        :param float latitude: latitude of the address
+        :param float longitude: longitude of the address
+        """
+        try:
+            point = (float(latitude), float(longitude))
+        except (TypeError, ValueError):
+            return
+        (south, west), (north, east) = AUSTIN_BOUNDING_BOX
+        if not (south < point[0] < north and west < point[1] < east):
+            return
+        number, street = parse_address(address)
+        if not street:
+            return
+        self.addresses.setdefault((number, street), point)
+        if number is not None:
+            self.streets[street].setdefault(number, point)
+
+    def lookup(self, address):
+        """
+        Geocode an address.
+
+        :param str address: address
+        :return: the geolocation, or an empty dict if the address could not be geocoded
+        :rtype: dict
+        """
+        number, street = parse_address(address)
+        point = self._lookup(number, street)
+
+        # Try again with the closest street name.
+        if not point and street:
+            if number is None:
+                candidates = [s for n, s in self.addresses if n is None]
+            else:
+                candidates = list(self.streets)
+            matches = difflib.get_close_matches(street, candidates, n=1, cutoff=FUZZY_CUTOFF)
+            if matches:
+                point = self._lookup(number, matches[0])
+
+        if not point:
+            self.misses += 1
+            return {}
+        self.hits += 1
+        return {'latitude': round(point[0], 6), 'longitude': round(point[1], 6)}
+
+    def _lookup(self, number, street):
+        """
+        Look up a parsed address in the index.
+
+        :param int number: street number
+        :param str street: normalized street
+        :return: the coordinates, or None if the address could not be found
+        :rtype: tuple
+        """
+        point = self.addresses.get((number, street))
+        if point or number is None or street not in self.streets:
+            return point
+
+        # Interpolate the position between the closest known street numbers.
+        known = self.streets[street]
+        numbers = sorted(known)
+        i = bisect.bisect(numbers, number)
+        lower = numbers[i - 1] if i else None
+        upper = numbers[i] if i < len(numbers) else None
+        if lower is not None and upper is not None and upper - lower <= MAX_INTERPOLATION_SPAN:
+            ratio = (number - lower) / (upper - lower)
+            return tuple(a + (b - a) * ratio for a, b in zip(known[lower], known[upper]))
+
+        # Otherwise use the closest street number if it is in the same block.
+        closest = min([n for n in (lower, upper) if n is not None], key=lambda n: abs(n - number))
+        if abs(closest - number) < MAX_EXTRAPOLATION_SPAN:
+            return known[closest]
+
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    Limit the number of concurrent requests.
+
+    The limit follows an AIMD (additive increase, multiplicative decrease) algorithm: it increases by one request per
+    round trip while the service answers quickly, and it is halved when a request is throttled, fails, or is slower than
+    the target latency.
+    """
+
+    def __init__(self, maximum=MAX_CONCURRENCY, initial=INITIAL_CONCURRENCY, target_latency=TARGET_LATENCY):
+        """
+        Initialize the limiter.
+
+        :param int maximum: maximum number of concurrent requests
+        :param int initial: initial number of concurrent requests
+        :param float target_latency: latency in seconds above which the limit decreases
+        """
+        self.maximum = maximum
+        self.limit = float(min(initial, maximum))
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.condition = None
+
+    async def __aenter__(self):
+        """Wait for a request slot."""
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Release a request slot."""
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def record(self, latency, throttled=False):
+        """
+        Adjust the limit according to the outcome of a request.
+
+        :param float latency: duration of the request in seconds
+        :param bool throttled: whether the request was throttled or failed
+        """
+        if throttled or latency > self.target_latency:
+            self.limit = max(1.0, self.limit / 2)
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+
+def get_backoff(attempt):
+    """
+    Compute the delay before retrying a request, using an exponential backoff with full jitter.
+
+    :param int attempt: number of the attempt which failed, starting at 0
+    :return: the delay in seconds
+    :rtype: float
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+async def fetch(url, request, parse, limiter=None, retries=MAX_RETRIES):
+    """
+    Send a request and parse its response.
+
+    Throttled requests (HTTP 429), server errors and network errors are retried.
+
+    :param str url: request URL, used for logging
+    :param callable request: function returning a new aiohttp request context manager for each attempt
+    :param callable parse: coroutine function parsing the response
+    :param AdaptiveLimiter limiter: concurrency limiter, defaults to None
+    :param int retries: number of retries
+    :return: the parsed response, or None if the request failed.
+    """
+    if not limiter:
+        limiter = AdaptiveLimiter()
+    for attempt in range(retries + 1):
+        if attempt:
+            metrics.count('http_retries')
+            await asyncio.sleep(get_backoff(attempt - 1))
+        async with limiter:
+            start = time.monotonic()
+            metrics.count('http_requests')
+            try:
+                async with request() as response:
+                    throttled = response.status == 429 or response.status >= 500
+                    limiter.record(time.monotonic() - start, throttled)
+                    if throttled:
+                        metrics.count('http_throttled')
+                        logger.warning(f'{url} responded with HTTP {response.status} '
+                                       f'(attempt {attempt + 1}/{retries + 1})')
+                        continue
+                    response.raise_for_status()
+                    return await parse(response)
+            except aiohttp.ClientResponseError as e:
+                logger.error(f'aiohttp exception for {url} -> {e}')
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                limiter.record(time.monotonic() - start, True)
+                logger.warning(f'aiohttp exception for {url} -> {e!r} (attempt {attempt + 1}/{retries + 1})')
+            except Exception as e:
+                logger.exception(f'non-aiohttp exception occured: {e}')
+                return None
+    logger.error(f'giving up on {url} after {retries + 1} attempts')
+    metrics.count('http_failures')
+    return None
+
+
+async def fetch_json(session, url, params=None, limiter=None, retries=MAX_RETRIES, cassette=None):
+    """
+    Fetch the data from a URL as JSON.
+
+    When a cassette is given, the responses are either recorded to it, or replayed from it instead of using the network.
+    The replayed requests go through the same retries and concurrency limiter as the other ones.
+
+    :param aiohttp.ClientSession session: aiohttp session
+    :param str url: request URL
+    :param dict params: request paramemters, defaults to None
+    :param AdaptiveLimiter limiter: concurrency limiter, defaults to None
+    :param int retries: number of retries
+    :param Cassette cassette: cassette recording or replaying the responses, defaults to None
+    :return: the data from a URL as JSON, or None if the request failed.
+    :rtype: dict
+    """
+    if not params:
+        params = {}
+
+    # Replay the response.
+    if cassette and not cassette.record:
+        response = cassette.get(params)
+        if response is None:
+            logger.error(f'{url} -> no response for {cassette.make_key(params)} in {cassette.path}')
+            return None
+        return await fetch(url, lambda: cassette.replay(response), lambda r: r.json(), limiter, retries)
+
+    response = await fetch(url, lambda: session.get(url, params=params), lambda r: r.json(), limiter, retries)
+
+    # Record it.
+    if cassette and response is not None:
+        cassette.set(params, response)
+    return response
+
+
+async def fetch_batch(session, url, requests, limiter=None, retries=MAX_RETRIES):
+    """
+    Geocode addresses with a single upload to the batch endpoint.
+
+    :param aiohttp.ClientSession session: aiohttp session
+    :param str url: batch endpoint URL
+    :param dict requests: request parameters by request ID
+    :param AdaptiveLimiter limiter: concurrency limiter, defaults to None
+    :param int retries: number of retries
+    :return: the rows of the response by request ID, or None if the request failed.
+    :rtype: dict
+    """
+    # Prepare the address file.
+    address_file = io.StringIO()
+    writer = csv.writer(address_file)
+    for request_id, params in requests.items():
+        writer.writerow([request_id, params['street'], params['city'], params['state'], ''])
+    first_params = next(iter(requests.values()))
+
+    def request():
+        data = aiohttp.FormData()
+        data.add_field('benchmark', first_params['benchmark'])
+        data.add_field('vintage', first_params['vintage'])
+        data.add_field('addressFile', address_file.getvalue(), filename='addresses.csv', content_type='text/csv')
+        return session.post(url, data=data, timeout=aiohttp.ClientTimeout(total=BATCH_TIMEOUT))
+
+    return await fetch(url, request, parse_geocensus_batch_response, limiter, retries)
+
+
+async def parse_geocensus_batch_response(response):
+    """
+    Parse the CSV response of the batch endpoint, line by line.
+
+    :param aiohttp.ClientResponse response: batch endpoint response
+    :return: the rows of the response by request ID
+    :rtype: dict
+    """
+    rows = {}
+    async for line in response.content:
+        row = next(csv.reader([line.decode('utf-8', 'replace')]), None)
+        if row:
+            rows[row[0]] = row
+    return rows
+
+
+async def geocode_batch(session, cache, requests, url, limiter, retries, batch_size):
+    """
+    Geocode the requests which are not in the cache using the batch endpoint.
+
+    The addresses having several matches (ties) are not in the batch results, as the batch endpoint does not return
+    any coordinates for them. They must be geocoded individually.
+
+    :param aiohttp.ClientSession session: aiohttp session
+    :param GeocodeCache cache: geocode cache
+    :param dict requests: request parameters by cache key
+    :param str url: batch endpoint URL
+    :param AdaptiveLimiter limiter: concurrency limiter
+    :param int retries: number of retries
+    :param int batch_size: maximum number of addresses per batch
+    :return: the geolocations by cache key (None if a request failed)
+    :rtype: dict
+    """
+    # Look for the geolocations in the cache.
+    geolocations = {}
+    pending = []
+    for key, params in requests.items():
+        geolocation = cache.get(key)
+        if geolocation is None:
+            pending.append((key, params))
+        else:
+            geolocations[key] = geolocation
+
+    # Split the remaining requests in chunks.
+    # The request IDs are the positions of the requests in their chunk.
+    chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    batches = [{str(i): params for i, (_, params) in enumerate(chunk)} for chunk in chunks]
+    responses = await asyncio.gather(*[fetch_batch(session, url, batch, limiter, retries) for batch in batches])
+
+    # Parse the responses.
+    for chunk, rows in zip(chunks, responses):
+        for i, (key, _) in enumerate(chunk):
+            if rows is None:
+                geolocations[key] = None
+                continue
+            row = rows.get(str(i))
+            if not row or (len(row) > 2 and row[2] == 'Tie'):
+                continue
+            geolocations[key] = parse_geocensus_batch_row(row)
+            cache.set(key, geolocations[key])
+
+    return geolocations
+
+
+async def fetch_geolocation(session,
+                            cache,
+                            key,
+                            params,
+                            url=GEO_CENSUS_URL,
+                            limiter=None,
+                            retries=MAX_RETRIES,
+                            cassette=None):
+    """
+    Fetch the geolocation of an address, using the cache if possible.
+
+    :param aiohttp.ClientSession session: aiohttp session
+    :param GeocodeCache cache: geocode cache
+    :param tuple key: the cache key
+    :param dict params: request parameters
+    :param str url: geocoder URL
+    :param AdaptiveLimiter limiter: concurrency limiter
+    :param int retries: number of retries
+    :param Cassette cassette: cassette recording or replaying the responses, defaults to None
+    :return: the geolocation, an empty dict if the address could not be geocoded, or None if the request failed
+    :rtype: dict
+    """
+    # Look for the geolocation in the cache.
+    geolocation = cache.get(key)
+    if geolocation is not None:
+        return geolocation
+
+    # Fetch the geolocation.
+    response = await fetch_json(session, url, params, limiter, retries, cassette)
+
+    # A failed request is not cached, so it can be retried next time.
+    if response is None:
+        return None
+
+    # Parse it.
+    geolocation = parse_geocensus_response(response)
+    cache.set(key, geolocation)
+
+    return geolocation
+
+
+async def async_update_entries(entries,
+                               cache=None,
+                               url=GEO_CENSUS_URL,
+                               concurrency=MAX_CONCURRENCY,
+                               retries=MAX_RETRIES,
+                               timeout=REQUEST_TIMEOUT,
+                               batch_size=0,
+                               batch_url=GEO_CENSUS_BATCH_URL,
+                               geocoder=None,
+                               offline_only=False,
+                               checkpoint=None,
+                               checkpoint_interval=CHECKPOINT_INTERVAL,
+                               cassette=None,
+                               failures=None):
+    """
+    Update the entries with the geolocations.
+
+    The entries which already have their coordinates are skipped. Entries sharing the same address are coalesced into a
+    single request.
+
+    The addresses are looked up in the offline geocoder first, if any. In batch mode, the remaining addresses are then
+    geocoded using the batch endpoint. Only the ambiguous addresses are geocoded individually.
+
+    The batch requests are not recorded to the cassettes. When replaying a cassette, the batch mode is disabled.
+
+    :param list(dict) entries: ScrAPD entries
+    :param GeocodeCache cache: geocode cache, defaults to an in-memory cache
+    :param str url: geocoder URL
+    :param int concurrency: maximum number of concurrent requests
+    :param int retries: number of retries of a failed request
+    :param float timeout: timeout of a request in seconds
+    :param int batch_size: maximum number of addresses per batch, 0 to disable the batch mode
+    :param str batch_url: batch endpoint URL
+    :param OfflineGeocoder geocoder: offline geocoder, defaults to None
+    :param bool offline_only: only use the offline geocoder
+    :param callable checkpoint: function called with the geolocation augmentations found so far, at most every
+        `checkpoint_interval` seconds while the addresses are geocoded individually, defaults to None
+    :param float checkpoint_interval: minimum number of seconds between 2 checkpoints
+    :param Cassette cassette: cassette recording or replaying the responses, defaults to None
+    :param list failures: list receiving the cases which could not be geocoded because of a request failure
+    :return: the geolocation augmentations
+    :rtype: list(dict)
+    """
+    if cache is None:
+        cache = GeocodeCache()
+
+    # Group the entries by request.
+    requests = {}
+    for entry in entries:
+        if not entry.get('case') or (entry.get('latitude') and entry.get('longitude')):
+            continue
+        params = build_params(entry)
+        key = make_cache_key(params)
+        if key in requests:
+            cache.coalesced += 1
+        requests.setdefault(key, (params, []))[1].append(entry)
+
+    # Look for the geolocations in the offline geocoder.
+    geolocations = {}
+    if geocoder:
+        for key, (params, _) in requests.items():
+            geolocation = geocoder.lookup(params['street'])
+            if geolocation:
+                geolocations[key] = {**geolocation, 'geocoder': OFFLINE_GEOCODER}
+    remaining = {key: params for key, (params, _) in requests.items() if key not in geolocations}
+    if offline_only:
+        remaining = {}
+
+    # Fetch the remaining geolocations.
+    limiter = AdaptiveLimiter(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=KEEPALIVE_TIMEOUT)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        if batch_size and remaining and not (cassette and not cassette.record):
+            batch_limiter = AdaptiveLimiter(BATCH_CONCURRENCY, BATCH_CONCURRENCY, BATCH_TIMEOUT)
+            geolocations.update(await geocode_batch(session, cache, remaining, batch_url, batch_limiter, retries,
+                                                    batch_size))
+        last_checkpoint = time.monotonic()
+
+        async def fetch_and_checkpoint(key):
+            nonlocal last_checkpoint
+            geolocations[key] = await fetch_geolocation(session, cache, key, remaining[key], url, limiter, retries,
+                                                        cassette)
+            if checkpoint and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                checkpoint(collect_results(requests, geolocations)[0])
+                last_checkpoint = time.monotonic()
+
+        keys = [key for key in remaining if key not in geolocations]
+        await asyncio.gather(*[fetch_and_checkpoint(key) for key in keys])
+
+    # Add the geolocation augmentations.
+    results, failed = collect_results(requests, geolocations)
+
+    # Report the failures.
+    if failed:
+        logger.warning(f'{len(failed)} entries could not be geocoded because of request failures: '
+                       f'{", ".join(sorted(failed))}')
+    metrics.count('geocode_failures', len(failed))
+    if failures is not None:
+        failures.extend(failed)
+
+    return results
+
+
+def collect_results(requests, geolocations):
+    """
+    Collect the geolocation augmentations of the entries.
+
+    :param dict requests: request parameters and entries by cache key
+    :param dict geolocations: geolocations by cache key (None if a request failed)
+    :return: the geolocation augmentations, and the cases which could not be geocoded because of a failure
+    :rtype: tuple(list(dict), list(str))
+    """
+    results = []
+    failures = []
+    for key, (_, group) in requests.items():
+        geolocation = geolocations.get(key, {})
+        if geolocation is None:
+            failures.extend(entry['case'] for entry in group)
+        if not geolocation:
+            continue
+        results.extend({'case': entry['case'], **geolocation} for entry in group)
+    return results, failures
+
+
+def build_params(entry):
+    """
+    Build the Geo Census request parameters of an entry.
+
+    :param dict entry: ScrAPD entry
+    :return: the request parameters
+    :rtype: dict
+    """
+    return {
+        "street": sanitize(entry.get('location', '')),
+        "city": "Austin",
+        "state": "TX",
+        "benchmark": GEO_CENSUS_BENCHMARK,
+        "vintage": GEO_CENSUS_VINTAGE,
+        "layers": "14",
+        "format": "json"
+    }
+
+
+def make_cache_key(params):
+    """
+    Make the cache key of a request.
+
+    :param dict params: request parameters
+    :return: the normalized address, the benchmark and the vintage
+    :rtype: tuple
+    """
+    address = ' '.join([params['street'], params['city'], params['state']]).lower().split()
+    return (' '.join(address), params['benchmark'], params['vintage'])
+
+
+def parse_geocensus_batch_row(row):
+    """
+    Parse a row of the geocensus batch response.
+
+    The result has the same format as the one of `parse_geocensus_response`.
+
+    :param list(str) row: CSV row (ID, address, match, match type, matched address, "longitude,latitude", ...)
+    :return: the geolocation
+    :rtype: dict
+    """
+    d = {}
+    if len(row) > 5 and row[2] == 'Match' and row[5]:
+        try:
+            longitude, latitude = map(float, row[5].split(','))
+        except ValueError:
+            return d
+        if latitude:
+            d['latitude'] = latitude
+        if longitude:
+            d['longitude'] = longitude
+
+    return d
+
+
+def sanitize(address):
+    """
+    Sanitize the location field if needed.
+
+    :param str address: address to sanitize
+    """
+    # Remove 'block of ' from the address.
+    addr = address.lower()
+    addr = addr.replace('block of ', '')
+    addr = addr.replace('block ', '')
+    return addr
+
+
+def parse_geocensus_response(response):
+    """
+    Parse the geocensus response.
+
+    :param dict result: geocensus response
+    """
+    d = {}
+    if response and response.get('result', {}).get('addressMatches'):
+        first_match = response.get('result', {}).get('addressMatches', [])[0]
+        latitude = first_match.get('coordinates', {}).get('y', '')
+        longitude = first_match.get('coordinates', {}).get('x', '')
+        if latitude:
+            d['latitude'] = latitude
+        if longitude:
+            d['longitude'] = longitude
+
+    return d
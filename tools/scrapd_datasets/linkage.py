@@ -0,0 +1,252 @@
+"""
+`scrapd_datasets.linkage` is a module shared by the Socrata tools to link the Socrata entries to the ScrAPD entries.
+
+The entries are matched by case number first. The case numbers of both data sets are sometimes mistyped or truncated
+(e.g. "17-2080" and "17-2080502"), therefore the remaining entries are then linked by comparing their records: date,
+time, location, coordinates and crash number of the year.
+
+Comparing every remaining ScrAPD entry with every remaining Socrata entry would not scale to the archives. The ScrAPD
+records are indexed by blocking keys instead: the date, the crash number of the year, and the street tokens of the
+year. Only the records sharing at least one key are compared, and the keys shared by too many records are ignored.
+
+The pairs scoring at least `LINK_THRESHOLD` are linked, the best ones first, each entry being linked at most once. The
+pairs which were not linked but scored at least `REVIEW_THRESHOLD` are reported, so that they can be checked manually.
+
+A record is a dictionary with the `date` (`YYYY-MM-DD`), `time` (`HH:MM:SS`), `location`, `latitude`, `longitude`
+and `crash` fields, like a ScrAPD entry. Each field may be missing.
+"""
+import collections
+import datetime
+import difflib
+import math
+import re
+
+from loguru import logger
+
+from scrapd_datasets import metrics
+from scrapd_datasets.address import STREET_ABBREVIATIONS
+from scrapd_datasets.address import parse_address
+
+# Linkage settings.
+LINK_THRESHOLD = 0.75
+REVIEW_THRESHOLD = 0.6
+# The blocking keys shared by more records are ignored.
+MAX_BLOCK_SIZE = 50
+# Weight of each field in the score.
+WEIGHTS = {'date': 3, 'crash': 2, 'location': 3, 'time': 1, 'coordinates': 2}
+# Similarity of a field which is missing from a record.
+MISSING_SIMILARITY = 0.5
+# Differences above which the time and the coordinates are not similar at all.
+MAX_TIME_DIFFERENCE = 120
+MAX_DISTANCE = 1.0
+EARTH_RADIUS = 6371.0
+# Street tokens too common to be blocking keys.
+STREET_COMMON_TOKENS = set(STREET_ABBREVIATIONS.values()) | {'ih', 'us', 'sh', 'fm', 'rm', 'loop', 'svrd'}
+
+
+def link(scrapd, socrata, threshold=LINK_THRESHOLD, review_threshold=REVIEW_THRESHOLD):
+    """
+    Link Socrata records to ScrAPD records.
+
+    The records are expected to be the ones whose case numbers did not match.
+
+    :param dict scrapd: ScrAPD records by case number
+    :param dict socrata: Socrata records by case number
+    :param float threshold: minimum score of a link
+    :param float review_threshold: minimum score of a pair to report
+    :return: the ScrAPD case number of each linked Socrata case number, and the pairs to review as
+        `(score, ScrAPD case number, Socrata case number)`, the best first
+    :rtype: tuple(dict, list(tuple))
+    """
+    scrapd_records = {case: prepare(case, record) for case, record in scrapd.items()}
+    socrata_records = {case: prepare(case, record) for case, record in socrata.items()}
+    if not scrapd_records or not socrata_records:
+        return {}, []
+
+    # Score the candidate pairs.
+    index = build_index(scrapd_records)
+    pairs = []
+    for socrata_case, record in socrata_records.items():
+        candidates = set()
+        for key in get_blocking_keys(record):
+            candidates.update(index.get(key, ()))
+        metrics.count('linkage_candidates', len(candidates))
+        for scrapd_case in candidates:
+            similarity = score(scrapd_records[scrapd_case], record)
+            if similarity >= review_threshold:
+                pairs.append((similarity, scrapd_case, socrata_case))
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+
+    # Link the best pairs first.
+    links = {}
+    linked = set()
+    for similarity, scrapd_case, socrata_case in pairs:
+        if similarity >= threshold and scrapd_case not in linked and socrata_case not in links:
+            links[socrata_case] = scrapd_case
+            linked.add(scrapd_case)
+    reviews = [pair for pair in pairs if pair[1] not in linked and pair[2] not in links]
+
+    # Report the links and the pairs to review.
+    if links:
+        logger.info(f'{len(links)} Socrata entries were linked to ScrAPD entries with other case numbers: '
+                    f'{", ".join(f"{k} -> {v}" for k, v in sorted(links.items()))}')
+    if reviews:
+        logger.warning(f'{len(reviews)} pairs of entries may match but were not linked: '
+                       f'{", ".join(f"{b} -> {a} ({s:.2f})" for s, a, b in reviews)}')
+    metrics.count('linkage_links', len(links))
+    metrics.count('linkage_reviews', len(reviews))
+
+    return links, reviews
+
+
+def prepare(case, record):
+    """
+    Prepare a record to be indexed and compared.
+
+    :param str case: case number of the record
+    :param dict record: record
+    :return: the year, and the fields to compare (None when they are missing): the date, the crash number, the parsed
+        location, the time in minutes since midnight and the coordinates
+    :rtype: dict
+    """
+    date = record.get('date') or ''
+    date = date[:10] if re.match(r'^\d{4}-\d{2}-\d{2}', date) else None
+    year = date[:4] if date else ''
+    if not year and re.match(r'^\d{2}-', case):
+        year = f'20{case[:2]}'
+    time = re.match(r'^(\d{2}):(\d{2})', record.get('time') or '')
+    address = parse_address(record.get('location') or '')
+    latitude = record.get('latitude')
+    longitude = record.get('longitude')
+    return {
+        'year': year,
+        'date': date,
+        'crash': str(record.get('crash') or '').lstrip('0') or None,
+        'location': address if address[1] else None,
+        'time': int(time.group(1)) * 60 + int(time.group(2)) if time else None,
+        'coordinates': (latitude, longitude) if latitude and longitude else None,
+    }
+
+
+def build_index(records):
+    """
+    Index the records by blocking key.
+
+    :param dict records: prepared records by case number
+    :return: the case numbers by blocking key, without the keys shared by more than `MAX_BLOCK_SIZE` records
+    :rtype: dict
+    """
+    index = collections.defaultdict(list)
+    for case, record in records.items():
+        for key in get_blocking_keys(record):
+            index[key].append(case)
+    return {key: cases for key, cases in index.items() if len(cases) <= MAX_BLOCK_SIZE}
+
+
+def get_blocking_keys(record):
+    """
+    Get the blocking keys of a record.
+
+    :param dict record: prepared record
+    :return: the date, the crash number of the year, and the uncommon street tokens of the year
+    :rtype: set(tuple)
+    """
+    keys = set()
+    if record['date']:
+        keys.add(('date', record['date']))
+    if record['year'] and record['crash']:
+        keys.add(('crash', record['year'], record['crash']))
+    for token in record['location'][1].split() if record['location'] else []:
+        if len(token) > 1 and not token.isdigit() and token not in STREET_COMMON_TOKENS:
+            keys.add(('street', record['year'], token))
+    return keys
+
+
+def score(a, b):
+    """
+    Score the similarity of 2 records.
+
+    Each field is compared, and the score is the weighted average of the similarities. The similarity of a field which
+    is missing from a record is `MISSING_SIMILARITY`.
+
+    :param dict a: prepared record
+    :param dict b: prepared record
+    :return: the score, between 0 and 1
+    :rtype: float
+    """
+    comparisons = {
+        'date': compare_dates,
+        'crash': lambda x, y: float(x == y),
+        'location': compare_addresses,
+        'time': compare_times,
+        'coordinates': compare_coordinates,
+    }
+    total = 0
+    for field, weight in WEIGHTS.items():
+        x, y = a[field], b[field]
+        total += weight * (comparisons[field](x, y) if x is not None and y is not None else MISSING_SIMILARITY)
+    return total / sum(WEIGHTS.values())
+
+
+def compare_dates(a, b):
+    """
+    Compare 2 dates.
+
+    :param str a: date formatted as `YYYY-MM-DD`
+    :param str b: date formatted as `YYYY-MM-DD`
+    :return: 1 for the same date, 0.5 for consecutive dates, 0 otherwise
+    :rtype: float
+    """
+    if a == b:
+        return 1.0
+    try:
+        days = abs((datetime.date.fromisoformat(a) - datetime.date.fromisoformat(b)).days)
+    except ValueError:
+        return 0.0
+    return 0.5 if days == 1 else 0.0
+
+
+def compare_times(a, b):
+    """
+    Compare 2 times.
+
+    :param int a: time in minutes since midnight
+    :param int b: time in minutes since midnight
+    :return: 1 for the same time, decreasing to 0 for `MAX_TIME_DIFFERENCE` minutes or more
+    :rtype: float
+    """
+    difference = abs(a - b)
+    difference = min(difference, 24 * 60 - difference)
+    return max(0.0, 1 - difference / MAX_TIME_DIFFERENCE)
+
+
+def compare_addresses(a, b):
+    """
+    Compare 2 addresses.
+
+    :param tuple a: street number and normalized street (see `parse_address`)
+    :param tuple b: street number and normalized street (see `parse_address`)
+    :return: the similarity of the streets, lowered if the street numbers differ
+    :rtype: float
+    """
+    similarity = difflib.SequenceMatcher(None, a[1], b[1]).ratio()
+    if a[0] is not None and b[0] is not None and a[0] != b[0]:
+        similarity *= 0.9 if abs(a[0] - b[0]) < 100 else 0.5
+    return similarity
+
+
+def compare_coordinates(a, b):
+    """
+    Compare 2 positions.
+
+    :param tuple a: latitude and longitude
+    :param tuple b: latitude and longitude
+    :return: 1 for the same position, decreasing to 0 for `MAX_DISTANCE` km or more
+    :rtype: float
+    """
+    # Equirectangular approximation, which is precise enough at the scale of a city.
+    latitude = math.radians((a[0] + b[0]) / 2)
+    x = math.radians(b[1] - a[1]) * math.cos(latitude)
+    y = math.radians(b[0] - a[0])
+    distance = EARTH_RADIUS * math.hypot(x, y)
+    return max(0.0, 1 - distance / MAX_DISTANCE)
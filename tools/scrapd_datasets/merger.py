@@ -0,0 +1,418 @@
+"""
+`scrapd-datasets merge` merges 2 ScrAPD data sets together.
+
+The data sets are expected to be arrays of objects (see the test data of `tests/test_merger.py`).
+
+With `--delta`, the differences between `old` and the merged data set are also written to a file: the cases which were
+added or removed, and a JSON Patch (RFC 6902) for each case which changed. Applying the delta to `old` with
+`apply_delta()` produces the merged data set.
+
+With `--stream`, the data sets are read and written incrementally, one record at a time, which keeps the memory usage
+constant regardless of their size. Both data sets must then be sorted by case number. They can either be JSON arrays or
+newline-delimited JSON (NDJSON).
+
+Usage examples:
+
+$ scrapd-datasets merge old.json <(cat new.json)
+$ cat new.json | scrapd-datasets merge old.json -
+$ scrapd-datasets merge --stream -i old.json new.ndjson
+$ scrapd-datasets merge -i --delta delta.json old.json new.json
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+
+from scrapd.core import model
+from scrapd.core.formatter import json_serializers
+
+from scrapd_datasets import metrics
+from scrapd_datasets.serializer import dumps
+from scrapd_datasets.serializer import iter_records
+from scrapd_datasets.serializer import replace_if_changed
+from scrapd_datasets.serializer import to_json
+from scrapd_datasets.serializer import write_if_changed
+
+
+def run(args):
+    """
+    Merge the data set files given on the command line.
+
+    :param argparse.Namespace args: arguments of the `merge` subcommand
+    """
+    metrics.init('scrapd-merger')
+    with metrics.stage('merge', dataset=os.path.basename(args.old.name)) as stage:
+        merge_files(args, stage)
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Merge ScrAPD data sets.')
+    parser.add_argument('old', type=argparse.FileType('r+t'))
+    parser.add_argument('infile', type=argparse.FileType('rt'), default=sys.stdin)
+    parser.add_argument('-i', '--in-place', action='store_true', help="Update OLD in place")
+    parser.add_argument('-u', '--update', action='store_true', help='Update existing fields')
+    parser.add_argument('-s', '--stream', action='store_true', help='Merge data sets sorted by case incrementally')
+    parser.add_argument('--ndjson', action='store_true', help='Write the streamed results as NDJSON')
+    parser.add_argument('-t',
+                        '--trusted',
+                        action='store_true',
+                        help='Do not validate OLD again (it must have been generated by these tools)')
+    parser.add_argument('-d', '--delta', help='Write the differences between OLD and the merged data set to a file')
+
+    return parser
+
+
+def merge_files(args, stage):
+    """
+    Merge the data set files given on the command line.
+
+    :param argparse.Namespace args: command line arguments
+    :param dict stage: stage recording the number of records read and written
+    """
+    # Keep track of the old entries, to compute the delta.
+    delta = new_delta() if args.delta else None
+    old_entries = {}
+
+    # Merge the data incrementally.
+    if args.stream:
+        old = metrics.iter_counted(iter_records(args.old), stage, 'records_in')
+        if args.delta:
+            old = remember_entries(old, old_entries)
+        new = metrics.iter_counted(iter_records(args.infile), stage, 'records_in')
+        results = merge_stream(old, new, args.update, args.trusted)
+        if args.delta:
+            results = iter_delta(old_entries, results, delta)
+        results = metrics.iter_counted(results, stage, 'records_out')
+        if args.in_place:
+            # The results cannot be written to `old` while it is being read.
+            old_dir = os.path.dirname(os.path.abspath(args.old.name))
+            with tempfile.NamedTemporaryFile('wt', dir=old_dir, delete=False) as f:
+                write_records(f, results, args.ndjson)
+            args.old.close()
+            replace_if_changed(f.name, args.old.name)
+        else:
+            write_records(sys.stdout, results, args.ndjson)
+            print()
+        write_delta(args.delta, old_entries, delta)
+        return
+
+    # Merge the data.
+    old = json.loads(args.old.read())
+    new = json.loads(args.infile.read())
+    results = merge(old, new, args.update, args.trusted)
+    sorted_results = sorted(results, key=lambda x: x.case)
+    stage['records_in'] = len(old) + len(new)
+    stage['records_out'] = len(sorted_results)
+    if args.delta:
+        old_entries.update((entry['case'], entry) for entry in old)
+        sorted_results = list(iter_delta(old_entries, sorted_results, delta))
+
+    # Write the data to `old` file.
+    if args.in_place:
+        args.old.close()
+        write_if_changed(args.old.name, to_json(sorted_results))
+    else:
+        # Display the results.
+        print(to_json(sorted_results))
+    write_delta(args.delta, old_entries, delta)
+
+
+def merge(old, new, update, trusted=False):
+    """
+    Merge `new` data into `old` data.
+
+    The entries which are identical in both data sets are only loaded once, and are not merged.
+
+    :param list(dict) old: old data
+    :param list(dict) new: new data
+    :param bool update: update the existing fields
+    :param bool trusted: the old data was already validated, and is loaded without being validated again
+    :return: the new data merged into the old data
+    :rtype: list(dict)
+    """
+    old_dict = {entry['case']: entry for entry in old}
+    new_dict = {entry['case']: entry for entry in new}
+    final_dict = {}
+
+    for case, entry in old_dict.items():
+        final_dict[case] = merge_entries(entry, new_dict.pop(case, None), update, trusted)
+
+    final_dict.update({case: model.Report(**entry) for case, entry in new_dict.items()})
+    return list(final_dict.values())
+
+
+def merge_entries(old_entry, new_entry, update, trusted=False):
+    """
+    Load and merge a `new` entry into an `old` entry.
+
+    Only the entries which changed are fully validated and merged.
+
+    :param dict old_entry: old entry
+    :param dict new_entry: new entry, or None
+    :param bool update: update the existing fields
+    :param bool trusted: the old entry was already validated, and is loaded without being validated again
+    :return: the merged entry
+    :rtype: model.Report
+    """
+    if new_entry is None or new_entry == old_entry:
+        return load_trusted(old_entry) if trusted else model.Report(**old_entry)
+    return merge_entry(model.Report(**old_entry), model.Report(**new_entry), update)
+
+
+def merge_entry(old_entry, new_entry, update):
+    """
+    Merge a `new` entry into an `old` entry.
+
+    :param model.Report old_entry: old entry
+    :param model.Report new_entry: new entry, or None
+    :param bool update: update the existing fields
+    :return: the merged entry
+    :rtype: model.Report
+    """
+    if update and new_entry:
+        return new_entry
+    old_entry.update(new_entry)
+    return old_entry
+
+
+def load_trusted(entry, model_class=model.Report):
+    """
+    Load an entry which was already validated, without validating it again.
+
+    The values are kept as they are, therefore the entry must have been generated by ScrAPD or by one of these tools.
+
+    :param dict entry: entry to load
+    :param type model_class: model of the entry
+    :return: the model instance
+    :rtype: model.Report
+    """
+    fields = model_class.__fields__
+    values = {name: copy.deepcopy(field.default) for name, field in fields.items()}
+    values.update({name: value for name, value in entry.items() if name in fields})
+    if model_class is model.Report:
+        values['fatalities'] = [
+            f if isinstance(f, model.Fatality) else load_trusted(f, model.Fatality) for f in values['fatalities']
+        ]
+    return model_class.construct(values, set(entry) & set(fields))
+
+
+def merge_stream(old, new, update, trusted=False):
+    """
+    Merge `new` data into `old` data, one entry at a time.
+
+    Both data sets must be sorted by case number. If a case appears several times in a data set, the last entry wins.
+
+    :param iterator(dict) old: old data
+    :param iterator(dict) new: new data
+    :param bool update: update the existing fields
+    :param bool trusted: the old data was already validated, and is loaded without being validated again
+    :return: the new data merged into the old data, sorted by case number
+    :rtype: iterator(model.Report)
+    """
+    old_entries = iter_sorted_entries(old)
+    new_entries = iter_sorted_entries(new)
+    old_entry = next(old_entries, None)
+    new_entry = next(new_entries, None)
+    while old_entry or new_entry:
+        if not new_entry or (old_entry and old_entry['case'] < new_entry['case']):
+            yield merge_entries(old_entry, None, update, trusted)
+            old_entry = next(old_entries, None)
+        elif not old_entry or new_entry['case'] < old_entry['case']:
+            yield model.Report(**new_entry)
+            new_entry = next(new_entries, None)
+        else:
+            yield merge_entries(old_entry, new_entry, update, trusted)
+            old_entry = next(old_entries, None)
+            new_entry = next(new_entries, None)
+
+
+def iter_sorted_entries(entries):
+    """
+    Ensure the entries of a data set are sorted by case number, and remove the duplicated cases.
+
+    :param iterator(dict) entries: data set entries
+    :return: the entries, with the duplicated cases removed (the last one wins)
+    :rtype: iterator(dict)
+    :raises ValueError: if the entries are not sorted by case number
+    """
+    previous = None
+    for entry in entries:
+        if previous and entry['case'] < previous['case']:
+            raise ValueError(f'the data set is not sorted by case: "{entry["case"]}" found after "{previous["case"]}"')
+        if previous and entry['case'] != previous['case']:
+            yield previous
+        previous = entry
+    if previous:
+        yield previous
+
+
+def write_records(f, records, ndjson=False):
+    """
+    Write records incrementally.
+
+    The JSON output is identical to the one of `to_json`.
+
+    :param file f: file to write to
+    :param iterator records: records to write
+    :param bool ndjson: write the records as NDJSON instead of a JSON array
+    """
+    if ndjson:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True, default=json_serializers) + '\n')
+        return
+
+    separator = '[\n'
+    for record in records:
+        f.write(separator)
+        # Indent the record as an item of the array.
+        record_str = dumps(record, default=json_serializers)
+        f.write('  ' + record_str.replace('\n', '\n  '))
+        separator = ',\n'
+    f.write('[]' if separator == '[\n' else '\n]')
+
+
+def new_delta():
+    """
+    Create an empty delta.
+
+    :return: the delta
+    :rtype: dict
+    """
+    return {'added': [], 'changed': [], 'removed': []}
+
+
+def remember_entries(entries, old_entries):
+    """
+    Remember the entries of a data set while they are being read.
+
+    :param iterator(dict) entries: data set entries
+    :param dict old_entries: dictionary receiving the entries, by case number
+    :return: the entries
+    :rtype: iterator(dict)
+    """
+    for entry in entries:
+        old_entries[entry['case']] = entry
+        yield entry
+
+
+def iter_delta(old_entries, results, delta):
+    """
+    Compute the delta between the old entries and the merged entries, while the merged entries are being written.
+
+    The old entries are removed from `old_entries` as they are processed. The remaining ones are the removed entries.
+
+    :param dict old_entries: old entries, by case number
+    :param iterator(model.Report) results: merged entries
+    :param dict delta: delta receiving the differences
+    :return: the merged entries
+    :rtype: iterator(model.Report)
+    """
+    for result in results:
+        entry = json.loads(dumps(result, default=json_serializers))
+        old_entry = old_entries.pop(entry['case'], None)
+        if old_entry is None:
+            delta['added'].append(entry)
+        else:
+            patch = diff(old_entry, entry)
+            if patch:
+                delta['changed'].append({'case': entry['case'], 'patch': patch})
+        yield result
+
+
+def write_delta(path, old_entries, delta):
+    """
+    Write a delta to a file.
+
+    :param str path: path of the file, or None to skip writing the delta
+    :param dict old_entries: old entries which were not merged, by case number
+    :param dict delta: delta to write
+    """
+    if not path:
+        return
+    delta['removed'] = sorted(old_entries)
+    write_if_changed(path, dumps(delta) + '\n')
+
+
+def diff(old, new, path=''):
+    """
+    Compute the JSON Patch (RFC 6902) transforming a JSON value into another one.
+
+    The objects and the lists of the same length are compared item by item, the other values are replaced.
+
+    :param old: old value
+    :param new: new value
+    :param str path: JSON pointer of the values
+    :return: the patch operations
+    :rtype: list(dict)
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = []
+        for key in sorted(old.keys() | new.keys()):
+            key_path = f'{path}/{escape_pointer(key)}'
+            if key not in new:
+                patch.append({'op': 'remove', 'path': key_path})
+            elif key not in old:
+                patch.append({'op': 'add', 'path': key_path, 'value': new[key]})
+            else:
+                patch.extend(diff(old[key], new[key], key_path))
+        return patch
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        return [op for i, (o, n) in enumerate(zip(old, new)) for op in diff(o, n, f'{path}/{i}')]
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def escape_pointer(token):
+    """
+    Escape a token of a JSON pointer (RFC 6901).
+
+    :param str token: token to escape
+    :return: the escaped token
+    :rtype: str
+    """
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+def apply_patch(value, patch):
+    """
+    Apply a JSON Patch generated by `diff()` to a JSON value.
+
+    :param value: value to patch, which is modified in place when possible
+    :param list(dict) patch: patch operations
+    :return: the patched value
+    """
+    for op in patch:
+        tokens = [t.replace('~1', '/').replace('~0', '~') for t in op['path'].split('/')[1:]]
+        if not tokens:
+            value = copy.deepcopy(op['value'])
+            continue
+        parent = value
+        for token in tokens[:-1]:
+            parent = parent[int(token) if isinstance(parent, list) else token]
+        key = int(tokens[-1]) if isinstance(parent, list) else tokens[-1]
+        if op['op'] == 'remove':
+            del parent[key]
+        else:
+            parent[key] = copy.deepcopy(op['value'])
+    return value
+
+
+def apply_delta(entries, delta):
+    """
+    Apply a delta to the entries of a data set.
+
+    :param list(dict) entries: data set entries, which are modified in place
+    :param dict delta: delta to apply
+    :return: the updated entries, sorted by case number
+    :rtype: list(dict)
+    """
+    removed = set(delta['removed'])
+    entries_dict = {entry['case']: entry for entry in entries if entry['case'] not in removed}
+    for change in delta['changed']:
+        entries_dict[change['case']] = apply_patch(entries_dict[change['case']], change['patch'])
+    entries_dict.update((entry['case'], copy.deepcopy(entry)) for entry in delta['added'])
+    return sorted(entries_dict.values(), key=lambda x: x['case'])
@@ -0,0 +1,333 @@
+"""
+`scrapd_datasets.metrics` is a module shared by the tools to measure their stages.
+
+A stage records its wall time, its CPU time, the peak RSS of the process while it runs, the number of records it reads
+and writes, and counters like the cache hits or the network requests. The counters are incremented with `count()`
+from anywhere in the code, and are added to the innermost stage running.
+
+When the `SCRAPD_METRICS_DIR` environment variable is set, each tool writes its stages to a file of this directory
+when it exits. The files are then collected into a JSON metrics file and a Prometheus textfile collector file:
+
+$ export SCRAPD_METRICS_DIR=/tmp/metrics
+$ python tools/scrapd-pipeline.py
+$ scrapd-datasets metrics /tmp/metrics -o metrics.json -p scrapd_datasets.prom
+
+When the `SCRAPD_PROFILE` environment variable is set to `cprofile` or `pyinstrument`, each stage is also profiled.
+The profiles are written to `SCRAPD_PROFILE_DIR`, or to the current directory.
+"""
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import pathlib
+import re
+import resource
+import sys
+import time
+
+from scrapd_datasets.serializer import dumps
+from scrapd_datasets.serializer import write_if_changed
+
+METRICS_DIR_ENV = 'SCRAPD_METRICS_DIR'
+PROFILE_ENV = 'SCRAPD_PROFILE'
+PROFILE_DIR_ENV = 'SCRAPD_PROFILE_DIR'
+PROMETHEUS_PREFIX = 'scrapd_datasets'
+PROC_STATUS = pathlib.Path('/proc/self/status')
+PROC_CLEAR_REFS = pathlib.Path('/proc/self/clear_refs')
+
+
+def run(args):
+    """
+    Collect the stages written to the directory given on the command line.
+
+    :param argparse.Namespace args: arguments of the `metrics` subcommand
+    """
+    stages = collect(args.directory)
+    if args.output:
+        write_if_changed(args.output, dumps({'stages': stages}) + '\n')
+    if args.prometheus:
+        write_if_changed(args.prometheus, to_prometheus(stages))
+    if not args.output and not args.prometheus:
+        print(dumps({'stages': stages}))
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Collect the metrics written by the tools.')
+    parser.add_argument('directory', type=pathlib.Path, help=f'Metrics directory (see {METRICS_DIR_ENV})')
+    parser.add_argument('-o', '--output', help='JSON metrics file (default: stdout)')
+    parser.add_argument('-p', '--prometheus', help='Prometheus textfile collector file')
+
+    return parser
+
+
+class Metrics:
+    """Record the stages of a tool."""
+
+    def __init__(self, tool=None, profiler=None, profile_dir='.'):
+        """
+        Initialize the metrics.
+
+        :param str tool: name of the tool
+        :param str profiler: `cprofile` or `pyinstrument` to profile the stages, None to disable the profiling
+        :param str profile_dir: directory receiving the profiles
+        """
+        self.tool = tool
+        self.profiler = profiler
+        self.profile_dir = pathlib.Path(profile_dir)
+        self.stages = []
+        self.running = []
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        """
+        Measure a stage.
+
+        The stage can record the number of records it reads and writes by setting `records_in` and `records_out` on
+        the yielded dictionary.
+
+        :param str name: name of the stage
+        :param labels: labels identifying the stage, e.g. the year
+        :return: the stage being measured
+        :rtype: dict
+        """
+        labels = {k: str(v) for k, v in labels.items()}
+        stage = {
+            'counters': {},
+            'labels': labels,
+            'records_in': None,
+            'records_out': None,
+            'stage': name,
+            'tool': self.tool,
+        }
+        self.running.append(stage)
+        profiler = self.start_profiler()
+        reset_peak_rss()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield stage
+        finally:
+            stage['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            stage['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            stage['peak_rss_bytes'] = max(get_peak_rss(), stage.pop('peak_rss_child', 0))
+            self.stop_profiler(profiler, stage)
+            self.running.pop()
+            if self.running:
+                # The peak RSS was reset by this stage, the parent stage must take it into account.
+                parent = self.running[-1]
+                parent['peak_rss_child'] = max(parent.get('peak_rss_child', 0), stage['peak_rss_bytes'])
+            self.stages.append(stage)
+
+    def count(self, name, value=1):
+        """
+        Increment a counter of the innermost stage running.
+
+        The counters are ignored when no stage is running.
+
+        :param str name: name of the counter
+        :param int value: increment
+        """
+        if self.running:
+            counters = self.running[-1]['counters']
+            counters[name] = counters.get(name, 0) + value
+
+    def start_profiler(self):
+        """
+        Start profiling a stage, if the profiling is enabled and no other stage is being profiled.
+
+        :return: the profiler, or None
+        """
+        if not self.profiler or any(s.get('profiled') for s in self.running[:-1]):
+            return None
+        self.running[-1]['profiled'] = True
+        if self.profiler == 'pyinstrument':
+            import pyinstrument  # pylint: disable=import-outside-toplevel
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            return profiler
+        import cProfile  # pylint: disable=import-outside-toplevel
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop_profiler(self, profiler, stage):
+        """
+        Stop profiling a stage, and write its profile.
+
+        :param profiler: the profiler returned by `start_profiler`, or None
+        :param dict stage: the stage
+        """
+        stage.pop('profiled', None)
+        if profiler is None:
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        labels = ''.join(f'-{v}' for _, v in sorted(stage['labels'].items()))
+        name = re.sub(r'[^\w.-]+', '_', f'{self.tool or "tool"}-{stage["stage"]}{labels}-{os.getpid()}')
+        if self.profiler == 'pyinstrument':
+            profiler.stop()
+            stage['profile'] = str(self.profile_dir / f'{name}.html')
+            pathlib.Path(stage['profile']).write_text(profiler.output_html())
+        else:
+            profiler.disable()
+            stage['profile'] = str(self.profile_dir / f'{name}.prof')
+            profiler.dump_stats(stage['profile'])
+
+    def save(self, directory):
+        """
+        Write the stages to a file of a metrics directory.
+
+        :param str directory: metrics directory
+        """
+        if not self.stages:
+            return
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{self.tool or "tool"}-{os.getpid()}-{time.time_ns()}.json'
+        write_if_changed(path, dumps({'stages': self.stages}) + '\n')
+
+
+# Metrics of the current process.
+METRICS = Metrics()
+
+
+def init(tool):
+    """
+    Enable the metrics of a tool, according to the environment variables.
+
+    :param str tool: name of the tool
+    :return: the metrics of the current process
+    :rtype: Metrics
+    """
+    METRICS.tool = tool
+    METRICS.profiler = os.environ.get(PROFILE_ENV) or None
+    METRICS.profile_dir = pathlib.Path(os.environ.get(PROFILE_DIR_ENV, '.'))
+    if os.environ.get(METRICS_DIR_ENV):
+        atexit.register(METRICS.save, os.environ[METRICS_DIR_ENV])
+    return METRICS
+
+
+def stage(name, **labels):
+    """Measure a stage of the current process (see `Metrics.stage`)."""
+    return METRICS.stage(name, **labels)
+
+
+def count(name, value=1):
+    """Increment a counter of the current process (see `Metrics.count`)."""
+    METRICS.count(name, value)
+
+
+def iter_counted(items, stage, field):
+    """
+    Count the items of an iterator in a field of a stage, while they are being read.
+
+    :param iterator items: items to count
+    :param dict stage: stage
+    :param str field: field of the stage receiving the count, e.g. `records_in`
+    :return: the items
+    :rtype: iterator
+    """
+    stage[field] = stage[field] or 0
+    for item in items:
+        stage[field] += 1
+        yield item
+
+
+def reset_peak_rss():
+    """
+    Reset the peak RSS of the process, so that the peak RSS of a stage can be measured.
+
+    This is only supported by Linux. Elsewhere, the peak RSS of a stage is the one of the process since it started.
+    """
+    try:
+        PROC_CLEAR_REFS.write_text('5')
+    except OSError:
+        pass
+
+
+def get_peak_rss():
+    """
+    Get the peak RSS of the process.
+
+    :return: the peak RSS in bytes
+    :rtype: int
+    """
+    try:
+        match = re.search(r'^VmHWM:\s+(\d+) kB', PROC_STATUS.read_text(), re.MULTILINE)
+        if match:
+            return int(match.group(1)) * 1024
+    except OSError:
+        pass
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports the peak RSS in KiB, macOS in bytes.
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def collect(directory):
+    """
+    Collect the stages written to a metrics directory.
+
+    :param str directory: metrics directory
+    :return: the stages, in the order the files were written
+    :rtype: list(dict)
+    """
+    paths = sorted(pathlib.Path(directory).glob('*.json'), key=lambda p: (p.stat().st_mtime_ns, p.name))
+    return [s for path in paths for s in json.loads(path.read_text())['stages']]
+
+
+def to_prometheus(stages):
+    """
+    Format stages for the Prometheus textfile collector.
+
+    The stages having the same tool, name and labels are summed. The stage measurements are exported as gauges, and the
+    counters as counters, with a `_total` suffix.
+
+    :param list(dict) stages: stages
+    :return: the metrics in the Prometheus text format
+    :rtype: str
+    """
+    gauges = {
+        'wall_seconds': 'Wall time of the stage in seconds.',
+        'cpu_seconds': 'CPU time of the stage in seconds.',
+        'peak_rss_bytes': 'Peak resident set size during the stage in bytes.',
+        'records_in': 'Number of records read by the stage.',
+        'records_out': 'Number of records written by the stage.',
+    }
+    samples = {}
+    for s in stages:
+        labels = {'tool': s['tool'] or '', 'stage': s['stage'], **s['labels']}
+        label_str = ','.join(f'{k}="{escape_label(v)}"' for k, v in sorted(labels.items()))
+        values = {f'stage_{k}': s.get(k) for k in gauges}
+        values.update({f'{k}_total': v for k, v in s['counters'].items()})
+        for metric, value in values.items():
+            if value is None:
+                continue
+            key = (metric, label_str)
+            if metric == 'stage_peak_rss_bytes':
+                samples[key] = max(samples.get(key, 0), value)
+            else:
+                samples[key] = samples.get(key, 0) + value
+
+    lines = []
+    for metric in sorted({m for m, _ in samples}):
+        name = f'{PROMETHEUS_PREFIX}_{re.sub(r"[^a-zA-Z0-9_]", "_", metric)}'
+        if metric.startswith('stage_') and metric[len('stage_'):] in gauges:
+            help_text, metric_type = gauges[metric[len('stage_'):]], 'gauge'
+        else:
+            help_text, metric_type = f'Number of {metric[:-len("_total")].replace("_", " ")}.', 'counter'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(f'{name}{{{labels}}} {value}' for (m, labels), value in sorted(samples.items()) if m == metric)
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def escape_label(value):
+    """
+    Escape a Prometheus label value.
+
+    :param str value: label value
+    :return: the escaped value
+    :rtype: str
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
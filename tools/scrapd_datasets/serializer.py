@@ -0,0 +1,214 @@
+"""
+`scrapd_datasets.serializer` is a module shared by the tools to serialize, write and read the data sets.
+
+The serializer produces the same output as `json.dumps(obj, sort_keys=True, indent=2)`, but uses `orjson` when it is
+installed, which is much faster. The values which `orjson` would format differently, like the floats written with an
+exponent, are serialized with the standard library instead. NaN and infinity, which are not valid JSON and never appear
+in the data sets, are written as `null` by `orjson`.
+
+The data sets are only written when their content changes, through a temporary file which replaces the original one.
+
+The records of the data sets can also be read incrementally, without loading the models of ScrAPD.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Table replacing all the digits with 0, to look for the numbers orjson may format differently.
+DIGITS = bytes.maketrans(b'123456789', b'000000000')
+# Characters which `json.dumps` escapes, but orjson does not.
+NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+# Number of characters read at once by `iter_records`.
+CHUNK_SIZE = 64 * 1024
+
+
+def dumps(obj, default=None):
+    """
+    Serialize an object to a JSON string.
+
+    :param obj: object to serialize
+    :param callable default: function converting the objects which cannot be serialized
+    :return: the same string as `json.dumps(obj, sort_keys=True, indent=2, default=default)`
+    :rtype: str
+    """
+    if orjson:
+        try:
+            data = orjson.dumps(obj,
+                                default=default,
+                                option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            pass
+        else:
+            if not has_unsafe_numbers(data):
+                if data.isascii() and b'\x7f' not in data:
+                    return data.decode()
+                return NON_ASCII.sub(escape, data.decode())
+    return json.dumps(obj, sort_keys=True, indent=2, default=default)
+
+
+def has_unsafe_numbers(data):
+    """
+    Check whether a JSON output may contain numbers formatted differently by orjson.
+
+    orjson writes the floats using an exponent differently, e.g. `1e16` instead of `1e+16`, or `0.00001` instead of
+    `1e-05`. A few other values, like the integers with 17 digits or more, are reported too.
+
+    :param bytes data: JSON output of orjson
+    :return: True if the output may contain such numbers
+    :rtype: bool
+    """
+    digits = data.translate(DIGITS)
+    return b'0e' in digits or b'0' * 17 in digits or b'0.0000' in data
+
+
+def escape(match):
+    """
+    Escape a DEL or non-ASCII character like `json.dumps` does.
+
+    :param re.Match match: match of the character
+    :return: the escaped character
+    :rtype: str
+    """
+    code = ord(match.group(0))
+    if code < 0x10000:
+        return f'\\u{code:04x}'
+    code -= 0x10000
+    return f'\\u{0xd800 | (code >> 10):04x}\\u{0xdc00 | (code & 0x3ff):04x}'
+
+
+def to_json(results):
+    """
+    Convert ScrAPD results to a JSON string.
+
+    :param results: reports, or any value `scrapd.core.formatter.to_json` accepts
+    :return: the same string as `scrapd.core.formatter.to_json(results)`
+    :rtype: str
+    """
+    # ScrAPD imports its models, which take several hundreds of milliseconds to load.
+    from scrapd.core.formatter import json_serializers  # pylint: disable=import-outside-toplevel
+    return dumps(results, default=json_serializers)
+
+
+def write_if_changed(path, content):
+    """
+    Write a file only if its content changes.
+
+    The content is written to a temporary file, which then replaces the file. The permissions of the file are kept.
+
+    :param str path: path of the file
+    :param str content: content of the file
+    :return: True if the file was written, False if it was already up to date
+    :rtype: bool
+    """
+    data = content.encode()
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+
+    with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(os.path.abspath(path)), delete=False) as f:
+        f.write(data)
+    replace(f.name, path)
+    return True
+
+
+def replace_if_changed(tmp_path, path):
+    """
+    Replace a file with a temporary file, only if their contents differ.
+
+    The temporary file is removed when the file is already up to date.
+
+    :param str tmp_path: path of the temporary file
+    :param str path: path of the file
+    :return: True if the file was replaced, False if it was already up to date
+    :rtype: bool
+    """
+    if os.path.exists(path) and os.path.getsize(path) == os.path.getsize(tmp_path):
+        with open(path, 'rb') as f, open(tmp_path, 'rb') as g:
+            if f.read() == g.read():
+                os.remove(tmp_path)
+                return False
+    replace(tmp_path, path)
+    return True
+
+
+def replace(tmp_path, path):
+    """
+    Replace a file with a temporary file, keeping its permissions.
+
+    :param str tmp_path: path of the temporary file
+    :param str path: path of the file
+    """
+    if os.path.exists(path):
+        shutil.copymode(path, tmp_path)
+    else:
+        os.chmod(tmp_path, 0o666 & ~get_umask())
+    os.replace(tmp_path, path)
+
+
+def get_umask():
+    """Get the umask of the process."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def iter_records(f, chunk_size=CHUNK_SIZE):
+    """
+    Read the records of a JSON array or of a NDJSON file incrementally.
+
+    :param file f: file to read
+    :param int chunk_size: number of characters to read at once
+    :return: the records
+    :rtype: iterator(dict)
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    is_array = None
+    while True:
+        # Skip the separators.
+        while pos < len(buffer) and (buffer[pos].isspace() or (is_array and buffer[pos] == ',')):
+            pos += 1
+
+        # Read more data if needed.
+        if pos == len(buffer):
+            if eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        # Detect the format.
+        if is_array is None:
+            is_array = buffer[pos] == '['
+            pos += is_array
+            continue
+        if is_array and buffer[pos] == ']':
+            return
+
+        # Decode the next record.
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield record
+        pos = end
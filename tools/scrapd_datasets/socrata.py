@@ -0,0 +1,256 @@
+"""
+`scrapd-datasets import-socrata` generates the Socrata APD augmentations.
+
+The data sets are expected to be arrays of objects (see the test data of `tests/test_socrata.py`).
+
+The Socrata entries are matched with the ScrAPD entries by case number. The remaining entries are then linked by
+comparing their dates, times, locations, coordinates and crash numbers (see `scrapd_datasets.linkage`). The pairs
+which are similar, but not enough to be linked, are reported. Use `--exact` to only match the case numbers.
+
+Usage examples:
+
+$ scrapd-datasets import-socrata scrapd-data-set.json <(cat socarata-data-set.json)
+$ cat socarata-data-set.json | scrapd-datasets import-socrata old.json -
+$ scrapd-datasets import-socrata --link-threshold 0.9 scrapd-data-set.json socarata-data-set.json
+"""
+import argparse
+import collections
+import datetime
+import functools
+import json
+import re
+import sys
+
+from loguru import logger
+
+from scrapd_datasets import linkage
+
+# Time formats found in the Socrata archives, e.g. "23:25", "19:15:00", "2018-01-04T00:00:00.000" or "11:57 p.m.".
+TIME_PATTERNS = [
+    re.compile(r'^(?P<hour>\d{1,2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?$'),
+    re.compile(r'^\d{4}-\d{2}-\d{2}[t ](?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2})(?:\.\d+)?)?$', re.I),
+    re.compile(r'^(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>[ap])\.?\s*m\.?$', re.I),
+]
+
+# Times which could only be parsed by dateparser.
+TIME_FALLBACKS = collections.Counter()
+
+
+def run(args):
+    """
+    Import the Socrata data set given on the command line.
+
+    :param argparse.Namespace args: arguments of the `import-socrata` subcommand
+    """
+    # Merge the data.
+    link_threshold = None if args.exact else args.link_threshold
+    results = merge(json.loads(args.scrapd.read()), json.loads(args.socrata.read()), args.extras, link_threshold)
+    results_str = json.dumps(results, sort_keys=True, indent=2)
+    print(results_str)
+
+    # Report the times which required dateparser.
+    if TIME_FALLBACKS:
+        logger.info(f'{sum(TIME_FALLBACKS.values())} time(s) required dateparser: {dict(TIME_FALLBACKS)}')
+
+
+def get_cli_parser():  # pragma: no cover
+    """Get the CLI parser."""
+    parser = argparse.ArgumentParser(description='Import Socrata data.')
+    parser.add_argument('scrapd', type=argparse.FileType('r+t'))
+    parser.add_argument('socrata', type=argparse.FileType('rt'), default=sys.stdin)
+    parser.add_argument('--extras', action='store_true', help='Add Socrata entries that do not match a ScrAPD entry')
+    parser.add_argument('--exact', action='store_true', help='Only match the entries by case number')
+    parser.add_argument('--link-threshold',
+                        type=float,
+                        default=linkage.LINK_THRESHOLD,
+                        help=f'Minimum score of the entries linked without matching case numbers, '
+                        f'defaults to {linkage.LINK_THRESHOLD}')
+
+    return parser
+
+
+def merge(scrapd, socrata, extras=False, link_threshold=linkage.LINK_THRESHOLD):
+    """
+    Merge `socrata` data into `scrapd` data.
+
+    :param list(dict) scrapd: scrapd data
+    :param list(dict) socrata: socrata data
+    :param float link_threshold: minimum score of the entries linked without matching case numbers, None to only
+        match the case numbers
+    :return: the socrata data merged into the scrapd data
+    :rtype: list(dict)
+    """
+    # Read the scrapd values.
+    scrapd_dict = {entry['case']: entry for entry in scrapd}
+
+    # Map a Socrata entry to ScrAPD entry.
+    socrata_dict = {}
+    raw_dict = {}
+    for entry in socrata:
+        latitude_value = entry.get('y_coord') or entry.get('ycoord') or ''
+        longitude_value = entry.get('x_coord') or entry.get('xcoord') or entry.get('coord_x', '') or ''
+
+        d = {
+            'case': entry.get('case_number', '').lower().strip(),
+            'latitude': clean_coordinates(latitude_value.strip()),
+            'location': entry.get('location', '').lower().strip(),
+            'longitude': clean_coordinates(longitude_value.strip()),
+            'time': clean_time(entry.get('time', '').lower().strip()),
+        }
+        socrata_dict[d.get('case')] = {k: v for k, v in d.items() if v}
+        raw_dict[d.get('case')] = entry
+
+    # Link the entries whose case numbers do not match.
+    if link_threshold is not None:
+        link_entries(scrapd_dict, socrata_dict, lambda case: make_record(raw_dict[case]), link_threshold)
+
+    # Merge the results.
+    final_dict = {}
+    for entry in scrapd_dict:
+        # Match the Socrata entry with a ScrAPD entry.
+        socrata_entry = socrata_dict.pop(entry, {})
+        if not socrata_entry:
+            continue
+
+        # Remove empty values.
+        final_dict[entry] = {k: v for k, v in socrata_entry.items() if v is not None}
+    if extras:
+        final_dict.update(socrata_dict)
+
+    return list(final_dict.values())
+
+
+def link_entries(scrapd_dict, socrata_dict, get_record, threshold=linkage.LINK_THRESHOLD):
+    """
+    Link the Socrata entries to the ScrAPD entries whose case numbers do not match.
+
+    The linked Socrata entries are moved to the case number of their ScrAPD entry.
+
+    :param dict scrapd_dict: ScrAPD entries by case number
+    :param dict socrata_dict: Socrata entries by case number, updated in place
+    :param callable get_record: function returning the linkage record of a Socrata case number
+    :param float threshold: minimum score of a link
+    """
+    scrapd_records = {case: entry for case, entry in scrapd_dict.items() if case not in socrata_dict}
+    if not scrapd_records:
+        return
+    socrata_records = {case: get_record(case) for case in socrata_dict if case not in scrapd_dict}
+    links, _ = linkage.link(scrapd_records, socrata_records, threshold)
+    for socrata_case, scrapd_case in links.items():
+        socrata_dict[scrapd_case] = {**socrata_dict.pop(socrata_case), 'case': scrapd_case}
+
+
+def make_record(entry):
+    """
+    Make the linkage record of a Socrata entry (see `scrapd_datasets.linkage`).
+
+    :param dict entry: Socrata entry
+    :return: the record
+    :rtype: dict
+    """
+    latitude_value = entry.get('y_coord') or entry.get('ycoord') or ''
+    longitude_value = entry.get('x_coord') or entry.get('xcoord') or entry.get('coord_x', '') or ''
+    return {
+        'crash': entry.get('fatal_crash_number') or entry.get('fatal_crash'),
+        'date': clean_date((entry.get('date') or '').lower().strip()),
+        'latitude': clean_coordinates(latitude_value.strip()),
+        'location': (entry.get('location') or '').lower().strip(),
+        'longitude': clean_coordinates(longitude_value.strip()),
+        'time': clean_time((entry.get('time') or '').lower().strip()),
+    }
+
+
+def clean_time(time):
+    """
+    Ensure the time has a 24 hour format.
+
+    The formats of the Socrata archives are parsed with regular expressions, and dateparser is only used for the other
+    ones. Each time requiring dateparser is counted in `TIME_FALLBACKS`.
+
+    :param str time: time to clean up
+    :return: the time formatted as `HH:MM:SS`, or an empty string if it cannot be parsed
+    :rtype: str
+    """
+    t = parse_time(time)
+    if t is not None:
+        return t
+    TIME_FALLBACKS[time] += 1
+    return parse_time_fallback(time)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_time_fallback(time):
+    """
+    Parse a time using dateparser, which is much slower.
+
+    The results are memoized.
+
+    :param str time: time to parse
+    :return: the time formatted as `HH:MM:SS`, or an empty string if it cannot be parsed
+    :rtype: str
+    """
+    import dateparser  # pylint: disable=import-outside-toplevel
+    try:
+        dt = dateparser.parse(time)
+    except ValueError:
+        return ''
+    if not dt:
+        return ''
+    return dt.strftime("%H:%M:%S")
+
+
+def parse_time(time):
+    """
+    Parse a time using the known formats.
+
+    :param str time: time to parse
+    :return: the time formatted as `HH:MM:SS`, or None if the format is unknown or the time is invalid
+    :rtype: str
+    """
+    for pattern in TIME_PATTERNS:
+        match = pattern.match(time)
+        if match:
+            break
+    else:
+        return None
+
+    groups = match.groupdict()
+    hour = int(groups['hour'])
+    minute = int(groups.get('minute') or 0)
+    second = int(groups.get('second') or 0)
+    meridiem = groups.get('meridiem')
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return f'{hour:02}:{minute:02}:{second:02}'
+
+
+def clean_date(date):
+    """
+    Ensure a date has the correct English format.
+
+    :param (str) date: date to clean.
+    """
+    try:
+        dt = datetime.datetime.fromisoformat(date)
+    except ValueError:
+        return ''
+    else:
+        return datetime.datetime.strftime(dt, "%Y-%m-%d")
+
+
+def clean_coordinates(coordinate):
+    """
+    Ensure coordiantes are stored as floats.
+
+    :param str coordinate: a string representing either a latitude, either a longitude.
+    :return: the float representing the coordinate
+    :rtype: float
+    """
+    try:
+        return float(coordinate)
+    except ValueError:
+        return None
@@ -3,19 +3,47 @@ set -euo pipefail
 
 # Define variables.
 : "${REGENERATE:=0}"
+: "${JOBS:=$(nproc)}"
+: "${CACHE_DIR:=${XDG_CACHE_HOME:-${HOME}/.cache}/scrapd-datasets}"
+: "${METRICS_DIR:=${CACHE_DIR}/metrics}"
 CURRENT_YEAR=$(date +%Y)
 TOPDIR=$(git rev-parse --show-toplevel)
 DATASET_DIR="${TOPDIR}/datasets"
 CURRENT_DATASET="${DATASET_DIR}/fatalities-${CURRENT_YEAR}-raw.json"
+CURRENT_DELTA="${DATASET_DIR}/fatalities-${CURRENT_YEAR}-raw.delta.json"
 TOOL_DIR="${TOPDIR}/tools"
-MERGER="${TOPDIR}/tools/scrapd-merger.py"
+PIPELINE="${TOPDIR}/tools/scrapd-pipeline.py"
+COMBINER="${TOPDIR}/tools/scrapd-combiner.py"
+EXPORTER="${TOPDIR}/tools/scrapd-exporter-arrow.py"
+CHECKSUM_FILE="${CACHE_DIR}/fatalities-all.sha256"
 
 # Ensure we are in the top directory.
 cd "${TOPDIR}"|| exit
 
+# Run the `scrapd-datasets` entry point from the repository, without installing it.
+export PYTHONPATH="${TOOL_DIR}${PYTHONPATH:+:${PYTHONPATH}}"
+scrapd_datasets() {
+  python -m scrapd_datasets "$@"
+}
+
+# Collect the metrics of the tools, even if the update fails.
+# They are written to a JSON file and to a Prometheus textfile collector file.
+SCRAPD_METRICS_DIR=$(mktemp -d)
+export SCRAPD_METRICS_DIR
+DELTA=$(mktemp)
+cleanup() {
+  rm -f "${DELTA}"
+  mkdir -p "${METRICS_DIR}"
+  scrapd_datasets metrics "${SCRAPD_METRICS_DIR}" -o "${METRICS_DIR}/metrics.json" -p "${METRICS_DIR}/scrapd_datasets.prom" \
+    || echo "The metrics could not be collected."
+  rm -rf "${SCRAPD_METRICS_DIR}"
+}
+trap cleanup EXIT
+
 # Generate the current data set.
+# The delta is kept aside until we know whether the data set changed.
 ENTRY_COUNT_BEFORE=$(jq length "${CURRENT_DATASET}")
-[ "$REGENERATE" == 0 ] && python "${MERGER}" -u -i "${CURRENT_DATASET}" <(scrapd -vv --format json --from "Jan 1 ${CURRENT_YEAR}" --to "Dec 31 ${CURRENT_YEAR}");
+[ "$REGENERATE" == 0 ] && scrapd_datasets merge -u -i -t -d "${DELTA}" "${CURRENT_DATASET}" <(scrapd -vv --format json --from "Jan 1 ${CURRENT_YEAR}" --to "Dec 31 ${CURRENT_YEAR}");
 HAS_CHANGE=$(git status -s)
 
 # If nothing changed, we can leave.
@@ -24,54 +52,50 @@ if [ -z "${HAS_CHANGE}" ]; then
   [ "$REGENERATE" == 0 ] && exit 0
 fi
 
-for YEAR in {2017..2020}; do
-  echo "=> Processing year ${YEAR}..."
-
-  # Prepare variables.
-  RAW_DATA_SET="${DATASET_DIR}/fatalities-${YEAR}-raw.json"
-  AUGMENTED_DATA_SET="${DATASET_DIR}/fatalities-${YEAR}-augmented.json"
-  AUGMENTATION_DIR="${TOPDIR}/augmentations/${YEAR}"
-
-  # Create augmentation dir if needed.
-  mkdir -p "${AUGMENTATION_DIR}"
-
-  # Create augmented data sets from the raw ones.
-  echo -e "\t- Resetting augmented data sets..."
-  cp "${RAW_DATA_SET}" "${AUGMENTED_DATA_SET}"
-
-  # Apply the augmentations (1st pass).
-  # This is to restore the previous state as we rebuilt the data set from scratch.
-  echo -e "\t- Applying augmentations (1st pass)..."
-  for AUGMENTATION in "${AUGMENTATION_DIR}"/*.json; do
-    echo -e "\t\t- $(basename ${AUGMENTATION})"
-    [ -f "${AUGMENTATION}" ] && python "${MERGER}" -i "${AUGMENTED_DATA_SET}" "${AUGMENTATION}"
-  done
-
-  # Generate the augmentations.
-  echo -e "\t- Generating new augmentations..."
-  AUGMENTATIONS="scrapd-augmenter-geocoding-geocensus.py:augmentation-geocoding-geocensus-${YEAR}.json"
-  for AUGMENTATION in ${AUGMENTATIONS}; do
-    TOOL="${TOOL_DIR}/$(echo ${AUGMENTATION}|cut -d':' -f1)"
-    AUGMENTATION_FILE="${AUGMENTATION_DIR}/$(echo ${AUGMENTATION}|cut -d':' -f2)"
-    [ ! -f "${AUGMENTATION_FILE}" ] && echo "[]" > "${AUGMENTATION_FILE}"
-    echo -e "\t\t- $(basename ${AUGMENTATION_FILE})"
-    python "${TOOL}" "${AUGMENTED_DATA_SET}" > "${AUGMENTATION_FILE}"
-  done
+# Publish the delta of the current data set, for the mirrors, only if the data set changed.
+# The merger writes a delta even when nothing changed.
+UPDATED_ENTRY_COUNT=0
+if [[ -s "${DELTA}" ]] && [[ -n "$(git status -s -- "${CURRENT_DATASET}")" ]]; then
+  cp "${DELTA}" "${CURRENT_DELTA}"
+  UPDATED_ENTRY_COUNT=$(jq '.changed | length' "${CURRENT_DELTA}")
+fi
 
-  # Apply the augmentations (2nd pass).
-  # This is to add the new augmentations if any.
-  echo -e "\t- Applying augmentations (2nd pass)..."
-  for AUGMENTATION in "${AUGMENTATION_DIR}"/*.json; do
-    echo -e "\t\t- $(basename ${AUGMENTATION})"
-    [ -f "${AUGMENTATION}" ] && python "${MERGER}" -i "${AUGMENTED_DATA_SET}" "${AUGMENTATION}"
-  done
+# List the years of the raw data sets.
+# The pipeline and the combiner use the same list.
+YEARS=()
+for RAW in "${DATASET_DIR}"/fatalities-[0-9][0-9][0-9][0-9]-raw.json; do
+  RAW="${RAW##*/fatalities-}"
+  YEARS+=("${RAW%-raw.json}")
 done
+RAW_DATASETS=("${YEARS[@]/%/-raw.json}")
+RAW_DATASETS=("${RAW_DATASETS[@]/#/fatalities-}")
+AUGMENTED_DATASETS=("${YEARS[@]/%/-augmented.json}")
+AUGMENTED_DATASETS=("${AUGMENTED_DATASETS[@]/#/fatalities-}")
+
+# Generate the augmented data sets.
+# The years whose inputs did not change are skipped, unless we regenerate everything.
+FORCE=""
+[ "$REGENERATE" == 1 ] && FORCE="--force"
+python "${PIPELINE}" --jobs "${JOBS}" --years "${YEARS[@]}" ${FORCE}
 
 # Merge the results.
-cd "${TOPDIR}/datasets"|| exit
-echo "=> Merging the yearly data sets..."
-jq -s add fatalities-20{17..20}-raw.json > fatalities-all-raw.json
-jq -s add fatalities-20{17..20}-augmented.json > fatalities-all-augmented.json
+# They are only rebuilt if a yearly data set changed, unless we regenerate everything.
+# The checksums are kept in the cache directory, out of the data sets.
+cd "${DATASET_DIR}"|| exit
+if [ "$REGENERATE" == 1 ] || ! sha256sum --status -c "${CHECKSUM_FILE}" 2>/dev/null; then
+  echo "=> Merging the yearly data sets..."
+  python "${COMBINER}" -o fatalities-all-raw.json "${RAW_DATASETS[@]}"
+  python "${COMBINER}" -o fatalities-all-augmented.json "${AUGMENTED_DATASETS[@]}"
+  mkdir -p "${CACHE_DIR}"
+  sha256sum "${RAW_DATASETS[@]}" "${AUGMENTED_DATASETS[@]}" fatalities-all-{raw,augmented}.json > "${CHECKSUM_FILE}"
+
+  # Export the results to Parquet, if the optional dependency is installed.
+  # The exports are written to the untracked `exports` directory, so they are not committed.
+  if python -c "import pyarrow" 2>/dev/null; then
+    echo "=> Exporting the data sets..."
+    python "${EXPORTER}" fatalities-all-augmented.json archives-all.json
+  fi
+fi
 
 # Compute the number of new entries.
 ENTRY_COUNT_AFTER=$(jq length "${CURRENT_DATASET}")
@@ -85,7 +109,7 @@ cd "${TOPDIR}"|| exit
 # Commit the changes.
 git add .
 git commit -m "Update data sets" \
-  -m "There are ${NEW_ENTRY_COUNT} new entries in the current data set." \
+  -m "There are ${NEW_ENTRY_COUNT} new entries and ${UPDATED_ENTRY_COUNT} updated entries in the current data set." \
   -m "$(git status -s)"
 pycalver bump -n || pycalver bump -n --patch
 git push origin master
@@ -10,9 +10,34 @@ MERGER="${TOPDIR}/tools/scrapd-merger.py"
 # Ensure we are in the top directory.
 cd "${TOPDIR}"|| exit
 
-# Generate the current data set.
-for YEAR in {2018..2020}; do
+# Define the number of years processed in parallel.
+: "${JOBS:=$(nproc)}"
+LOG_DIR=$(mktemp -d)
+trap 'rm -rf "${LOG_DIR}"' EXIT
+
+# Update the data set of a year.
+update_year() {
+  local YEAR=$1
+  local DATASET="${DATASET_DIR}/fatalities-${YEAR}-raw.json"
   echo "=> Processing year ${YEAR}..."
-  DATASET="${DATASET_DIR}/fatalities-${YEAR}-raw.json"
   python "${MERGER}" -i -u "${DATASET}" <(scrapd -v --format json --from "Jan 1 ${YEAR}" --to "Dec 31 ${YEAR}");
+}
+
+# Generate the current data set.
+YEARS=({2018..2020})
+declare -A PIDS
+for YEAR in "${YEARS[@]}"; do
+  while [ "$(jobs -rp | wc -l)" -ge "${JOBS}" ]; do
+    wait -n || true
+  done
+  update_year "${YEAR}" > "${LOG_DIR}/${YEAR}.log" 2>&1 &
+  PIDS[${YEAR}]=$!
+done
+
+# Report the years in order.
+STATUS=0
+for YEAR in "${YEARS[@]}"; do
+  wait "${PIDS[${YEAR}]}" || STATUS=1
+  cat "${LOG_DIR}/${YEAR}.log"
 done
+exit "${STATUS}"